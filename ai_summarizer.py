@@ -1,34 +1,26 @@
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional
 import os
 import json
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from http import HTTPStatus
-from dashscope import Application
 from loguru import logger
 from config import AIConfig
+from llm_cache import LLMResponseCache
+from llm_client import CircuitOpenError, get_shared_client
+from json_stream import IncrementalJSONParser, parse_json_text
+from project_names import ProjectNameIndex, split_projects
+from project_schema import (ExpectationCheck, ProjectAnalysis, RiskSignals, SINGLE_PROJECT,
+                            pick_project, validate_analyses)
+from report_renderer import render_analyses, render_analysis, render_report
+from token_budget import estimate_tokens, split_by_budget
 
-class AISummarizer:
-    """AI日报汇总器"""
-    
-    def __init__(self, ai_config: AIConfig):
-        self.config = ai_config
-    
-    def format_reports_for_ai(self, reports: List[Dict]) -> str:
-        """格式化日报数据供AI处理"""
-        formatted_text = "以下是收集到的团队日报内容：\n\n"
-        
-        for i, report in enumerate(reports, 1):
-            formatted_text += f"=== 日报 {i} ===\n"
-            formatted_text += f"发送人: {report['from']}\n"
-            formatted_text += f"主题: {report['subject']}\n"
-            formatted_text += f"日期: {report['date']}\n"
-            formatted_text += f"内容:\n{report['body']}\n\n"
-        
-        return formatted_text
-    
-    def create_unified_project_prompt(self, project_name: str, project_content: str) -> str:
-        """创建统一的项目分析提示词（不区分个人和团队）"""
-        system_prompt = """你是一名资深项目管理分析助手（AI PM Analyst），擅长从项目日报中，
+# 提示词版本：修改 create_unified_project_prompt 的模板后需要递增，使旧缓存失效
+PROMPT_VERSION = "unified-v1"
+
+# 统一项目分析提示词的公共部分（单项目和打包多项目提示词共用）
+UNIFIED_SYSTEM_PROMPT = """你是一名资深项目管理分析助手（AI PM Analyst），擅长从项目日报中，
 抽取结构化事实、判断项目态势、识别人员负载与潜在风险。
 
 你的目标不是复述日报内容，而是：
@@ -38,17 +30,8 @@ class AISummarizer:
 - 给出偏保守、可解释的分析结论
 
 如果信息不足，请明确标注"不确定"，不要自行脑补。"""
-        
-        user_prompt = f"""以下是一个项目的日报内容，可能来自多个团队成员：
-
-【项目】：{project_name}
-
-日报内容：
-{project_content}
-
-请你完成以下分析任务，并严格按 JSON 结构输出。
 
-【分析任务】
+UNIFIED_ANALYSIS_TASKS = """【分析任务】
 
 一、事实抽取（不做判断）
 - 当前项目阶段（需求 / 设计 / 开发 / 联调 / 测试 / 验收 / 不确定）
@@ -77,7 +60,102 @@ class AISummarizer:
 - "明天如果一切顺利的状态"是否合理？
 - 是否存在明显乐观偏差或前置条件未满足？
 
-【输出要求】
+"""
+
+# 分片合并时的取值顺序（越靠后越严重）
+HEALTH_ORDER = ["unknown", "green", "yellow", "red"]
+LOAD_ORDER = ["低负载", "低负载 / 等待中", "中等负载", "高负载"]
+UNKNOWN_VALUES = ("不确定", "unknown", "insufficient_information", "")
+# token预算过小时的下限，避免分片过碎
+MIN_CONTENT_TOKENS = 500
+# 团队汇总树形整合时每次调用合并的汇总数，整合提示词长度不随团队人数增长
+TEAM_REDUCE_GROUP_SIZE = 8
+
+# 流式事件回调：接收 {'type': 'project_start' | 'project_delta' | 'project_done', 'project': ..., ...}
+EventCallback = Callable[[Dict], None]
+
+class AISummarizer:
+    """AI日报汇总器"""
+    
+    def __init__(self, ai_config: AIConfig):
+        self.config = ai_config
+        self.client = get_shared_client(ai_config)
+        self.cache = None
+        if ai_config.cache_enabled:
+            try:
+                self.cache = LLMResponseCache(
+                    db_path=ai_config.cache_path,
+                    ttl_seconds=ai_config.cache_ttl_hours * 3600,
+                    max_entries=ai_config.cache_max_entries
+                )
+            except Exception as e:
+                logger.warning(f"LLM缓存初始化失败，将直接调用AI: {e}")
+        self.project_names = None
+        if ai_config.project_alias_enabled:
+            try:
+                self.project_names = ProjectNameIndex(ai_config.project_alias_path)
+            except Exception as e:
+                logger.warning(f"项目名称索引初始化失败，按原始名称归并项目: {e}")
+    
+    def _canonical_project_name(self, name: str) -> str:
+        """把项目名称映射为规范名称（'项目A'、'项目 A'、'A项目' 归为同一个项目）"""
+        if self.project_names is None:
+            return name
+        canonical = self.project_names.canonical(name)
+        if canonical != name:
+            logger.info(f"项目名称归并: {name} -> {canonical}")
+        return canonical
+    
+    def _call_application(self, prompt: str, on_delta: Optional[Callable[[str], None]] = None):
+        """调用百炼应用（所有AI调用的统一入口，经共享客户端限速、自适应并发和重试）
+
+        传入 on_delta 且开启流式输出时使用增量流式调用，每收到一段新文本回调一次，
+        最终返回与非流式调用相同结构的响应（output.text 为完整输出）
+        """
+        # Application.call 不支持 max_tokens 参数，需要在百炼控制台的应用设置中配置
+        return self.client.call(
+            on_delta=on_delta if self.config.stream_output else None,
+            prompt=prompt,
+            temperature=0.1
+        )
+    
+    @staticmethod
+    def _emit(on_event: Optional[EventCallback], event_type: str, project_name: str, **fields):
+        """发送流式事件；回调出错不影响分析流程"""
+        if on_event is None:
+            return
+        try:
+            on_event({'type': event_type, 'project': project_name, **fields})
+        except Exception as e:
+            logger.warning(f"流式事件回调失败: {e}")
+    
+    def format_reports_for_ai(self, reports: List[Dict]) -> str:
+        """格式化日报数据供AI处理"""
+        formatted_text = "以下是收集到的团队日报内容：\n\n"
+        
+        for i, report in enumerate(reports, 1):
+            formatted_text += f"=== 日报 {i} ===\n"
+            formatted_text += f"发送人: {report['from']}\n"
+            formatted_text += f"主题: {report['subject']}\n"
+            formatted_text += f"日期: {report['date']}\n"
+            formatted_text += f"内容:\n{report['body']}\n\n"
+        
+        return formatted_text
+    
+    def create_unified_project_prompt(self, project_name: str, project_content: str) -> str:
+        """创建统一的项目分析提示词（不区分个人和团队）"""
+        system_prompt = UNIFIED_SYSTEM_PROMPT
+        
+        user_prompt = f"""以下是一个项目的日报内容，可能来自多个团队成员：
+
+【项目】：{project_name}
+
+日报内容：
+{project_content}
+
+请你完成以下分析任务，并严格按 JSON 结构输出。
+
+{UNIFIED_ANALYSIS_TASKS}【输出要求】
 
 - 仅输出 JSON，不要输出解释性文字
 - 所有判断必须能从原文找到依据
@@ -119,125 +197,55 @@ class AISummarizer:
         
         return prompt
     
-    def _generate_unified_project_report(self, all_project_results: Dict) -> str:
-        """生成统一的项目汇总报告（按项目维度）"""
-        if not all_project_results:
-            return "今日暂无项目日报内容。"
-        
-        report = ""
-        
-        # 按项目生成报告
-        for project_name, project_result in all_project_results.items():
-            json_data = project_result.get('json_data')
-            
-            if json_data:
-                # 转换为报告格式
-                project_report = self._convert_single_project_json(project_name, json_data)
-                report += project_report + "\n\n"
-            else:
-                # 如果没有JSON数据，显示原始输出
-                raw_output = project_result.get('raw_output', '')
-                report += f"### 【{project_name}】\n\n"
-                report += f"（AI分析失败，原始输出：{raw_output[:200]}...）\n\n"
-        
-        # 生成项目汇总部分
-        report += self._generate_project_summary(all_project_results)
-        
-        return report
-    
-    def _generate_project_summary(self, all_project_results: Dict) -> str:
-        """生成项目汇总部分（按项目进展和风险分类）"""
-        summary = "### 3. 项目进展\n"
-        summary += "各项目进展情况如下：\n\n"
-        
-        # 收集所有项目的进展
-        project_progress = {}
-        project_risks = {}
-        
-        for project_name, project_result in all_project_results.items():
-            json_data = project_result.get('json_data')
-            if not json_data:
-                continue
-            
-            # 提取项目阶段和关键事件
-            project_stage = json_data.get('project_stage', 'unknown')
-            key_events = json_data.get('key_events', [])
-            
-            # 构建进展描述
-            progress_items = []
-            for event in key_events:
-                if isinstance(event, str):
-                    if event.startswith('推进：') or event.startswith('推进:'):
-                        progress_items.append(event.replace('推进：', '').replace('推进:', ''))
-            
-            if progress_items:
-                project_progress[project_name] = {
-                    'stage': project_stage,
-                    'events': progress_items
-                }
-            
-            # 提取风险
-            health_status = json_data.get('health_status', 'unknown')
-            main_risk = json_data.get('main_risk', '')
-            risk_signals = json_data.get('risk_signals', {})
-            role_gaps = json_data.get('role_gaps', [])
-            single_point_risk = json_data.get('single_point_risk', False)
-            
-            risk_items = []
-            if main_risk:
-                risk_items.append(main_risk)
-            if single_point_risk:
-                risk_items.append("存在单点风险")
-            if role_gaps:
-                risk_items.append(f"角色缺位：{', '.join(role_gaps)}")
-            if risk_signals:
-                for signal, value in risk_signals.items():
-                    if value in [True, '是', 'true']:
-                        signal_map = {
-                            'fake_progress': '假推进',
-                            'delay_risk': '隐性延期风险',
-                            'requirement_unstable': '需求或决策不稳定',
-                            'external_block': '外部依赖阻塞'
-                        }
-                        risk_items.append(signal_map.get(signal, signal))
-            
-            if risk_items or health_status in ['yellow', 'red']:
-                project_risks[project_name] = {
-                    'health': health_status,
-                    'risks': risk_items
-                }
+    def create_packed_project_prompt(self, projects: List[Dict[str, str]]) -> str:
+        """创建打包多个小项目的分析提示词，要求按项目名称输出多项目格式JSON
+
+        projects: [{'name', 'content'}]
+        """
+        sections = "\n\n".join(
+            f"【项目】：{project['name']}\n\n日报内容：\n{project['content']}"
+            for project in projects
+        )
+        names = "、".join(project['name'] for project in projects)
         
-        # 输出项目进展
-        if project_progress:
-            for project_name, progress in project_progress.items():
-                summary += f"- **{project_name}**: "
-                summary += f"阶段：{progress['stage']}；"
-                summary += "；".join(progress['events'][:3])  # 最多显示3个关键事件
-                summary += "\n"
-        else:
-            summary += "无显著进展\n"
-        
-        summary += "\n### 4. 项目风险\n"
-        summary += "需要关注的问题和风险：\n\n"
-        
-        # 输出项目风险
-        if project_risks:
-            for project_name, risk in project_risks.items():
-                summary += f"- **{project_name}**: "
-                if risk['health'] == 'red':
-                    summary += "【高风险】"
-                elif risk['health'] == 'yellow':
-                    summary += "【需关注】"
-                
-                if risk['risks']:
-                    summary += "；".join(risk['risks'][:3])  # 最多显示3个风险
-                else:
-                    summary += "无显著风险"
-                summary += "\n"
-        else:
-            summary += "无需要特别关注的风险。\n"
+        user_prompt = f"""以下是 {len(projects)} 个项目的日报内容，可能来自多个团队成员。
+请对每个项目分别独立分析，不要混用不同项目的信息：
+
+{sections}
+
+请你对每个项目完成以下分析任务，并严格按 JSON 结构输出。
+
+{UNIFIED_ANALYSIS_TASKS}【输出要求】
+
+- 仅输出一个 JSON，不要输出解释性文字
+- 所有判断必须能从原文找到依据
+- 若无法判断，请使用 "unknown" 或 "insufficient_information"
+- 每个字段的值都是以项目名称为键的对象，必须包含全部项目：{names}
+- JSON 格式示例（以两个项目为例）：
+{{
+  "project_stage": {{"项目A": "开发", "项目B": "测试"}},
+  "key_events": {{"项目A": ["推进：完成了XX功能开发"], "项目B": ["卡点：等待测试环境"]}},
+  "personnel": {{
+    "项目A": {{"研发": {{"work_type": "功能开发", "load_status": "高负载"}}}},
+    "项目B": {{"测试": {{"work_type": "等待中", "load_status": "低负载"}}}}
+  }},
+  "role_gaps": {{"项目A": [], "项目B": ["缺少产品角色参与"]}},
+  "single_point_risk": {{"项目A": false, "项目B": true}},
+  "health_status": {{"项目A": "green", "项目B": "yellow"}},
+  "risk_signals": {{
+    "项目A": {{"fake_progress": false, "delay_risk": false, "requirement_unstable": false, "external_block": false}},
+    "项目B": {{"fake_progress": false, "delay_risk": true, "requirement_unstable": false, "external_block": true}}
+  }},
+  "main_risk": {{"项目A": "暂无明显风险", "项目B": "测试环境未就绪可能导致延期"}},
+  "tomorrow_expectation_check": {{
+    "项目A": {{"reasonable": true, "optimistic_bias": false, "missing_prerequisites": []}},
+    "项目B": {{"reasonable": false, "optimistic_bias": true, "missing_prerequisites": ["测试环境未就绪"]}}
+  }}
+}}"""
         
-        return summary
+        return f"""{UNIFIED_SYSTEM_PROMPT}
+
+{user_prompt}"""
     
     def create_personal_summary_prompt(self, personal_content: str) -> str:
         """创建个人日报汇总提示词（使用与团队日报相同的结构化分析方式）"""
@@ -386,8 +394,16 @@ Nicole: MyCoach 客户
         result = self.summarize_reports_separated_with_data(personal_content, team_reports)
         return result['report']
     
-    def summarize_reports_separated_with_data(self, personal_content: str, team_reports: List[Dict]) -> Dict:
-        """统一按项目处理所有日报内容（不区分个人和团队），并返回报告和项目数据"""
+    def summarize_reports_separated_with_data(self, personal_content: str, team_reports: List[Dict],
+                                              previous_projects: Optional[Dict[str, Dict]] = None,
+                                              on_event: Optional[EventCallback] = None) -> Dict:
+        """统一按项目处理所有日报内容（不区分个人和团队），并返回报告和项目数据
+        
+        previous_projects: 增量模式下传入当天已保存的项目数据 {project_name: {raw_content, json_data}}，
+        合并内容未变化的项目直接复用其 json_data，不再调用AI
+        on_event: 流式事件回调（可能在工作线程中调用），用于实时转发各项目的部分输出和完成事件
+        """
+        previous_projects = previous_projects or {}
         try:
             logger.info(f"=== AI统一项目汇总处理开始 ===")
             logger.info(f"个人内容长度: {len(personal_content)} 字符")
@@ -402,7 +418,7 @@ Nicole: MyCoach 客户
                 logger.info("=== 从个人内容中提取项目 ===")
                 personal_projects = self._extract_projects_from_content(personal_content)
                 for project in personal_projects:
-                    project_name = project['name']
+                    project_name = self._canonical_project_name(project['name'])
                     if project_name not in all_projects:
                         all_projects[project_name] = []
                     all_projects[project_name].append({
@@ -418,7 +434,7 @@ Nicole: MyCoach 客户
                     # 从邮件内容中提取项目
                     team_projects = self._extract_projects_from_content(report['body'])
                     for project in team_projects:
-                        project_name = project['name']
+                        project_name = self._canonical_project_name(project['name'])
                         if project_name not in all_projects:
                             all_projects[project_name] = []
                         all_projects[project_name].append({
@@ -440,70 +456,63 @@ Nicole: MyCoach 客户
                     'source': 'combined'
                 }]
             
-            # 4. 按项目统一处理
-            logger.info(f"=== 开始处理 {len(all_projects)} 个项目 ===")
+            # 4. 按项目统一处理（max_workers > 1 时并发调用AI，结果顺序与项目顺序一致）
+            #    开启打包模式时，多个小项目合并为一次调用
+            project_items = list(all_projects.items())
+            tasks = self._plan_project_tasks(project_items, previous_projects)
+            workers = max(1, min(self.config.max_workers, len(tasks)))
+            logger.info(f"=== 开始处理 {len(project_items)} 个项目 "
+                        f"({len(tasks)} 个调用任务, 并发数: {workers}) ===")
             all_project_results = {}  # {project_name: {summary, json_data, ...}}
             
-            for project_name, project_contents in all_projects.items():
-                logger.info(f"处理项目: {project_name} (包含 {len(project_contents)} 个来源)")
-                
-                # 合并同一项目的所有内容
-                merged_content = "\n\n".join([
-                    f"【来源：{pc['source']}】\n{pc['content']}"
-                    for pc in project_contents
-                ])
-                
-                # 使用统一的提示词处理项目
-                project_prompt = self.create_unified_project_prompt(project_name, merged_content)
-                
-                if self.config.app_id:
-                    try:
-                        response = Application.call(
-                            api_key=self.config.api_key,
-                            app_id=self.config.app_id,
-                            prompt=project_prompt,
-                            temperature=0.1
-                        )
-                        
-                        if response.status_code == HTTPStatus.OK:
-                            raw_output = response.output.text.strip()
-                            logger.info(f"项目 {project_name} AI输出长度: {len(raw_output)} 字符")
-                            
-                            # 检查输出是否完整
-                            if not self._is_json_complete(raw_output):
-                                logger.warning(f"⚠️ 项目 {project_name} 的输出可能被截断")
-                            
-                            # 解析JSON
-                            json_data = self._extract_json_from_text(raw_output)
-                            if json_data:
-                                # 保存项目数据
-                                project_data_list.append({
-                                    'project_name': project_name,
-                                    'raw_content': merged_content,
-                                    'json_data': json_data,
-                                    'raw_output': raw_output
-                                })
-                                
-                                all_project_results[project_name] = {
-                                    'json_data': json_data,
-                                    'raw_output': raw_output
-                                }
-                                logger.info(f"✅ 项目 {project_name} 处理完成")
-                            else:
-                                logger.warning(f"⚠️ 项目 {project_name} JSON解析失败")
-                                all_project_results[project_name] = {
-                                    'json_data': None,
-                                    'raw_output': raw_output
-                                }
-                        else:
-                            logger.error(f"项目 {project_name} AI调用失败: {response.status_code}")
-                    except Exception as e:
-                        logger.error(f"处理项目 {project_name} 时出错: {e}")
+            def run_task(task):
+                if task['type'] == 'pack':
+                    results = self._analyze_project_pack(task['items'], on_event)
                 else:
-                    logger.warning(f"未配置AI，跳过项目 {project_name}")
+                    name, contents = task['items'][0]
+                    results = [self._analyze_unified_project(name, contents, previous_projects.get(name), on_event)]
+                for r in results:
+                    self._emit(on_event, 'project_done', r['project_name'], status=r['status'],
+                               duration=r['duration'], cached=r.get('cached', False))
+                return results
+            
+            ai_start_time = time.perf_counter()
+            if workers > 1:
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ai-project') as executor:
+                    task_results = list(executor.map(run_task, tasks))
+            else:
+                task_results = [run_task(task) for task in tasks]
+            wall_time = time.perf_counter() - ai_start_time
+            
+            # 恢复原始项目顺序
+            by_name = {r['project_name']: r for results in task_results for r in results}
+            project_results = [by_name[project_name] for project_name, _ in project_items]
+            
+            for project_result in project_results:
+                project_name = project_result['project_name']
+                if project_result['status'] in ('ok', 'reused'):
+                    project_data_list.append({
+                        'project_name': project_name,
+                        'raw_content': project_result['raw_content'],
+                        'json_data': project_result['json_data'],
+                        'raw_output': project_result['raw_output'],
+                        'duration': project_result['duration'],
+                        'reused': project_result['status'] == 'reused'
+                    })
+                if project_result['status'] in ('ok', 'reused', 'json_error'):
+                    all_project_results[project_name] = {
+                        'json_data': project_result['json_data'],
+                        'raw_output': project_result['raw_output']
+                    }
+            
+            timing = self._build_timing(project_results, wall_time, workers)
+            logger.info(f"AI项目分析耗时: {timing['wall_time']}秒 "
+                        f"(各项目累计 {timing['sequential_time']}秒, 加速比 {timing['speedup']}x, "
+                        f"缓存命中 {timing['cache_hits']}/{len(project_results)}, 打包 {timing['packed']} 个)")
             
-            # 5. 生成统一的项目汇总报告
-            final_report = self._generate_unified_project_report(all_project_results)
+            # 5. 生成统一的项目汇总报告（同时渲染网页、邮件和HTML三种格式）
+            rendered = render_report(all_project_results)
+            final_report = rendered.markdown
             
             logger.info("=== AI统一项目汇总处理完成 ===")
             logger.info(f"最终报告长度: {len(final_report)} 字符")
@@ -511,9 +520,19 @@ Nicole: MyCoach 客户
             
             return {
                 'report': final_report,
-                'project_data': project_data_list
+                'rendered': rendered,
+                'project_data': project_data_list,
+                # 本次分析失败的项目（增量更新时保留其上次的数据）
+                'failed_projects': [r['project_name'] for r in project_results if r['status'] not in ('ok', 'reused')],
+                'timing': timing
             }
             
+        except CircuitOpenError as e:
+            logger.warning(f"⚠️ {e}，改用简单汇总")
+            return {
+                'report': self.create_fallback_summary(personal_content, team_reports),
+                'project_data': []
+            }
         except Exception as e:
             logger.error(f"AI统一项目汇总失败: {e}")
             import traceback
@@ -525,29 +544,336 @@ Nicole: MyCoach 客户
                 'project_data': []
             }
     
-    def _extract_projects_from_content(self, content: str) -> List[Dict[str, str]]:
-        """从个人日报内容中提取项目列表"""
-        projects = []
-        # 匹配【项目】：项目名称 的模式
-        pattern = r'【项目】[：:]\s*([^\n]+)'
-        matches = re.finditer(pattern, content)
-        
-        for match in matches:
-            project_name = match.group(1).strip()
-            # 找到下一个项目或内容结尾的位置
-            start_pos = match.end()
-            next_match = re.search(r'【项目】[：:]', content[start_pos:])
-            if next_match:
-                end_pos = start_pos + next_match.start()
+    def _analyze_unified_project(self, project_name: str, project_contents: List[Dict],
+                                 previous: Optional[Dict] = None, on_event: Optional[EventCallback] = None) -> Dict:
+        """分析单个项目（串行和并发模式共用），返回结果及耗时"""
+        start_time = time.perf_counter()
+        logger.info(f"处理项目: {project_name} (包含 {len(project_contents)} 个来源)")
+        
+        # 合并同一项目的所有内容
+        merged_content = self._merge_project_contents(project_contents)
+        
+        result = {
+            'project_name': project_name,
+            'raw_content': merged_content,
+            'json_data': None,
+            'raw_output': '',
+            'status': 'skipped',
+            'cached': False
+        }
+        
+        # 增量模式：内容与已保存版本一致时直接复用已有分析结果
+        if previous and previous.get('json_data') and previous.get('raw_content') == merged_content:
+            result.update(json_data=previous['json_data'], status='reused')
+            result['duration'] = round(time.perf_counter() - start_time, 3)
+            logger.info(f"⏭️ 项目 {project_name} 内容未变化，复用已有分析结果")
+            return result
+        
+        if self.config.app_id:
+            # 使用统一的提示词处理项目；内容超出token预算时分片分析后合并
+            budget = self._content_token_budget(project_name)
+            content_tokens = estimate_tokens(merged_content)
+            if content_tokens > budget:
+                logger.info(f"项目 {project_name} 内容约 {content_tokens} tokens，超出预算 {budget}，分片处理")
+                result.update(self._analyze_project_chunks(project_name, project_contents, budget, on_event))
             else:
-                end_pos = len(content)
+                project_prompt = self.create_unified_project_prompt(project_name, merged_content)
+                call = self._run_project_prompt(project_name, project_prompt, on_event)
+                result.update(call, json_data=pick_project(call.pop('analyses'), project_name))
+                if result['status'] == 'ok' and result['json_data'] is None:
+                    logger.warning(f"⚠️ 项目 {project_name} 的输出中没有该项目的分析结果")
+                    result['status'] = 'json_error'
+        else:
+            logger.warning(f"未配置AI，跳过项目 {project_name}")
+        
+        result['duration'] = round(time.perf_counter() - start_time, 3)
+        return result
+    
+    def _merge_project_contents(self, project_contents: List[Dict]) -> str:
+        """合并同一项目各来源的内容"""
+        return "\n\n".join([
+            f"【来源：{pc['source']}】\n{pc['content']}"
+            for pc in project_contents
+        ])
+    
+    def _plan_project_tasks(self, project_items: List, previous_projects: Dict[str, Dict]) -> List[Dict]:
+        """把项目划分为调用任务：小项目按字符预算打包，其余项目单独调用
+
+        返回 [{'type': 'single' | 'pack', 'items': [(project_name, project_contents), ...]}]
+        """
+        if not self.config.pack_enabled or not self.config.app_id:
+            return [{'type': 'single', 'items': [item]} for item in project_items]
+        
+        tasks, pack, pack_chars = [], [], 0
+        
+        def flush():
+            if len(pack) > 1:
+                tasks.append({'type': 'pack', 'items': list(pack)})
+            elif pack:
+                tasks.append({'type': 'single', 'items': list(pack)})
+        
+        for project_name, project_contents in project_items:
+            merged_content = self._merge_project_contents(project_contents)
+            previous = previous_projects.get(project_name)
+            unchanged = bool(previous and previous.get('json_data') and previous.get('raw_content') == merged_content)
+            if unchanged or len(merged_content) > self.config.pack_small_chars:
+                tasks.append({'type': 'single', 'items': [(project_name, project_contents)]})
+                continue
+            if pack and pack_chars + len(merged_content) > self.config.pack_budget_chars:
+                flush()
+                pack, pack_chars = [], 0
+            pack.append((project_name, project_contents))
+            pack_chars += len(merged_content)
+        flush()
+        return tasks
+    
+    def _analyze_project_pack(self, items: List, on_event: Optional[EventCallback] = None) -> List[Dict]:
+        """一次调用分析多个小项目，按项目名称拆回各自的结果；未返回的项目单独补调"""
+        start_time = time.perf_counter()
+        names = [project_name for project_name, _ in items]
+        merged = {project_name: self._merge_project_contents(contents) for project_name, contents in items}
+        logger.info(f"打包处理 {len(items)} 个小项目: {', '.join(names)}")
+        
+        prompt = self.create_packed_project_prompt([
+            {'name': project_name, 'content': merged[project_name]} for project_name in names
+        ])
+        call = self._run_project_prompt(f"打包({len(items)}个项目)", prompt, on_event, projects=names)
+        analyses = call['analyses']
+        
+        duration = round((time.perf_counter() - start_time) / len(items), 3)
+        results, missing = [], []
+        for project_name, contents in items:
+            if project_name not in analyses:
+                missing.append((project_name, contents))
+                continue
+            results.append({
+                'project_name': project_name,
+                'raw_content': merged[project_name],
+                'json_data': analyses[project_name],
+                'raw_output': call['raw_output'],
+                'status': 'ok',
+                'cached': call['cached'],
+                'duration': duration,
+                'packed': len(items)
+            })
+        
+        if missing:
+            logger.warning(f"⚠️ 打包结果缺少 {len(missing)} 个项目，单独补调: {', '.join(n for n, _ in missing)}")
+            results.extend(self._analyze_unified_project(project_name, contents, on_event=on_event)
+                           for project_name, contents in missing)
+        return results
+    
+    def _content_token_budget(self, project_name: str) -> int:
+        """单次调用可用于日报内容的token数：max_tokens 扣除提示词模板和输出预留"""
+        template_tokens = estimate_tokens(self.create_unified_project_prompt(project_name, ""))
+        budget = self.config.max_tokens - template_tokens - self.config.output_token_reserve
+        return max(budget, MIN_CONTENT_TOKENS)
+    
+    def _run_project_prompt(self, project_name: str, project_prompt: str,
+                            on_event: Optional[EventCallback] = None, **event_fields) -> Dict:
+        """执行一次项目分析调用（带缓存），返回 raw_output / analyses / status / cached
+
+        analyses 为校验后的 {项目名称: ProjectAnalysis}（单项目格式的键为 SINGLE_PROJECT），
+        缓存中保存的是模型输出的原始JSON，命中时同样经过校验
+
+        on_event 不为空时流式调用，逐段发送 project_delta 事件（event_fields 附加到每个事件中）
+        """
+        result = {'raw_output': '', 'analyses': {}, 'status': 'call_error', 'cached': False}
+        
+        # 内容未变化时直接复用缓存结果
+        cache_key = None
+        if self.cache:
+            cache_key = LLMResponseCache.make_key(project_prompt, self.config.app_id, PROMPT_VERSION)
+            cached = self.cache.get(cache_key)
+            analyses = validate_analyses(cached['json_data']) if cached else {}
+            if analyses:
+                result.update(
+                    raw_output=cached['raw_output'],
+                    analyses=analyses,
+                    status='ok',
+                    cached=True
+                )
+                logger.info(f"♻️ 项目 {project_name} 命中LLM缓存")
+                return result
+        
+        try:
+            # 流式调用时边接收边解析，输出结束即可得到结果
+            parser = IncrementalJSONParser()
+            on_delta = None
+            if on_event is not None:
+                self._emit(on_event, 'project_start', project_name, **event_fields)
+                
+                def on_delta(text):
+                    parser.feed(text)
+                    self._emit(on_event, 'project_delta', project_name, text=text, **event_fields)
+            response = self._call_application(project_prompt, on_delta)
             
-            project_content = content[start_pos:end_pos].strip()
-            if project_content:
-                projects.append({
-                    'name': project_name,
-                    'content': project_content
-                })
+            if response.status_code == HTTPStatus.OK:
+                raw_output = response.output.text.strip()
+                result['raw_output'] = raw_output
+                logger.info(f"项目 {project_name} AI输出长度: {len(raw_output)} 字符")
+                if not parser.text:
+                    parser.feed(raw_output)
+                
+                # 检查输出是否完整
+                if not parser.complete:
+                    logger.warning(f"⚠️ 项目 {project_name} 的输出可能被截断")
+                
+                # 解析JSON（截断时取最长的有效前缀）并校验字段
+                json_data = parser.result()
+                analyses = validate_analyses(json_data)
+                if analyses:
+                    result['analyses'] = analyses
+                    result['status'] = 'ok'
+                    if cache_key:
+                        self.cache.put(cache_key, self.config.app_id, PROMPT_VERSION, raw_output, json_data)
+                    logger.info(f"✅ 项目 {project_name} 处理完成")
+                else:
+                    result['status'] = 'json_error'
+                    logger.warning(f"⚠️ 项目 {project_name} JSON解析失败")
+            else:
+                logger.error(f"项目 {project_name} AI调用失败: {response.status_code}")
+        except CircuitOpenError:
+            # 熔断中：交给上层整体改用简单汇总，不再逐个项目等待
+            raise
+        except Exception as e:
+            logger.error(f"处理项目 {project_name} 时出错: {e}")
+        
+        return result
+    
+    def _analyze_project_chunks(self, project_name: str, project_contents: List[Dict], budget: int,
+                                on_event: Optional[EventCallback] = None) -> Dict:
+        """超出预算的项目：按来源切分为多个分片并发分析，再确定性地合并为一个项目JSON"""
+        blocks = [f"【来源：{pc['source']}】\n{pc['content']}" for pc in project_contents]
+        chunks = split_by_budget(blocks, budget)
+        prompts = [
+            self.create_unified_project_prompt(
+                project_name,
+                f"（该项目日报内容较长，已分为 {len(chunks)} 段分别分析，以下是第 {i} 段）\n\n{chunk}"
+            )
+            for i, chunk in enumerate(chunks, 1)
+        ]
+        
+        workers = max(1, min(self.config.max_workers, len(prompts)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ai-chunk') as executor:
+            parts = list(executor.map(
+                lambda item: self._run_project_prompt(project_name, item[1], on_event, chunk=item[0]),
+                enumerate(prompts, 1)
+            ))
+        
+        analyses = [analysis for analysis in (pick_project(part['analyses'], project_name) for part in parts) if analysis]
+        if analyses and len(analyses) < len(parts):
+            logger.warning(f"⚠️ 项目 {project_name} 有 {len(parts) - len(analyses)}/{len(parts)} 个分片分析失败，仅合并成功部分")
+        if analyses:
+            status = 'ok'
+        else:
+            status = 'json_error' if any(part['status'] == 'json_error' for part in parts) else 'call_error'
+        
+        return {
+            'raw_output': "\n\n".join(part['raw_output'] for part in parts if part['raw_output']),
+            'json_data': self._reduce_project_analyses(analyses) if analyses else None,
+            'status': status,
+            'cached': all(part['cached'] for part in parts),
+            'chunks': len(chunks)
+        }
+    
+    def _reduce_project_analyses(self, analyses: List[ProjectAnalysis]) -> ProjectAnalysis:
+        """把同一项目多个分片的分析结果合并为一个（结果只取决于分片顺序）"""
+        if len(analyses) == 1:
+            return analyses[0]
+        
+        def unique(items):
+            return list(dict.fromkeys(item for item in items if item))
+        
+        def worst(values, order):
+            ranked = [v for v in values if v in order]
+            return max(ranked, key=order.index) if ranked else (values[0] if values else "unknown")
+        
+        # 阶段：出现次数最多的确定阶段，次数相同时取先出现的
+        stages = [a.project_stage for a in analyses if a.project_stage not in UNKNOWN_VALUES]
+        project_stage = max(stages, key=lambda s: (stages.count(s), -stages.index(s))) if stages else "不确定"
+        
+        # 人员：同一角色的工作类型合并，负载取最高
+        personnel = {}
+        for analysis in analyses:
+            for role, info in analysis.personnel.items():
+                merged_role = personnel.get(role)
+                if merged_role is None:
+                    personnel[role] = info.model_copy()
+                    continue
+                merged_role.work_type = '、'.join(unique(merged_role.work_type.split('、') + [info.work_type]))
+                merged_role.load_status = worst([merged_role.load_status, info.load_status], LOAD_ORDER)
+        
+        # 风险信号：任一分片为 true 即为 true
+        signal_groups = [a.risk_signals.model_dump() for a in analyses if a.risk_signals]
+        risk_signals = None
+        if signal_groups:
+            merged_signals = {}
+            for signals in signal_groups:
+                for key, value in signals.items():
+                    merged_signals[key] = True if value is True else merged_signals.get(key, value)
+            risk_signals = RiskSignals.model_validate(merged_signals)
+        
+        health_status = worst([a.health_status for a in analyses], HEALTH_ORDER)
+        # 主要风险取健康度最差的分片
+        main_risk = next(
+            (a.main_risk for a in analyses if a.health_status == health_status and a.main_risk),
+            next((a.main_risk for a in analyses if a.main_risk), "")
+        )
+        
+        checks = [a.tomorrow_expectation_check for a in analyses if a.tomorrow_expectation_check]
+        tomorrow_check = ExpectationCheck(
+            reasonable=all(c.reasonable is True for c in checks),
+            optimistic_bias=any(c.optimistic_bias for c in checks),
+            missing_prerequisites=unique(item for c in checks for item in c.missing_prerequisites)
+        ) if checks else None
+        
+        reduced = ProjectAnalysis(
+            project_stage=project_stage,
+            key_events=unique(event for a in analyses for event in a.key_events),
+            personnel=personnel,
+            role_gaps=unique(gap for a in analyses for gap in a.role_gaps),
+            single_point_risk=any(a.single_point_risk for a in analyses),
+            health_status=health_status,
+            risk_signals=risk_signals,
+            main_risk=main_risk,
+            tomorrow_expectation_check=tomorrow_check
+        )
+        # 模板之外的字段保留第一个非空值
+        for analysis in analyses:
+            for key, value in (analysis.model_extra or {}).items():
+                if key not in reduced.model_extra and value not in (None, "", [], {}):
+                    reduced.model_extra[key] = value
+        return reduced
+    
+    def _build_timing(self, project_results: List[Dict], wall_time: float, workers: int) -> Dict:
+        """汇总各项目耗时，便于对比并发与串行的实际加速效果"""
+        sequential_time = sum(r['duration'] for r in project_results)
+        return {
+            'mode': 'concurrent' if workers > 1 else 'sequential',
+            'workers': workers,
+            'wall_time': round(wall_time, 3),
+            'sequential_time': round(sequential_time, 3),
+            'speedup': round(sequential_time / wall_time, 2) if wall_time > 0 else 1.0,
+            'cache_hits': sum(1 for r in project_results if r.get('cached')),
+            'packed': sum(1 for r in project_results if r.get('packed')),
+            'reused': sum(1 for r in project_results if r['status'] == 'reused'),
+            'projects': [
+                {
+                    'project_name': r['project_name'],
+                    'status': r['status'],
+                    'duration': r['duration'],
+                    'cached': r.get('cached', False),
+                    'chunks': r.get('chunks', 1),
+                    'packed': r.get('packed', 0)
+                }
+                for r in project_results
+            ]
+        }
+    
+    def _extract_projects_from_content(self, content: str) -> List[Dict[str, str]]:
+        """从个人日报内容中提取项目列表（按【项目】：标记单遍切分）"""
+        projects = split_projects(content)
         
         # 如果没有找到项目标记，返回整个内容作为一个项目
         if not projects:
@@ -580,42 +906,19 @@ Nicole: MyCoach 客户
             
             if self.config.app_id:
                 try:
-                    response = Application.call(
-                        api_key=self.config.api_key,
-                        app_id=self.config.app_id,
-                        prompt=project_prompt,
-                        temperature=0.1
-                    )
+                    response = self._call_application(project_prompt)
                     
                     if response.status_code == HTTPStatus.OK:
                         raw_output = response.output.text.strip()
                         logger.info(f"项目 {project_name} AI输出长度: {len(raw_output)} 字符")
                         
-                        # 检查输出是否完整
-                        if not self._is_json_complete(raw_output):
+                        # 解析JSON并检查输出是否完整
+                        json_data, complete = parse_json_text(raw_output)
+                        if not complete:
                             logger.warning(f"⚠️ 项目 {project_name} 的输出可能被截断")
-                        
-                        # 解析JSON
-                        json_data = self._extract_json_from_text(raw_output)
-                        if json_data:
-                            # 如果是多项目格式，提取当前项目的数据
-                            if isinstance(json_data.get("project_stage"), dict):
-                                # 多项目格式，提取当前项目
-                                project_data = {
-                                    "project_stage": json_data.get("project_stage", {}).get(project_name, "unknown"),
-                                    "key_events": json_data.get("key_events", {}).get(project_name, []),
-                                    "personnel": json_data.get("personnel", {}).get(project_name, {}),
-                                    "role_gaps": json_data.get("role_gaps", {}).get(project_name, []),
-                                    "single_point_risk": json_data.get("single_point_risk", {}).get(project_name, False) if isinstance(json_data.get("single_point_risk"), dict) else False,
-                                    "health_status": json_data.get("health_status", {}).get(project_name, "unknown"),
-                                    "risk_signals": json_data.get("risk_signals", {}).get(project_name, {}),
-                                    "main_risk": json_data.get("main_risk", {}).get(project_name, "") if isinstance(json_data.get("main_risk"), dict) else "",
-                                    "tomorrow_expectation_check": json_data.get("tomorrow_expectation_check", {}).get(project_name, {})
-                                }
-                            else:
-                                # 单项目格式，直接使用
-                                project_data = json_data
-                            
+                        # 单项目和多项目格式统一校验，多项目格式时取出当前项目
+                        project_data = pick_project(validate_analyses(json_data), project_name)
+                        if project_data:
                             all_project_results[project_name] = project_data
                             
                             # 保存项目数据
@@ -629,7 +932,6 @@ Nicole: MyCoach 客户
                             logger.info(f"✅ 项目 {project_name} 处理完成")
                         else:
                             logger.warning(f"⚠️ 项目 {project_name} JSON解析失败，使用原始输出")
-                            all_project_results[project_name] = {"raw_output": raw_output}
                             
                             # 即使JSON解析失败，也保存原始数据
                             project_data_list.append({
@@ -640,15 +942,12 @@ Nicole: MyCoach 客户
                             })
                     else:
                         logger.error(f"项目 {project_name} AI调用失败: {response.status_code}")
-                        all_project_results[project_name] = {"error": f"调用失败: {response.status_code}"}
                 except Exception as e:
                     logger.error(f"处理项目 {project_name} 时出错: {e}")
-                    all_project_results[project_name] = {"error": str(e)}
         
-        # 合并所有项目的结果为多项目格式
+        # 按多项目格式生成报告（解析失败的项目不计入）
         if all_project_results:
-            merged_json = self._merge_project_results(all_project_results)
-            summary = self._convert_personal_json_to_report(merged_json, "")
+            summary = self._convert_analyses_to_report(all_project_results)
             return {
                 'summary': summary,
                 'project_data': project_data_list
@@ -659,148 +958,22 @@ Nicole: MyCoach 客户
                 'project_data': []
             }
     
-    def _merge_project_results(self, project_results: Dict[str, Dict]) -> Dict:
-        """合并多个项目的处理结果"""
-        merged = {
-            "project_stage": {},
-            "key_events": {},
-            "personnel": {},
-            "role_gaps": {},
-            "single_point_risk": {},
-            "health_status": {},
-            "risk_signals": {},
-            "main_risk": {},
-            "tomorrow_expectation_check": {}
-        }
-        
-        for project_name, data in project_results.items():
-            if "error" in data or "raw_output" in data:
-                # 跳过错误或原始输出
-                continue
-            
-            merged["project_stage"][project_name] = data.get("project_stage", "unknown")
-            merged["key_events"][project_name] = data.get("key_events", [])
-            merged["personnel"][project_name] = data.get("personnel", {})
-            merged["role_gaps"][project_name] = data.get("role_gaps", [])
-            merged["single_point_risk"][project_name] = data.get("single_point_risk", False)
-            merged["health_status"][project_name] = data.get("health_status", "unknown")
-            merged["risk_signals"][project_name] = data.get("risk_signals", {})
-            merged["main_risk"][project_name] = data.get("main_risk", "")
-            merged["tomorrow_expectation_check"][project_name] = data.get("tomorrow_expectation_check", {})
-        
-        return merged
-    
-    def _is_json_complete(self, text: str) -> bool:
-        """检查JSON是否完整（简单的括号匹配检查）"""
-        # 查找第一个 { 和最后一个 }
-        start_idx = text.find('{')
-        if start_idx == -1:
-            return False
-        
-        # 统计括号匹配
-        brace_count = 0
-        bracket_count = 0
-        in_string = False
-        escape_next = False
-        
-        for i in range(start_idx, len(text)):
-            char = text[i]
-            
-            if escape_next:
-                escape_next = False
-                continue
-            
-            if char == '\\':
-                escape_next = True
-                continue
-            
-            if char == '"' and not escape_next:
-                in_string = not in_string
-                continue
-            
-            if not in_string:
-                if char == '{':
-                    brace_count += 1
-                elif char == '}':
-                    brace_count -= 1
-                elif char == '[':
-                    bracket_count += 1
-                elif char == ']':
-                    bracket_count -= 1
-        
-        # 如果括号都匹配，说明JSON可能完整
-        return brace_count == 0 and bracket_count == 0
-    
     def process_team_reports_individually(self, team_reports: List[Dict]) -> str:
-        """两阶段处理：先分别处理每个人的日报，再整体整合"""
+        """两阶段处理：先分别处理每个人的日报（并发），再树形整合"""
         try:
-            logger.info(f"开始两阶段处理 {len(team_reports)} 份团队日报")
-            
-            # 第一阶段：分别处理每个人的日报
-            individual_summaries = []
+            workers = max(1, min(self.config.max_workers, len(team_reports)))
+            logger.info(f"开始两阶段处理 {len(team_reports)} 份团队日报 (并发数: {workers})")
             
-            for i, report in enumerate(team_reports, 1):
-                logger.info(f"=== 第一阶段：处理第 {i}/{len(team_reports)} 份团队日报 ===")
-                logger.info(f"发件人: {report['from']}")
-                logger.info(f"主题: {report['subject']}")
-                logger.info(f"内容长度: {len(report['body'])} 字符")
-                
-                # 为单个日报创建AI提示词
-                single_report_prompt = self.create_single_team_report_prompt(report)
-                logger.info(f"单个日报提示词长度: {len(single_report_prompt)} 字符")
-                
-                if self.config.app_id:
-                    logger.info(f"调用AI处理第 {i} 份日报...")
-                    # Application.call 不支持 max_tokens 参数，需要在百炼控制台的应用设置中配置
-                    response = Application.call(
-                        api_key=self.config.api_key,
-                        app_id=self.config.app_id,
-                        prompt=single_report_prompt,
-                        temperature=0.1
-                    )
-                    
-                    if response.status_code == HTTPStatus.OK:
-                        raw_output = response.output.text.strip()
-                        logger.info(f"AI原始输出长度: {len(raw_output)} 字符")
-                        logger.info(f"AI原始输出预览2: {raw_output}...")
-                        
-                        # 尝试解析JSON
-                        json_data = self._extract_json_from_text(raw_output)
-                        if json_data:
-                            logger.info("✅ 成功解析JSON数据")
-                            # 转换为报告格式
-                            summary = self._convert_json_to_report(json_data, raw_output)
-                            logger.info(f"✅ JSON转换为报告格式完成，报告长度: {len(summary)} 字符")
-                        else:
-                            logger.warning("⚠️ 无法解析JSON，使用原始输出")
-                            summary = raw_output
-                        
-                        individual_summaries.append({
-                            'from': report['from'],
-                            'username': report['from'].split('@')[0],
-                            'subject': report['subject'],
-                            'summary': summary
-                        })
-                        logger.info(f"✅ 第 {i} 份日报AI汇总完成，汇总长度: {len(summary)} 字符")
-                        logger.info(f"汇总预览: {summary[:200]}...")
-                    else:
-                        logger.error(f"❌ 第 {i} 份日报AI调用失败: {response.status_code}")
-                        fallback_summary = f"AI处理失败，原始内容：{report['body'][:300]}..."
-                        individual_summaries.append({
-                            'from': report['from'],
-                            'username': report['from'].split('@')[0],
-                            'subject': report['subject'],
-                            'summary': fallback_summary
-                        })
-                else:
-                    logger.warning(f"⚠️ 未配置AI，使用原始内容作为第 {i} 份日报的汇总")
-                    fallback_summary = f"原始内容：{report['body'][:300]}..."
-                    individual_summaries.append({
-                        'from': report['from'],
-                        'username': report['from'].split('@')[0],
-                        'subject': report['subject'],
-                        'summary': fallback_summary
-                    })
+            # 第一阶段：分别处理每个人的日报，结果顺序与日报顺序一致
+            total = len(team_reports)
+            jobs = list(enumerate(team_reports, 1))
+            if workers > 1:
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ai-member') as executor:
+                    individual_summaries = list(executor.map(
+                        lambda job: self._summarize_team_report(job[0], total, job[1]), jobs
+                    ))
+            else:
+                individual_summaries = [self._summarize_team_report(i, total, report) for i, report in jobs]
             
             # 第二阶段：整体整合所有个人汇总
             logger.info("=== 第二阶段：整体整合所有个人汇总 ===")
@@ -815,6 +988,61 @@ Nicole: MyCoach 客户
             logger.error(traceback.format_exc())
             return self.create_simple_team_summary(team_reports)
     
+    def _summarize_team_report(self, i: int, total: int, report: Dict) -> Dict:
+        """第一阶段：处理单份团队日报，返回个人汇总"""
+        logger.info(f"=== 第一阶段：处理第 {i}/{total} 份团队日报 ===")
+        logger.info(f"发件人: {report['from']}")
+        logger.info(f"主题: {report['subject']}")
+        logger.info(f"内容长度: {len(report['body'])} 字符")
+        
+        individual = {
+            'from': report['from'],
+            'username': report['from'].split('@')[0],
+            'subject': report['subject']
+        }
+        
+        if not self.config.app_id:
+            logger.warning(f"⚠️ 未配置AI，使用原始内容作为第 {i} 份日报的汇总")
+            individual['summary'] = f"原始内容：{report['body'][:300]}..."
+            return individual
+        
+        # 为单个日报创建AI提示词
+        single_report_prompt = self.create_single_team_report_prompt(report)
+        logger.info(f"单个日报提示词长度: {len(single_report_prompt)} 字符")
+        
+        logger.info(f"调用AI处理第 {i} 份日报...")
+        try:
+            response = self._call_application(single_report_prompt)
+        except Exception as e:
+            # 单份日报超时或熔断时只影响这一份，其他成员的汇总照常整合
+            logger.error(f"❌ 第 {i} 份日报AI调用出错: {e}")
+            individual['summary'] = f"AI处理失败，原始内容：{report['body'][:300]}..."
+            return individual
+        
+        if response.status_code == HTTPStatus.OK:
+            raw_output = response.output.text.strip()
+            logger.info(f"AI原始输出长度: {len(raw_output)} 字符")
+            logger.info(f"AI原始输出预览2: {raw_output}...")
+            
+            # 尝试解析JSON
+            json_data = self._extract_json_from_text(raw_output)
+            if json_data:
+                logger.info("✅ 成功解析JSON数据")
+                # 转换为报告格式
+                summary = self._convert_json_to_report(json_data, raw_output)
+                logger.info(f"✅ JSON转换为报告格式完成，报告长度: {len(summary)} 字符")
+            else:
+                logger.warning("⚠️ 无法解析JSON，使用原始输出")
+                summary = raw_output
+            
+            individual['summary'] = summary
+            logger.info(f"✅ 第 {i} 份日报AI汇总完成，汇总长度: {len(summary)} 字符")
+            logger.info(f"汇总预览: {summary[:200]}...")
+        else:
+            logger.error(f"❌ 第 {i} 份日报AI调用失败: {response.status_code}")
+            individual['summary'] = f"AI处理失败，原始内容：{report['body'][:300]}..."
+        return individual
+    
     def create_single_team_report_prompt(self, report: Dict) -> str:
         """为单个团队成员日报创建AI提示词（使用新的结构化分析提示词）"""
         # 系统提示词
@@ -917,41 +1145,88 @@ Nicole: MyCoach 客户
         return prompt
     
     def integrate_team_summaries(self, individual_summaries: List[Dict]) -> str:
-        """第二阶段：整体整合所有个人汇总"""
+        """第二阶段：整体整合所有个人汇总
+        
+        汇总数超过 TEAM_REDUCE_GROUP_SIZE 时按组树形整合：每组先整合为一份中间汇总，
+        逐层归并直到一组以内再做最终整合，同一层的各组并发调用
+        """
         try:
             logger.info(f"开始整合 {len(individual_summaries)} 个个人汇总")
             
-            # 构建整合提示词
-            integration_prompt = self.create_team_integration_prompt(individual_summaries)
-            logger.info(f"整合提示词长度: {len(integration_prompt)} 字符")
-            
-            if self.config.app_id:
-                logger.info("调用AI进行团队汇总整合...")
-                # Application.call 不支持 max_tokens 参数，需要在百炼控制台的应用设置中配置
-                response = Application.call(
-                    api_key=self.config.api_key,
-                    app_id=self.config.app_id,
-                    prompt=integration_prompt,
-                    temperature=0.1
-                )
-                
-                if response.status_code == HTTPStatus.OK:
-                    integrated_summary = response.output.text.strip()
-                    logger.info(f"✅ 团队汇总整合完成，长度: {len(integrated_summary)} 字符")
-                    return integrated_summary
-                else:
-                    logger.error(f"❌ 团队汇总整合AI调用失败: {response.status_code}")
-                    # 降级到原来的合并方法
-                    return self.combine_individual_summaries(individual_summaries)
-            else:
+            if not self.config.app_id:
                 logger.warning("⚠️ 未配置AI，使用简单合并方法")
                 return self.combine_individual_summaries(individual_summaries)
+            
+            summaries = individual_summaries
+            level = 0
+            while len(summaries) > TEAM_REDUCE_GROUP_SIZE:
+                level += 1
+                summaries = self._reduce_team_level(summaries, level)
+            
+            logger.info("调用AI进行团队汇总整合...")
+            integrated_summary = self._integrate_team_group(summaries)
+            if integrated_summary is None:
+                # 降级到原来的合并方法
+                return self.combine_individual_summaries(individual_summaries)
+            logger.info(f"✅ 团队汇总整合完成，长度: {len(integrated_summary)} 字符")
+            return integrated_summary
                 
         except Exception as e:
             logger.error(f"❌ 团队汇总整合失败: {e}")
             # 降级到原来的合并方法
             return self.combine_individual_summaries(individual_summaries)
     
+    def _integrate_team_group(self, summaries: List[Dict]) -> Optional[str]:
+        """对一组汇总调用一次AI整合，调用失败返回None"""
+        integration_prompt = self.create_team_integration_prompt(summaries)
+        logger.info(f"整合提示词长度: {len(integration_prompt)} 字符")
+        response = self._call_application(integration_prompt)
+        if response.status_code == HTTPStatus.OK:
+            return response.output.text.strip()
+        logger.error(f"❌ 团队汇总整合AI调用失败: {response.status_code}")
+        return None
+    
+    def _reduce_team_level(self, summaries: List[Dict], level: int) -> List[Dict]:
+        """树形整合的一层：每 TEAM_REDUCE_GROUP_SIZE 个汇总整合为一个中间汇总，组的顺序保持不变"""
+        groups = [summaries[i:i + TEAM_REDUCE_GROUP_SIZE]
+                  for i in range(0, len(summaries), TEAM_REDUCE_GROUP_SIZE)]
+        workers = max(1, min(self.config.max_workers, len(groups)))
+        logger.info(f"=== 第 {level} 层整合: {len(summaries)} 个汇总分为 {len(groups)} 组 (并发数: {workers}) ===")
+        
+        def reduce_group(job):
+            index, group = job
+            members = [member for summary in group for member in summary.get('members', [summary['username']])]
+            names = '、'.join(members) if len(members) <= TEAM_REDUCE_GROUP_SIZE else f"{'、'.join(members[:3])}等{len(members)}人"
+            label = f"第{level}层第{index}组（{names}）"
+            try:
+                summary = self._integrate_team_group(group)
+            except Exception as e:
+                logger.error(f"❌ {label} 整合出错: {e}")
+                summary = None
+            if summary is None:
+                logger.warning(f"⚠️ {label} 整合失败，使用简单合并")
+                # 第一层是个人汇总，可以按项目进展/风险合并；更高层是中间汇总，直接拼接
+                summary = self.combine_individual_summaries(group) if level == 1 else self._concat_team_summaries(group)
+            logger.info(f"✅ {label} 整合完成，长度: {len(summary)} 字符")
+            return {
+                'from': label,
+                'username': label,
+                'subject': label,
+                'members': members,
+                'summary': summary
+            }
+        
+        jobs = list(enumerate(groups, 1))
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ai-reduce') as executor:
+                return list(executor.map(reduce_group, jobs))
+        return [reduce_group(job) for job in jobs]
+    
+    @staticmethod
+    def _concat_team_summaries(summaries: List[Dict]) -> str:
+        """直接拼接各中间汇总（其中没有个人汇总的项目进展/风险标记，无法按 combine_individual_summaries 合并）"""
+        return '\n\n'.join(f"【{summary['username']}】\n{summary['summary']}" for summary in summaries)
+    
     def create_team_integration_prompt(self, individual_summaries: List[Dict]) -> str:
         """创建团队整合的AI提示词"""
         # 构建所有个人汇总的文本
@@ -1089,339 +1364,33 @@ Nicole: MyCoach 客户
         return text.strip()
     
     def _extract_json_from_text(self, text: str) -> Optional[Dict]:
-        """从文本中提取JSON内容（支持处理被截断的JSON）"""
-        try:
-            # 尝试直接解析整个文本
-            return json.loads(text)
-        except json.JSONDecodeError:
-            # 如果失败，尝试提取JSON部分
-            # 查找第一个 { 和最后一个 }
-            start_idx = text.find('{')
-            end_idx = text.rfind('}')
-            
-            if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
-                json_str = text[start_idx:end_idx + 1]
-                try:
-                    return json.loads(json_str)
-                except json.JSONDecodeError as e:
-                    # JSON可能被截断，尝试修复
-                    logger.warning(f"JSON解析失败，尝试修复截断的JSON: {e}")
-                    fixed_json = self._try_fix_truncated_json(json_str)
-                    if fixed_json:
-                        try:
-                            return json.loads(fixed_json)
-                        except json.JSONDecodeError:
-                            pass
-            
-            # 尝试查找代码块中的JSON
-            json_pattern = r'```(?:json)?\s*(\{.*?\})\s*```'
-            match = re.search(json_pattern, text, re.DOTALL)
-            if match:
-                try:
-                    return json.loads(match.group(1))
-                except json.JSONDecodeError:
-                    pass
-            
-            # 如果都失败了，尝试从第一个 { 开始提取，即使没有闭合
-            if start_idx != -1:
-                # 尝试找到最后一个可能的闭合位置
-                json_str = text[start_idx:]
-                fixed_json = self._try_fix_truncated_json(json_str)
-                if fixed_json:
-                    try:
-                        return json.loads(fixed_json)
-                    except json.JSONDecodeError:
-                        pass
-            
+        """从文本中提取JSON内容（支持说明文字、代码块和被截断的JSON）"""
+        json_data, complete = parse_json_text(text)
+        if json_data is None:
             logger.warning("无法从AI输出中提取有效的JSON")
             logger.warning(f"原始输出长度: {len(text)} 字符")
             logger.warning(f"原始输出末尾100字符: {text[-100:]}")
-            return None
-    
-    def _try_fix_truncated_json(self, json_str: str) -> Optional[str]:
-        """尝试修复被截断的JSON"""
-        try:
-            # 统计括号和引号的匹配情况
-            open_braces = json_str.count('{')
-            close_braces = json_str.count('}')
-            open_brackets = json_str.count('[')
-            close_brackets = json_str.count(']')
-            
-            # 如果缺少闭合括号，尝试添加
-            fixed = json_str
-            missing_braces = open_braces - close_braces
-            missing_brackets = open_brackets - close_brackets
-            
-            # 检查是否在字符串中间被截断（引号未闭合）
-            # 简单检查：如果最后一个字符不是 } 或 ]，可能被截断
-            if fixed and fixed[-1] not in ['}', ']', '"', "'"]:
-                # 移除可能未完成的最后一个键值对
-                # 查找最后一个完整的键值对
-                last_comma = fixed.rfind(',')
-                if last_comma != -1:
-                    # 检查最后一个逗号后面是否有完整的键值对
-                    after_comma = fixed[last_comma + 1:].strip()
-                    if not after_comma or (':' not in after_comma and not after_comma.startswith('"')):
-                        # 移除最后一个不完整的键值对
-                        fixed = fixed[:last_comma]
-            
-            # 添加缺失的闭合括号
-            if missing_brackets > 0:
-                fixed += ']' * missing_brackets
-            if missing_braces > 0:
-                fixed += '}' * missing_braces
-            
-            # 如果修复后仍然无法解析，返回None
-            return fixed if fixed != json_str else None
-            
-        except Exception as e:
-            logger.warning(f"修复JSON时出错: {e}")
-            return None
+        elif not complete:
+            logger.warning(f"JSON被截断，已保留最长的有效部分（{len(json_data)} 个字段）")
+        return json_data
     
-    def _convert_personal_json_to_report(self, json_data: Dict, original_summary: str = "") -> str:
-        """将个人日报的JSON分析结果转换为可读的报告格式（使用与团队日报相同的结构）"""
-        try:
-            # 使用与团队日报相同的转换方法
-            report = self._convert_json_to_report(json_data, original_summary)
-            return report
-            
-        except Exception as e:
-            logger.error(f"转换个人日报JSON到报告格式时出错: {e}")
-            # 如果转换失败，返回原始摘要或简单格式
-            if original_summary:
-                return f"# 个人工作总结\n\n{original_summary}"
-            return "# 个人工作总结\n\n（JSON解析失败，使用原始内容）"
+    def _convert_analyses_to_report(self, analyses: Dict[str, ProjectAnalysis]) -> str:
+        """多项目分析结果转换为报告，按项目名称排序保证输出顺序一致"""
+        logger.info(f"检测到多项目格式，项目数量: {len(analyses)}")
+        return render_analyses(analyses, formats=('markdown',)).markdown
     
-    def _convert_single_project_json(self, project_name: str, project_data: Dict) -> str:
-        """转换单个项目的JSON数据为报告格式（project_data已经是扁平化的单个项目数据）"""
-        report = f"### 【{project_name}】\n\n"
-        
-        # 一、事实抽取
-        report += "**一、事实抽取**\n"
-        project_stage = project_data.get("project_stage", "unknown")
-        report += f"- 当前项目阶段：{project_stage}\n"
-        
-        key_events = project_data.get("key_events", [])
-        if key_events:
-            report += "- 今日关键事件：\n"
-            for event in key_events:
-                report += f"  • {event}\n"
-        else:
-            report += "- 今日关键事件：无\n"
-        
-        personnel = project_data.get("personnel", {})
-        if personnel and isinstance(personnel, dict):
-            report += "- 人员投入情况：\n"
-            for person_name, info in personnel.items():
-                if isinstance(info, dict):
-                    role = info.get("role", "未知")
-                    work_type = info.get("work_type", "未知")
-                    load_status = info.get("load_status", "未知")
-                    report += f"  • {person_name}（{role}）：{work_type}（{load_status}）\n"
-        else:
-            report += "- 人员投入情况：无相关信息\n"
-        
-        # 二、人力占用与饱和度
-        report += "\n**二、人力占用分析**\n"
-        role_gaps = project_data.get("role_gaps", [])
-        if role_gaps:
-            report += "- 角色缺位：\n"
-            for gap in role_gaps:
-                report += f"  • {gap}\n"
-        else:
-            report += "- 角色缺位：无\n"
-        
-        single_point_risk = project_data.get("single_point_risk", False)
-        report += f"- 单点风险：{'是' if single_point_risk else '否'}\n"
-        
-        # 三、项目态势判断
-        report += "\n**三、项目态势判断**\n"
-        health_status = project_data.get("health_status", "unknown")
-        status_map = {
-            "green": "🟢 健康",
-            "yellow": "🟡 需关注",
-            "red": "🔴 有风险",
-            "unknown": "❓ 不确定"
-        }
-        report += f"- 项目健康度：{status_map.get(health_status, health_status)}\n"
-        
-        risk_signals = project_data.get("risk_signals", {})
-        if risk_signals and isinstance(risk_signals, dict):
-            report += "- 风险信号：\n"
-            signal_map = {
-                "fake_progress": "假推进",
-                "delay_risk": "隐性延期风险",
-                "requirement_unstable": "需求或决策不稳定",
-                "external_block": "外部依赖阻塞"
-            }
-            for key, desc in signal_map.items():
-                value = risk_signals.get(key, "不确定")
-                if isinstance(value, bool):
-                    value = "是" if value else "否"
-                report += f"  • {desc}：{value}\n"
-        
-        main_risk = project_data.get("main_risk", "")
-        if main_risk:
-            report += f"- 主要风险：{main_risk}\n"
-        else:
-            report += "- 主要风险：无\n"
-        
-        # 四、短期预期一致性检查
-        report += "\n**四、短期预期检查**\n"
-        expectation_check = project_data.get("tomorrow_expectation_check", {})
-        if expectation_check and isinstance(expectation_check, dict):
-            reasonable = expectation_check.get("reasonable", True)
-            report += f"- 预期合理性：{'合理' if reasonable else '存在偏差'}\n"
-            
-            optimistic_bias = expectation_check.get("optimistic_bias", False)
-            if optimistic_bias:
-                report += "- 乐观偏差：是\n"
-            
-            missing_prerequisites = expectation_check.get("missing_prerequisites", [])
-            if missing_prerequisites:
-                report += "- 缺失前置条件：\n"
-                for pre in missing_prerequisites:
-                    report += f"  • {pre}\n"
-        else:
-            report += "- 预期合理性：无法判断\n"
-        
-        return report
-    
-    def _convert_json_to_report(self, json_data: Dict, original_summary: str = "") -> str:
+    def _convert_json_to_report(self, json_data: Optional[Dict], original_summary: str = "") -> str:
         """将JSON分析结果转换为可读的报告格式（支持单项目和多项目格式）"""
-        try:
-            # 检测是否为多项目格式
-            project_stage = json_data.get("project_stage", "unknown")
-            is_multi_project = isinstance(project_stage, dict)
-            
-            if is_multi_project:
-                # 多项目格式：按项目分别处理
-                logger.info(f"检测到多项目格式，项目数量: {len(project_stage)}")
-                report = "**项目分析报告（多项目）：**\n\n"
-                
-                # 按项目名称排序，确保输出顺序一致
-                project_names = sorted(project_stage.keys())
-                
-                for project_name in project_names:
-                    # 为每个项目构建项目数据
-                    project_data = {
-                        "project_stage": project_stage.get(project_name, "unknown"),
-                        "key_events": json_data.get("key_events", {}).get(project_name, []) if isinstance(json_data.get("key_events"), dict) else [],
-                        "personnel": json_data.get("personnel", {}).get(project_name, {}) if isinstance(json_data.get("personnel"), dict) else {},
-                        "role_gaps": json_data.get("role_gaps", {}).get(project_name, []) if isinstance(json_data.get("role_gaps"), dict) else [],
-                        "single_point_risk": json_data.get("single_point_risk", {}).get(project_name, False) if isinstance(json_data.get("single_point_risk"), dict) else False,
-                        "health_status": json_data.get("health_status", {}).get(project_name, "unknown") if isinstance(json_data.get("health_status"), dict) else "unknown",
-                        "risk_signals": json_data.get("risk_signals", {}).get(project_name, {}) if isinstance(json_data.get("risk_signals"), dict) else {},
-                        "main_risk": json_data.get("main_risk", {}).get(project_name, "") if isinstance(json_data.get("main_risk"), dict) else "",
-                        "tomorrow_expectation_check": json_data.get("tomorrow_expectation_check", {}).get(project_name, {}) if isinstance(json_data.get("tomorrow_expectation_check"), dict) else {}
-                    }
-                    
-                    # 转换单个项目
-                    project_report = self._convert_single_project_json(project_name, project_data)
-                    report += project_report + "\n\n"
-                
-                return report
-            else:
-                # 单项目格式：使用原有逻辑
-                report = "**项目分析报告：**\n\n"
-                
-                # 一、事实抽取
-                report += "**一、事实抽取**\n"
-                report += f"- 当前项目阶段：{project_stage}\n"
-                
-                key_events = json_data.get("key_events", [])
-                if key_events:
-                    report += "- 今日关键事件：\n"
-                    for event in key_events:
-                        report += f"  • {event}\n"
-                else:
-                    report += "- 今日关键事件：无\n"
-                
-                personnel = json_data.get("personnel", {})
-                if personnel:
-                    report += "- 人员投入情况：\n"
-                    for role, info in personnel.items():
-                        if isinstance(info, dict):
-                            work_type = info.get("work_type", "未知")
-                            load_status = info.get("load_status", "未知")
-                            report += f"  • {role}：{work_type}（{load_status}）\n"
-                else:
-                    report += "- 人员投入情况：无相关信息\n"
-                
-                # 二、人力占用与饱和度
-                report += "\n**二、人力占用分析**\n"
-                role_gaps = json_data.get("role_gaps", [])
-                if role_gaps:
-                    report += "- 角色缺位：\n"
-                    for gap in role_gaps:
-                        report += f"  • {gap}\n"
-                else:
-                    report += "- 角色缺位：无\n"
-                
-                single_point_risk = json_data.get("single_point_risk", False)
-                report += f"- 单点风险：{'是' if single_point_risk else '否'}\n"
-                
-                # 三、项目态势判断
-                report += "\n**三、项目态势判断**\n"
-                health_status = json_data.get("health_status", "unknown")
-                status_map = {
-                    "green": "🟢 健康",
-                    "yellow": "🟡 需关注",
-                    "red": "🔴 有风险",
-                    "unknown": "❓ 不确定"
-                }
-                report += f"- 项目健康度：{status_map.get(health_status, health_status)}\n"
-                
-                risk_signals = json_data.get("risk_signals", {})
-                if risk_signals:
-                    report += "- 风险信号：\n"
-                    signal_map = {
-                        "fake_progress": "假推进",
-                        "delay_risk": "隐性延期风险",
-                        "requirement_unstable": "需求或决策不稳定",
-                        "external_block": "外部依赖阻塞"
-                    }
-                    for key, desc in signal_map.items():
-                        value = risk_signals.get(key, "不确定")
-                        if isinstance(value, bool):
-                            value = "是" if value else "否"
-                        report += f"  • {desc}：{value}\n"
-                
-                main_risk = json_data.get("main_risk", "")
-                if main_risk:
-                    report += f"- 主要风险：{main_risk}\n"
-                else:
-                    report += "- 主要风险：无\n"
-                
-                # 四、短期预期一致性检查
-                report += "\n**四、短期预期检查**\n"
-                expectation_check = json_data.get("tomorrow_expectation_check", {})
-                if expectation_check:
-                    reasonable = expectation_check.get("reasonable", True)
-                    report += f"- 预期合理性：{'合理' if reasonable else '存在偏差'}\n"
-                    
-                    optimistic_bias = expectation_check.get("optimistic_bias", False)
-                    if optimistic_bias:
-                        report += "- 乐观偏差：是\n"
-                    
-                    missing_prerequisites = expectation_check.get("missing_prerequisites", [])
-                    if missing_prerequisites:
-                        report += "- 缺失前置条件：\n"
-                        for pre in missing_prerequisites:
-                            report += f"  • {pre}\n"
-                else:
-                    report += "- 预期合理性：无法判断\n"
-                
-                return report
-            
-        except Exception as e:
-            logger.error(f"转换JSON到报告格式时出错: {e}")
-            import traceback
-            logger.error(traceback.format_exc())
-            # 如果转换失败，返回原始摘要或简单格式
+        analyses = validate_analyses(json_data)
+        if not analyses:
+            # 格式无法识别时返回原始摘要或简单格式
             if original_summary:
                 return f"**项目分析报告：**\n\n{original_summary}"
             return "**项目分析报告：**\n\n（JSON解析失败，使用原始内容）"
+        
+        if SINGLE_PROJECT in analyses:
+            return render_analysis(analyses[SINGLE_PROJECT], formats=('markdown',)).markdown
+        return self._convert_analyses_to_report(analyses)
     
     def summarize_reports(self, reports: List[Dict]) -> str:
         """汇总日报 - 保持向后兼容"""
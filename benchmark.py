@@ -0,0 +1,564 @@
+#!/usr/bin/env python3
+"""
+智能日报系统 - 性能基准脚本
+
+用法:
+    python benchmark.py decode [--corpus 邮件目录] [--rounds 5]
+    python benchmark.py html [--corpus HTML目录] [--rounds 5]
+    python benchmark.py json [--corpus 模型输出目录 | --cache llm_cache.db] [--rounds 5]
+    python benchmark.py summarize [--backend fake|replay] [--latency 0.5] [--projects 12] [--workers 4]
+    python benchmark.py format [--corpus Markdown目录] [--projects 200] [--rounds 5]
+
+不指定 --corpus 时使用内置的中文日报样例：
+    decode - UTF-8 / GBK / GB18030 / BIG5，base64 与 quoted-printable 传输编码混合
+    html   - Outlook 风格（大量内联样式和条件注释）的HTML日报
+    json   - 项目分析JSON输出：纯JSON、带说明文字和代码块、在不同位置被截断
+    summarize - 完整的项目汇总流程，LLM由离线后端代替（fake 规则模拟 / replay 回放记录），无需密钥
+    format - 大型多项目汇总报告（含代码块、链接、行内代码）转换为邮件纯文本
+"""
+
+import argparse
+import base64
+import email
+import json
+import quopri
+import re
+import sqlite3
+import sys
+import time
+from email.message import Message
+from pathlib import Path
+from typing import Callable, List, Optional
+
+SAMPLE_REPORT = """【项目】：智慧园区二期
+【今日进展】：完成门禁系统联调，修复考勤数据同步延迟问题；与客户确认验收计划。
+【风险】：硬件到货延期 3 天，可能影响下周的现场部署。
+【明日计划】：推进停车场道闸接口对接，整理验收文档。
+
+【项目】：数据中台
+【今日进展】：ETL 任务迁移完成 80%，新增 12 张主题表；优化慢查询，平均耗时下降 45%。
+【问题】：历史数据存在重复主键，需要业务方确认清洗规则。
+"""
+
+
+TRADITIONAL_REPORT = """【項目】：智慧園區二期
+【今日進展】：完成門禁系統聯調，修復考勤資料同步延遲問題；與客戶確認驗收計劃。
+【風險】：硬體到貨延期 3 天，可能影響下週的現場部署。
+"""
+
+
+def _make_message(body: bytes, charset: str, transfer: str) -> Message:
+    if transfer == 'base64':
+        payload = base64.encodebytes(body)
+    elif transfer == 'quoted-printable':
+        payload = quopri.encodestring(body)
+    else:
+        payload = body
+    content_type = f'text/plain; charset="{charset}"' if charset else 'text/plain'
+    head = f'Content-Type: {content_type}\r\nContent-Transfer-Encoding: {transfer}\r\n\r\n'
+    return email.message_from_bytes(head.encode('ascii') + payload)
+
+
+def _sample_messages() -> List[Message]:
+    """生成内置样例邮件（不同字符集和传输编码的组合）"""
+    messages = []
+    text = SAMPLE_REPORT * 20
+    samples = (
+        ('utf-8', text.encode('utf-8')),
+        ('gb2312', text.encode('gbk')),
+        ('gbk', text.encode('gbk')),
+        ('gb18030', (text + '〇㐀').encode('gb18030')),
+        ('big5', (TRADITIONAL_REPORT * 30).encode('big5')),
+        # 未声明字符集的 GBK 邮件（常见于老旧客户端）
+        (None, text.encode('gbk')),
+    )
+    for charset, body in samples:
+        for transfer in ('base64', 'quoted-printable', '8bit'):
+            messages.append(_make_message(body, charset, transfer))
+    return messages
+
+
+def _load_corpus(path: str) -> List[Message]:
+    """读取目录下的 .eml 文件"""
+    messages = []
+    for file in sorted(Path(path).glob('**/*.eml')):
+        messages.append(email.message_from_bytes(file.read_bytes()))
+    return messages
+
+
+def _legacy_decode(part) -> str:
+    """旧版解码逻辑：utf-8 -> gbk -> str(bytes)"""
+    payload = part.get_payload(decode=True)
+    try:
+        return payload.decode('utf-8')
+    except:
+        try:
+            return payload.decode('gbk')
+        except:
+            return str(payload)
+
+
+def _time_it(func: Callable, items: list, rounds: int) -> float:
+    """返回 rounds 轮中最快一轮的耗时（秒）"""
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for item in items:
+            func(item)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _report(name: str, seconds: float, total_bytes: int, baseline: float = None, extra: str = ''):
+    mb = total_bytes / 1024 / 1024
+    line = f"  {name:<24} {seconds * 1000:9.2f} ms   {mb / seconds:8.1f} MB/s"
+    line += f"   x{baseline / seconds:.2f}" if baseline else " " * 9
+    print(line + (f"   {extra}" if extra else ''))
+
+
+def bench_decode(args):
+    """正文字符集解码吞吐量"""
+    from mail_decode import decode_part
+
+    messages = _load_corpus(args.corpus) if args.corpus else _sample_messages()
+    parts = [
+        part for msg in messages for part in msg.walk()
+        if not part.is_multipart() and part.get_content_maintype() == 'text'
+    ]
+    if not parts:
+        print("❌ 没有可用的文本段")
+        return 1
+
+    total_bytes = sum(len(part.get_payload(decode=True) or b'') for part in parts)
+    print(f"📦 样本: {len(parts)} 个文本段, {total_bytes / 1024:.1f} KB, 最快 {args.rounds} 轮")
+
+    mismatched = sum(1 for part in parts if '\ufffd' in decode_part(part))
+    legacy_broken = sum(1 for part in parts if _legacy_decode(part).startswith("b'"))
+    print(f"🔍 解码质量: 新逻辑含替换字符 {mismatched} 段, 旧逻辑退化为 str(bytes) {legacy_broken} 段")
+
+    legacy = _time_it(_legacy_decode, parts, args.rounds)
+    current = _time_it(decode_part, parts, args.rounds)
+    _report('legacy (try/except)', legacy, total_bytes)
+    _report('mail_decode', current, total_bytes, baseline=legacy)
+    return 0
+
+
+OUTLOOK_STYLE = (
+    "<style><!-- @font-face {font-family:宋体; panose-1:2 1 6 0 3 1 1 1 1 1;} "
+    "p.MsoNormal, li.MsoNormal, div.MsoNormal {margin:0cm; font-size:10.5pt; font-family:等线;} "
+    "@page WordSection1 {size:612.0pt 792.0pt; margin:72.0pt 90.0pt 72.0pt 90.0pt;} --></style>"
+)
+OUTLOOK_SPAN = "<span lang=EN-US style='font-size:10.5pt;font-family:\"微软雅黑\",sans-serif;color:#1F3864;mso-bidi-font-family:Arial'>"
+
+
+def _outlook_html(text: str, separator: str = '\n') -> str:
+    """把纯文本日报包装成 Outlook 生成的HTML邮件（网页邮箱生成的HTML段落之间通常没有换行）"""
+    paragraphs = separator.join(
+        f"<p class=MsoNormal style='margin-left:0cm;line-height:150%;mso-pagination:widow-orphan'>"
+        f"{OUTLOOK_SPAN}{line or '&nbsp;'}<o:p></o:p></span></p>"
+        for line in text.split('\n')
+    )
+    return (
+        "<html xmlns:v=\"urn:schemas-microsoft-com:vml\" xmlns:o=\"urn:schemas-microsoft-com:office:office\">"
+        f"<head><meta http-equiv=Content-Type content=\"text/html; charset=utf-8\">{OUTLOOK_STYLE * 10}"
+        "<!--[if gte mso 9]><xml><o:shapedefaults v:ext=\"edit\" spidmax=\"1026\" /></xml><![endif]--></head>"
+        f"<body lang=ZH-CN link=\"#0563C1\" vlink=\"#954F72\"><div class=WordSection1>{paragraphs}"
+        "<table class=MsoNormalTable border=0><tr><td style='padding:0cm'>此致</td><td>敬礼</td></tr></table>"
+        "</div></body></html>"
+    )
+
+
+def _legacy_html_to_text(html: str) -> str:
+    """旧版提取逻辑：BeautifulSoup(...).get_text()"""
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(html, 'html.parser').get_text()
+
+
+def bench_html(args):
+    """HTML转纯文本后端对比"""
+    import html_text
+
+    if args.corpus:
+        documents = [file.read_text(encoding='utf-8', errors='replace')
+                     for file in sorted(Path(args.corpus).glob('**/*.htm*'))]
+    else:
+        documents = [_outlook_html(SAMPLE_REPORT * n, sep) for n in (1, 5, 20) for sep in ('\n', '')] * 3
+    if not documents:
+        print("❌ 没有可用的HTML样本")
+        return 1
+
+    total_bytes = sum(len(doc.encode('utf-8')) for doc in documents)
+    print(f"📦 样本: {len(documents)} 封HTML邮件, {total_bytes / 1024:.1f} KB, 最快 {args.rounds} 轮")
+
+    def marker_lines(text: str) -> int:
+        return sum(1 for line in text.split('\n') if line.strip().startswith('【项目】'))
+
+    expected = sum(doc.count('【项目】') for doc in documents)
+    backends = [('legacy bs4.get_text', _legacy_html_to_text)]
+    backends += [(name, extractor) for name, extractor in html_text.EXTRACTORS.items()
+                 if name != 'lxml' or html_text.lxml_html is not None]
+
+    baseline = None
+    for name, extractor in backends:
+        kept = sum(marker_lines(extractor(doc)) for doc in documents)
+        seconds = _time_it(extractor, documents, args.rounds)
+        _report(name, seconds, total_bytes, baseline=baseline, extra=f"【项目】独占一行 {kept}/{expected}")
+        baseline = baseline or seconds
+    return 0
+
+
+SAMPLE_ANALYSIS = {
+    "project_stage": "联调",
+    "key_events": ["推进：完成门禁系统联调", "卡点：硬件到货延期 3 天", "客户反馈：确认验收计划"],
+    "personnel": {
+        "研发": {"work_type": "接口联调、修复考勤数据同步延迟", "load_status": "高负载"},
+        "测试": {"work_type": "回归测试", "load_status": "中等负载"},
+        "PM": {"work_type": "与客户确认验收计划", "load_status": "中等负载"}
+    },
+    "role_gaps": ["缺少现场实施人员"],
+    "health_status": "yellow",
+    "single_point_risk": True,
+    "main_risk": "硬件到货延期可能影响下周的现场部署，需提前协调 \"备用设备\"",
+    "risk_signals": {"delay_risk": True, "fake_progress": False, "dependency_blocked": True},
+    "tomorrow_expectation_check": {"reasonable": True, "missing_prerequisites": ["停车场道闸接口文档"]}
+}
+
+
+def _sample_outputs() -> List[str]:
+    """生成内置模型输出样例：完整JSON、带说明文字/代码块的JSON、被截断的JSON"""
+    text = json.dumps(SAMPLE_ANALYSIS, ensure_ascii=False, indent=2)
+    outputs = [text, f"以下是分析结果：\n```json\n{text}\n```\n如需进一步分析请告知。"]
+    outputs += [text[:len(text) * percent // 100] for percent in (30, 55, 80, 95)]
+    return outputs * 10
+
+
+def _load_outputs(args) -> List[str]:
+    if args.cache:
+        with sqlite3.connect(args.cache) as conn:
+            return [row[0] for row in conn.execute('SELECT raw_output FROM llm_cache') if row[0]]
+    if args.corpus:
+        return [file.read_text(encoding='utf-8', errors='replace')
+                for file in sorted(Path(args.corpus).glob('**/*')) if file.suffix in ('.txt', '.json')]
+    return _sample_outputs()
+
+
+def _legacy_is_json_complete(text: str) -> bool:
+    """旧版完整性检查：逐字符扫描括号"""
+    start_idx = text.find('{')
+    if start_idx == -1:
+        return False
+    brace_count = bracket_count = 0
+    in_string = escape_next = False
+    for char in text[start_idx:]:
+        if escape_next:
+            escape_next = False
+            continue
+        if char == '\\':
+            escape_next = True
+            continue
+        if char == '"':
+            in_string = not in_string
+            continue
+        if not in_string:
+            if char == '{':
+                brace_count += 1
+            elif char == '}':
+                brace_count -= 1
+            elif char == '[':
+                bracket_count += 1
+            elif char == ']':
+                bracket_count -= 1
+    return brace_count == 0 and bracket_count == 0
+
+
+def _legacy_fix_truncated_json(json_str: str) -> Optional[str]:
+    """旧版截断修复：按括号数量补齐"""
+    missing_braces = json_str.count('{') - json_str.count('}')
+    missing_brackets = json_str.count('[') - json_str.count(']')
+    fixed = json_str
+    if fixed and fixed[-1] not in ['}', ']', '"', "'"]:
+        last_comma = fixed.rfind(',')
+        if last_comma != -1:
+            after_comma = fixed[last_comma + 1:].strip()
+            if not after_comma or (':' not in after_comma and not after_comma.startswith('"')):
+                fixed = fixed[:last_comma]
+    if missing_brackets > 0:
+        fixed += ']' * missing_brackets
+    if missing_braces > 0:
+        fixed += '}' * missing_braces
+    return fixed if fixed != json_str else None
+
+
+def _legacy_extract_json(text: str) -> Optional[dict]:
+    """旧版提取逻辑：完整性检查 + 整体解析 -> 切片解析 -> 修复 -> 代码块正则 -> 从 { 开始修复"""
+    _legacy_is_json_complete(text)
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    start_idx, end_idx = text.find('{'), text.rfind('}')
+    if start_idx != -1 and end_idx > start_idx:
+        json_str = text[start_idx:end_idx + 1]
+        try:
+            return json.loads(json_str)
+        except json.JSONDecodeError:
+            fixed = _legacy_fix_truncated_json(json_str)
+            if fixed:
+                try:
+                    return json.loads(fixed)
+                except json.JSONDecodeError:
+                    pass
+    match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', text, re.DOTALL)
+    if match:
+        try:
+            return json.loads(match.group(1))
+        except json.JSONDecodeError:
+            pass
+    if start_idx != -1:
+        fixed = _legacy_fix_truncated_json(text[start_idx:])
+        if fixed:
+            try:
+                return json.loads(fixed)
+            except json.JSONDecodeError:
+                pass
+    return None
+
+
+def bench_json(args):
+    """模型输出JSON提取：旧版多轮解析修复 vs 单遍增量解析"""
+    from json_stream import IncrementalJSONParser, parse_json_text
+
+    outputs = _load_outputs(args)
+    if not outputs:
+        print("❌ 没有可用的模型输出样本")
+        return 1
+
+    total_bytes = sum(len(text.encode('utf-8')) for text in outputs)
+    print(f"📦 样本: {len(outputs)} 份模型输出, {total_bytes / 1024:.1f} KB, 最快 {args.rounds} 轮")
+
+    legacy_results = [_legacy_extract_json(text) for text in outputs]
+    parsed = [parse_json_text(text) for text in outputs]
+    truncated = sum(1 for _, complete in parsed if not complete)
+    print(f"🔍 截断输出 {truncated} 份")
+    print(f"   旧逻辑:   提取成功 {sum(1 for data in legacy_results if data is not None)}/{len(outputs)}, "
+          f"恢复顶层字段 {sum(len(data) for data in legacy_results if data)} 个")
+    print(f"   增量解析: 提取成功 {sum(1 for data, _ in parsed if data is not None)}/{len(outputs)}, "
+          f"恢复顶层字段 {sum(len(data) for data, _ in parsed if data)} 个")
+
+    def streamed(text: str):
+        # 模拟流式输出：按 16 字符一块增量喂入
+        parser = IncrementalJSONParser()
+        for i in range(0, len(text), 16):
+            parser.feed(text[i:i + 16])
+        return parser.result()
+
+    legacy = _time_it(_legacy_extract_json, outputs, args.rounds)
+    _report('legacy (multi-pass)', legacy, total_bytes)
+    _report('json_stream', _time_it(parse_json_text, outputs, args.rounds), total_bytes, baseline=legacy)
+    _report('json_stream (16B chunks)', _time_it(streamed, outputs, args.rounds), total_bytes, baseline=legacy)
+    return 0
+
+
+def _team_reports(projects: int, members: int) -> List[dict]:
+    """生成 members 份团队日报，项目轮流分配给各成员"""
+    lines = SAMPLE_REPORT.split('\n')
+    reports = []
+    for member in range(members):
+        body = []
+        for project in range(member, projects, members):
+            body.append(f"【项目】：项目{project + 1:02d}")
+            body.extend(lines[1 + project % 3:5])
+        reports.append({'from': f'member{member + 1}@example.com', 'subject': '日报', 'body': '\n'.join(body)})
+    return reports
+
+
+def bench_summarize(args):
+    """项目汇总端到端耗时（离线LLM后端）"""
+    from ai_summarizer import AISummarizer
+    from config import AIConfig
+
+    ai_config = AIConfig(
+        api_key='offline', app_id='offline', backend=args.backend, recordings_dir=args.recordings,
+        replay_latency=str(args.latency), fake_latency=args.latency, max_workers=args.workers,
+        rate_limit_qps=0, cache_enabled=False, pack_enabled=args.pack, project_alias_enabled=False
+    )
+    reports = _team_reports(args.projects, args.members)
+    print(f"📦 样本: {len(reports)} 份日报, {args.projects} 个项目, 后端 {args.backend}, "
+          f"单次调用耗时 {args.latency}秒, 并发 {args.workers}{', 小项目打包' if args.pack else ''}")
+
+    summarizer = AISummarizer(ai_config)
+    start = time.perf_counter()
+    result = summarizer.summarize_reports_separated_with_data('', reports)
+    seconds = time.perf_counter() - start
+    timing = result.get('timing', {})
+    ok = sum(1 for project in result['project_data'] if project['json_data'])
+    print(f"  总耗时 {seconds:.2f}秒, 项目 {ok}/{len(result['project_data'])} 解析成功, "
+          f"各项目累计 {timing.get('sequential_time', 0)}秒, 加速比 {timing.get('speedup', 1.0)}x")
+    print(f"  客户端计数: {summarizer.client.stats()}")
+    return 0
+
+
+def _sample_markdown_reports(projects: int) -> List[str]:
+    """生成多项目汇总报告：正常项目、含行内标记的项目、模型输出解析失败（带代码块）的项目"""
+    from project_schema import validate_project
+    from report_renderer import render_report
+
+    raw_output = f"以下是分析结果：\n```json\n{json.dumps(SAMPLE_ANALYSIS, ensure_ascii=False)}\n```\n详见 [周报](http://example.com)"
+    results = {}
+    for i in range(projects):
+        analysis = dict(SAMPLE_ANALYSIS, main_risk=f"**接口**变更需同步 `v{i}` 版本，参考 [文档](http://example.com/{i})")
+        if i % 10 == 9:
+            results[f"项目{i + 1:03d}"] = {'json_data': None, 'raw_output': raw_output}
+        else:
+            results[f"项目{i + 1:03d}"] = {'json_data': validate_project(analysis), 'raw_output': ''}
+    report = render_report(results, formats=('markdown',)).markdown
+    # 一份大报告，外加一组按项目拆开的小报告
+    return [report] + [part for part in report.split('\n\n\n') if part.strip()]
+
+
+def _legacy_convert_markdown_to_text(content: str) -> str:
+    """旧版转换：整篇文档依次执行各条正则替换"""
+    content = re.sub(r'^# (.+)$', r'【\1】', content, flags=re.MULTILINE)
+    content = re.sub(r'^## (.+)$', r'▉ \1', content, flags=re.MULTILINE)
+    content = re.sub(r'^### (.+)$', r'◆ \1', content, flags=re.MULTILINE)
+    content = re.sub(r'^#### (.+)$', r'▸ \1', content, flags=re.MULTILINE)
+    content = re.sub(r'\*\*(.+?)\*\*', r'【\1】', content)
+    content = re.sub(r'__(.+?)__', r'【\1】', content)
+    content = re.sub(r'\*(.+?)\*', r'_\1_', content)
+    content = re.sub(r'^  \* (.+)$', r'  • \1', content, flags=re.MULTILINE)
+    content = re.sub(r'^- (.+)$', r'  • \1', content, flags=re.MULTILINE)
+    content = re.sub(r'^\* (.+)$', r'  • \1', content, flags=re.MULTILINE)
+    content = re.sub(r'^\+ (.+)$', r'  • \1', content, flags=re.MULTILINE)
+    content = re.sub(r'^(\d+)\. (.+)$', r'  \1. \2', content, flags=re.MULTILINE)
+    content = re.sub(r'```[\s\S]*?```', '', content)
+    content = re.sub(r'`(.+?)`', r'"\1"', content)
+    content = re.sub(r'\[(.+?)\]\(.+?\)', r'\1', content)
+    return content
+
+
+def _legacy_beautify_text_format(content: str) -> str:
+    """旧版美化：逐行依次判断各类标题、列表和普通文本"""
+    formatted_lines = []
+    for original_line in content.split('\n'):
+        line = original_line.strip()
+        if not line:
+            formatted_lines.append('')
+        elif '•' in line and line.count('•') > 1:
+            formatted_lines.extend(f"  • {match.strip()}" for match in re.findall(r'•\s*([^•]+)', line) if match.strip())
+        elif line.startswith('【') and line.endswith('】'):
+            formatted_lines.extend(('', '=' * 80, f"{line:^80}", '=' * 80, ''))
+        elif line.startswith('▉ '):
+            formatted_lines.extend(('', '─' * 60, line, '─' * 60, ''))
+        elif line.startswith('◆ ') or (line.startswith('【') and ('项目进展' in line or '项目风险' in line)):
+            formatted_lines.extend(('', line, '·' * 50, ''))
+        elif line.startswith('▸ '):
+            formatted_lines.extend(('', f"  {line}"))
+        elif line.startswith('•'):
+            if formatted_lines and formatted_lines[-1].strip() and not formatted_lines[-1].startswith('  •'):
+                formatted_lines.append('')
+            formatted_lines.append(f"  {line}" if line.startswith('• ') else f"  {line.replace('•', '• ', 1)}")
+        elif re.match(r'^\s*\d+\.', line):
+            formatted_lines.append(f"  {line}")
+        elif ':' in line:
+            keywords = ['项目', '功能', '系统', '平台', '服务', '模块', '接口']
+            formatted_lines.append(f"    ▪ {line}" if any(keyword in line for keyword in keywords) else f"  {line}")
+        elif ('元' in line and ('产能' in line or '季度' in line)) or line.startswith('本季度') or line.startswith('季度'):
+            formatted_lines.append(f"  {line}")
+        elif line.startswith('今日'):
+            formatted_lines.append(f"  {line}")
+        elif re.match(r'^\d+', line) or '元' in line or '%' in line:
+            formatted_lines.append(f"    {line}")
+        else:
+            formatted_lines.append(f"  {line}")
+    return '\n'.join(formatted_lines)
+
+
+# 只做一致性检查的边界样例：跨行/同一行/未闭合的代码块、连续反引号、无空格圆点、各级标题和列表
+FORMAT_EDGE_CASES = [
+    "前文```python\nprint(1)\n```后文 `x` [链接](http://a)\n- 项目：A",
+    "a```b```c```d\n```\ne````\n`````f``",
+    "未闭合```\n# 标题\n- 列表 **粗体**",
+    "# 一\n## 二\n### 三\n#### 四\n##### 五\n#\n# \n- \n  * 子项\n+ 加号\n* 星号 *斜体*\n12. 编号\n1.无空格",
+    "•推进：完成•卡点：无\n•单个\n  • 缩进\n【项目进展】说明\n【日报】\n▉ 总结\n◆ 进展\n▸ 细节",
+    "本季度产能 100 元\n今日完成 80%\n2025 年\n接口: 联调\n__下划线__ 与 **粗体** 与 *斜体*\r\n\t缩进文本",
+]
+
+
+def bench_format(args):
+    """邮件纯文本转换：旧版整篇多轮正则替换 vs 单遍逐行转换（输出须逐字节一致）"""
+    from email_formatter import EMAIL_GREETING, EmailFormatter
+
+    if args.corpus:
+        reports = [file.read_text(encoding='utf-8', errors='replace')
+                   for file in sorted(Path(args.corpus).glob('**/*.md'))]
+    else:
+        reports = _sample_markdown_reports(args.projects)
+    if not reports:
+        print("❌ 没有可用的报告样本")
+        return 1
+
+    formatter = EmailFormatter()
+
+    def legacy(markdown: str) -> str:
+        return _legacy_beautify_text_format(EMAIL_GREETING + _legacy_convert_markdown_to_text(markdown))
+
+    total_bytes = sum(len(report.encode('utf-8')) for report in reports)
+    print(f"📦 样本: {len(reports)} 份报告, 最大 {max(len(report) for report in reports) / 1024:.1f} K字符, "
+          f"共 {total_bytes / 1024:.1f} KB, 最快 {args.rounds} 轮")
+
+    mismatched = [i for i, report in enumerate(reports + FORMAT_EDGE_CASES)
+                  if legacy(report) != formatter.format_for_email(report)]
+    if mismatched:
+        print(f"❌ {len(mismatched)} 份报告的输出与旧版不一致（第 {mismatched[0] + 1} 份起）")
+        return 1
+    print("🔍 输出与旧版逐字节一致")
+
+    baseline = _time_it(legacy, reports, args.rounds)
+    _report('legacy (multi-pass)', baseline, total_bytes)
+    _report('single-pass', _time_it(formatter.format_for_email, reports, args.rounds), total_bytes, baseline=baseline)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="智能日报系统性能基准")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    decode_parser = subparsers.add_parser('decode', help=bench_decode.__doc__)
+    decode_parser.add_argument('--corpus', help='.eml 邮件目录（默认使用内置样例）')
+    decode_parser.add_argument('--rounds', type=int, default=5)
+    decode_parser.set_defaults(func=bench_decode)
+
+    html_parser = subparsers.add_parser('html', help=bench_html.__doc__)
+    html_parser.add_argument('--corpus', help='.html 邮件正文目录（默认使用内置 Outlook 样例）')
+    html_parser.add_argument('--rounds', type=int, default=5)
+    html_parser.set_defaults(func=bench_html)
+
+    json_parser = subparsers.add_parser('json', help=bench_json.__doc__)
+    json_source = json_parser.add_mutually_exclusive_group()
+    json_source.add_argument('--corpus', help='模型原始输出目录（.txt / .json）')
+    json_source.add_argument('--cache', help='从 LLM 缓存库读取记录的模型输出')
+    json_parser.add_argument('--rounds', type=int, default=5)
+    json_parser.set_defaults(func=bench_json)
+
+    summarize_parser = subparsers.add_parser('summarize', help=bench_summarize.__doc__)
+    summarize_parser.add_argument('--backend', choices=['fake', 'replay'], default='fake')
+    summarize_parser.add_argument('--recordings', default='llm_recordings', help='replay 后端的记录目录')
+    summarize_parser.add_argument('--latency', type=float, default=0.5, help='每次调用的模拟耗时（秒）')
+    summarize_parser.add_argument('--projects', type=int, default=12)
+    summarize_parser.add_argument('--members', type=int, default=4)
+    summarize_parser.add_argument('--workers', type=int, default=4)
+    summarize_parser.add_argument('--pack', action='store_true', help='开启小项目打包')
+    summarize_parser.set_defaults(func=bench_summarize)
+
+    format_parser = subparsers.add_parser('format', help=bench_format.__doc__)
+    format_parser.add_argument('--corpus', help='Markdown 报告目录（.md，默认生成多项目汇总报告）')
+    format_parser.add_argument('--projects', type=int, default=200, help='生成报告的项目数')
+    format_parser.add_argument('--rounds', type=int, default=5)
+    format_parser.set_defaults(func=bench_format)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
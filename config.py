@@ -1,5 +1,5 @@
 import os
-from typing import List
+from typing import List, Optional, Tuple
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
@@ -14,13 +14,51 @@ class EmailConfig(BaseModel):
     username: str
     password: str
     use_ssl: bool = True
+    mail_store_path: str = "daily_reports.db"  # 本地邮件存储（UID水位线和已解析邮件）
+    html_extractor: str = "auto"  # HTML正文提取后端: auto / lxml / stream / bs4
+    strip_quotes: bool = True  # 去除日报正文中引用的历史邮件和签名
+    server_side_search: bool = False  # 用 IMAP SEARCH 在服务端按发件人和主题过滤（非 ASCII 条件仍在本地过滤）
+    report_folders: List[str] = ["INBOX"]  # 需要收集日报的文件夹（服务器规则可能把日报移到子文件夹）
+    collect_workers: int = 4  # 多来源收集并发数
+    pool_idle_seconds: int = 300  # 连接池中空闲IMAP连接的保留时间，超时自动登出
+    listener_enabled: bool = False  # 是否启动后台IMAP监听（IDLE/NOOP轮询）
+    listener_poll_seconds: int = 60  # 不支持IDLE时的轮询间隔，也是IDLE的续期间隔
+    outbox_workers: int = 1  # 发件箱发送线程数（每个线程维持一个SMTP会话）
+    outbox_max_attempts: int = 5  # 单封邮件最多发送尝试次数
 
 class AIConfig(BaseModel):
     """AI配置"""
     api_key: str
     base_url: str = "https://dashscope.aliyuncs.com/api/v1/"
     app_id: str = ""  # 百炼平台应用ID
-    max_tokens: int = 200000
+    max_tokens: int = 200000  # 单次调用的token预算（提示词 + 输出），超出时项目内容分片处理
+    output_token_reserve: int = 4000  # 为模型输出预留的token数
+    max_workers: int = 4  # 项目分析并发数上限，1 表示串行；实际并发按限流信号自适应调整
+    rate_limit_qps: float = 2.0  # 每秒最多发起的AI请求数，0 表示不限速
+    rate_limit_burst: int = 4  # 令牌桶允许的突发请求数
+    latency_target_seconds: float = 120.0  # 单次调用超过该耗时视为拥塞并降低并发，0 表示不按延迟调整
+    max_retries: int = 3  # 429 / 5xx / 网络异常的最大重试次数
+    retry_base_delay: float = 1.0  # 重试退避的基准时长（秒）
+    retry_max_delay: float = 30.0  # 重试退避的最大时长（秒）
+    call_timeout_seconds: float = 180.0  # 单次调用的截止时间（秒），0 表示不限
+    queue_timeout_seconds: float = 600.0  # 本地等待并发名额的上限（秒），不计入调用截止时间，0 表示不限
+    hedge_enabled: bool = False  # 调用超过历史 p95 耗时时发出对冲请求
+    breaker_failures: int = 5  # 连续失败多少次后熔断，0 表示不熔断
+    breaker_reset_seconds: float = 60.0  # 熔断持续时间（秒），之后放行一个探测请求
+    stream_output: bool = True  # 有事件回调时使用增量流式输出
+    pack_enabled: bool = False  # 是否把多个小项目打包为一次调用
+    pack_small_chars: int = 600  # 合并内容不超过该字符数的项目视为小项目
+    pack_budget_chars: int = 3000  # 单次打包调用的项目内容字符上限
+    backend: str = "dashscope"  # LLM后端：dashscope / record / replay / fake
+    recordings_dir: str = "llm_recordings"  # record / replay 后端的记录目录
+    replay_latency: str = "recorded"  # 回放耗时：recorded 表示按记录时的耗时，或固定秒数
+    fake_latency: float = 0.0  # fake 后端每次调用的模拟耗时（秒）
+    project_alias_enabled: bool = True  # 是否按归一后的项目名称合并写法不同的同一项目
+    project_alias_path: str = "daily_reports.db"  # 项目名称索引所在的数据库
+    cache_enabled: bool = True  # 是否启用LLM响应缓存
+    cache_path: str = "llm_cache.db"  # 缓存数据库路径（与 daily_reports.db 同目录）
+    cache_ttl_hours: int = 24  # 缓存有效期（小时）
+    cache_max_entries: int = 2000  # 缓存条目上限，超出按最近访问时间淘汰
 
 class ReportConfig(BaseModel):
     """日报配置"""
@@ -30,21 +68,75 @@ class ReportConfig(BaseModel):
     report_recipients: List[str]  # 日报接收人邮箱列表
     report_from_emails: List[str]  # 需要收集日报的邮箱列表
 
+def _split_env(name: str, default: str = "") -> List[str]:
+    """读取逗号分隔的环境变量"""
+    return [item.strip() for item in os.getenv(name, default).split(",") if item.strip()]
+
 class Config:
     """全局配置"""
     def __init__(self):
         self.email = EmailConfig(
             username=os.getenv("EMAIL_USERNAME", ""),
-            password=os.getenv("EMAIL_PASSWORD", "")
+            password=os.getenv("EMAIL_PASSWORD", ""),
+            mail_store_path=os.getenv("MAIL_STORE_PATH", "daily_reports.db"),
+            report_folders=_split_env("REPORT_FOLDERS", "INBOX"),
+            collect_workers=int(os.getenv("MAIL_COLLECT_WORKERS", "4")),
+            pool_idle_seconds=int(os.getenv("MAIL_POOL_IDLE_SECONDS", "300")),
+            html_extractor=os.getenv("HTML_EXTRACTOR", "auto"),
+            strip_quotes=os.getenv("MAIL_STRIP_QUOTES", "true").lower() in ("1", "true", "yes"),
+            server_side_search=os.getenv("IMAP_SERVER_SEARCH", "false").lower() in ("1", "true", "yes"),
+            listener_enabled=os.getenv("MAIL_LISTENER_ENABLED", "false").lower() in ("1", "true", "yes"),
+            listener_poll_seconds=int(os.getenv("MAIL_LISTENER_POLL_SECONDS", "60")),
+            outbox_workers=int(os.getenv("MAIL_OUTBOX_WORKERS", "1")),
+            outbox_max_attempts=int(os.getenv("MAIL_OUTBOX_MAX_ATTEMPTS", "5"))
         )
         
+        # 第二个收集日报的邮箱（可选），未单独配置的服务器参数沿用主邮箱
+        self.extra_email: Optional[EmailConfig] = None
+        if os.getenv("EMAIL2_USERNAME"):
+            self.extra_email = self.email.model_copy(update={
+                "username": os.getenv("EMAIL2_USERNAME"),
+                "password": os.getenv("EMAIL2_PASSWORD", ""),
+                "imap_host": os.getenv("EMAIL2_IMAP_HOST", self.email.imap_host),
+                "imap_port": int(os.getenv("EMAIL2_IMAP_PORT", str(self.email.imap_port))),
+                "report_folders": _split_env("EMAIL2_REPORT_FOLDERS", "INBOX")
+            })
+        
         # 从环境变量读取 max_tokens，默认为 8000（支持多项目长输出）
         max_tokens = int(os.getenv("DASHSCOPE_MAX_TOKENS", "80000"))
+        # 离线后端（回放 / 规则模拟）不需要真实的应用ID
+        backend = os.getenv("LLM_BACKEND", "dashscope").lower()
+        offline_app_id = "offline" if backend in ("replay", "fake") else ""
         self.ai = AIConfig(
             api_key=os.getenv("DASHSCOPE_API_KEY", ""),
             base_url=os.getenv("DASHSCOPE_BASE_URL", "https://dashscope.aliyuncs.com/api/v1/"),
-            app_id=os.getenv("DASHSCOPE_APP_ID", ""),
-            max_tokens=max_tokens
+            app_id=os.getenv("DASHSCOPE_APP_ID", "") or offline_app_id,
+            max_tokens=max_tokens,
+            output_token_reserve=int(os.getenv("DASHSCOPE_OUTPUT_RESERVE", "4000")),
+            max_workers=int(os.getenv("DASHSCOPE_MAX_WORKERS", "4")),
+            rate_limit_qps=float(os.getenv("DASHSCOPE_QPS", "2")),
+            rate_limit_burst=int(os.getenv("DASHSCOPE_QPS_BURST", "4")),
+            latency_target_seconds=float(os.getenv("DASHSCOPE_LATENCY_TARGET", "120")),
+            max_retries=int(os.getenv("DASHSCOPE_MAX_RETRIES", "3")),
+            call_timeout_seconds=float(os.getenv("DASHSCOPE_CALL_TIMEOUT", "180")),
+            queue_timeout_seconds=float(os.getenv("DASHSCOPE_QUEUE_TIMEOUT", "600")),
+            hedge_enabled=os.getenv("DASHSCOPE_HEDGE", "false").lower() in ("1", "true", "yes"),
+            breaker_failures=int(os.getenv("DASHSCOPE_BREAKER_FAILURES", "5")),
+            breaker_reset_seconds=float(os.getenv("DASHSCOPE_BREAKER_RESET", "60")),
+            stream_output=os.getenv("DASHSCOPE_STREAM", "true").lower() in ("1", "true", "yes"),
+            pack_enabled=os.getenv("DASHSCOPE_PACK_PROJECTS", "false").lower() in ("1", "true", "yes"),
+            pack_small_chars=int(os.getenv("DASHSCOPE_PACK_SMALL_CHARS", "600")),
+            pack_budget_chars=int(os.getenv("DASHSCOPE_PACK_BUDGET_CHARS", "3000")),
+            backend=backend,
+            recordings_dir=os.getenv("LLM_RECORDINGS_DIR", "llm_recordings"),
+            replay_latency=os.getenv("LLM_REPLAY_LATENCY", "recorded"),
+            fake_latency=float(os.getenv("LLM_FAKE_LATENCY", "0")),
+            project_alias_enabled=os.getenv("PROJECT_ALIAS_ENABLED", "true").lower() in ("1", "true", "yes"),
+            project_alias_path=os.getenv("PROJECT_ALIAS_DB", "daily_reports.db"),
+            cache_enabled=os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes"),
+            cache_path=os.getenv("LLM_CACHE_PATH", "llm_cache.db"),
+            cache_ttl_hours=int(os.getenv("LLM_CACHE_TTL_HOURS", "24")),
+            cache_max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2000"))
         )
         
         # 处理日报配置 - 完全依赖环境变量，不使用硬编码邮箱
@@ -57,5 +149,10 @@ class Config:
             report_time=os.getenv("REPORT_TIME", "09:00")
         )
 
+    def mail_sources(self) -> List[Tuple[EmailConfig, str]]:
+        """所有需要收集日报的 (邮箱账号, 文件夹)"""
+        accounts = [self.email] + ([self.extra_email] if self.extra_email else [])
+        return [(account, folder) for account in accounts for folder in account.report_folders]
+
 # 全局配置实例
-config = Config() 
\ No newline at end of file
+config = Config() 
@@ -2,10 +2,208 @@
 """
 邮件格式化模块
 将Markdown格式的内容转换为美观的纯文本邮件格式
+    iter_text_lines - 单遍把Markdown转换为纯文本行
+    beautify_line   - 美化单行纯文本（报告渲染器也用它处理自由文本行）
 """
 
 import re
 from datetime import datetime
+from typing import Iterator, List
+
+# 邮件开头语
+EMAIL_GREETING = "张总：\n您好！\n\n"
+GREETING_LINES = EMAIL_GREETING.split('\n')[:-1]
+
+# Markdown 标题级别 -> 纯文本标记
+HEADING_FORMATS = {1: '【{}】', 2: '▉ {}', 3: '◆ {}', 4: '▸ {}'}
+
+# 行内转换规则：(模式, 替换, 快速判断用的标记字符)
+EMPHASIS_RULES = (
+    (re.compile(r'\*\*(.+?)\*\*'), r'【\1】', '**'),
+    (re.compile(r'__(.+?)__'), r'【\1】', '__'),
+    (re.compile(r'\*(.+?)\*'), r'_\1_', '*'),
+)
+INLINE_RULES = (
+    (re.compile(r'`(.+?)`'), r'"\1"', '`'),
+    (re.compile(r'\[(.+?)\]\(.+?\)'), r'\1', '['),
+)
+
+# 列表项前缀（按顺序匹配），统一转换为 "  • "
+LIST_PREFIXES = ('  * ', '- ', '* ', '+ ')
+NUMBERED_ITEM_PATTERN = re.compile(r'\d+\. .')
+# 需要转换的行：以标题、列表、数字开头，或含强调、代码、链接标记
+LINE_MARK_PATTERN = re.compile(r'[#\-+*\d]|  \* |[^*_`\[\n]*[*_`\[]')
+CODE_FENCE = '```'
+
+# 美化格式用到的模式
+BULLET_ITEM_PATTERN = re.compile(r'•\s*([^•]+)')
+NUMBERED_LINE_PATTERN = re.compile(r'^\s*\d+\.')
+DIGIT_PREFIX_PATTERN = re.compile(r'^\d+')
+BANNER_RULE = '=' * 80
+SECTION_RULE = '─' * 60
+SUBSECTION_RULE = '·' * 50
+
+
+def iter_text_lines(markdown_content: str) -> Iterator[str]:
+    """单遍转换：逐行识别标题、强调和列表，移除代码块后再处理行内代码和链接
+    
+    代码块可以跨行，移除后代码块前后的内容合成一行；没有闭合的代码块原样保留
+    """
+    fence_prefix = None  # 未闭合代码块之前的内容
+    fence_lines = []     # 从代码块起始标记开始的原始内容，最终未闭合时原样输出
+    for line in markdown_content.split('\n'):
+        # 大部分行没有任何标记，直接输出
+        if fence_prefix is None and not LINE_MARK_PATTERN.match(line):
+            yield line
+            continue
+        line = _convert_line(line)
+        if fence_prefix is None:
+            if CODE_FENCE not in line:
+                yield _convert_inline(line) if '`' in line or '[' in line else line
+                continue
+            kept, pos = '', 0
+        else:
+            end = line.find(CODE_FENCE)
+            if end < 0:
+                fence_lines.append(line)
+                continue
+            kept, pos = fence_prefix, end + len(CODE_FENCE)
+            fence_prefix, fence_lines = None, []
+        
+        # 与 ```[\s\S]*?``` 相同：从左到右找起始标记，再找最近的结束标记
+        while True:
+            start = line.find(CODE_FENCE, pos)
+            if start < 0:
+                yield _convert_inline(kept + line[pos:])
+                break
+            end = line.find(CODE_FENCE, start + len(CODE_FENCE))
+            if end < 0:
+                fence_prefix, fence_lines = kept + line[pos:start], [line[start:]]
+                break
+            kept += line[pos:start]
+            pos = end + len(CODE_FENCE)
+    
+    if fence_prefix is not None:
+        fence_lines[0] = fence_prefix + fence_lines[0]
+        for line in fence_lines:
+            yield _convert_inline(line)
+
+
+def _convert_line(line: str) -> str:
+    """行级转换：标题、粗体、斜体、列表（顺序与逐条替换时一致）"""
+    # 处理标题（# 到 ####）
+    if line[:1] == '#':
+        level = len(line) - len(line.lstrip('#'))
+        if level in HEADING_FORMATS and line[level:level + 1] == ' ' and len(line) > level + 1:
+            line = HEADING_FORMATS[level].format(line[level + 1:])
+    
+    # 处理粗体和斜体
+    if '*' in line or '__' in line:
+        for pattern, replacement, mark in EMPHASIS_RULES:
+            if mark in line:
+                line = pattern.sub(replacement, line)
+    
+    # 处理列表 - 缩进的 * 列表项和标准 Markdown 列表
+    if line.startswith(LIST_PREFIXES):
+        prefix_length = 4 if line.startswith('  * ') else 2
+        if len(line) > prefix_length:
+            return '  • ' + line[prefix_length:]
+    
+    # 处理数字列表
+    if line[:1].isdigit() and NUMBERED_ITEM_PATTERN.match(line):
+        return '  ' + line
+    return line
+
+
+def _convert_inline(line: str) -> str:
+    """行内代码和链接（在代码块移除之后处理）"""
+    for pattern, replacement, mark in INLINE_RULES:
+        if mark in line:
+            line = pattern.sub(replacement, line)
+    return line
+
+
+def beautify_line(original_line: str, formatted_lines: List[str]):
+    """美化单行文本，结果追加到 formatted_lines（列表项前是否空行取决于已输出的上一行）
+    
+    按首字符确定行的类别，每行只判断一次
+    """
+    line = original_line.strip()
+    
+    # 跳过空行
+    if not line:
+        formatted_lines.append('')
+        return
+    
+    # 处理同一行中包含多个圆点的情况（如：• 推进：xxx• 卡点：yyy）
+    # 将多个圆点拆分成多行：• 后面跟内容（直到下一个 • 或行尾）
+    if line.count('•') > 1:
+        for match in BULLET_ITEM_PATTERN.findall(line):
+            item = match.strip()
+            if item:
+                formatted_lines.append(f"  • {item}")
+        return
+    
+    head = line[0]
+    if head == '【':
+        # 处理主标题（如：【2025-06-23 的日报】），一级标题（如：【1. 产能情况】）同样处理
+        if line.endswith('】'):
+            formatted_lines.extend(('', BANNER_RULE, f"{line:^80}", BANNER_RULE, ''))
+            return
+        # 处理三级标题（如：【项目进展：...）
+        if '项目进展' in line or '项目风险' in line:
+            formatted_lines.extend(('', line, SUBSECTION_RULE, ''))
+            return
+    elif line[1:2] == ' ' and head in '▉◆▸':
+        if head == '▉':
+            # 处理二级标题（如：▉ 团队工作总结）
+            formatted_lines.extend(('', SECTION_RULE, line, SECTION_RULE, ''))
+        elif head == '◆':
+            # 处理三级标题（如：◆ 1. 项目进展）
+            formatted_lines.extend(('', line, SUBSECTION_RULE, ''))
+        else:
+            # 处理四级标题
+            formatted_lines.extend(('', f"  {line}"))
+        return
+    elif head == '•':
+        # 处理项目列表项：确保圆点前有换行（如果前面是内容而不是列表项，添加空行）
+        if formatted_lines and formatted_lines[-1].strip() and not formatted_lines[-1].startswith('  •'):
+            formatted_lines.append('')
+        # 为项目列表项提供更清晰的缩进，• 后面没有空格时补上
+        if line.startswith('• '):
+            formatted_lines.append(f"  {line}")
+        else:
+            formatted_lines.append(f"  {line.replace('•', '• ', 1)}")
+        return
+    
+    # 处理数字列表
+    if NUMBERED_LINE_PATTERN.match(line):
+        formatted_lines.append(f"  {line}")
+        return
+    
+    # 处理包含冒号的项目描述行
+    if ':' in line and not line.startswith('  '):
+        # 检查是否是项目名称（通常包含项目、功能等关键词）
+        if any(keyword in line for keyword in ['项目', '功能', '系统', '平台', '服务', '模块', '接口']):
+            formatted_lines.append(f"    ▪ {line}")
+        else:
+            formatted_lines.append(f"  {line}")
+        return
+    
+    # 处理普通文本
+    # 产能相关的数据行
+    if ('元' in line and ('产能' in line or '季度' in line)) or line.startswith('本季度') or line.startswith('季度'):
+        formatted_lines.append(f"  {line}")
+    # 工作内容描述
+    elif line.startswith('今日主要完成') or line.startswith('今日'):
+        formatted_lines.append(f"  {line}")
+    # 数字开头的行，可能是金额或统计数据
+    elif DIGIT_PREFIX_PATTERN.match(line) or '元' in line or '%' in line:
+        formatted_lines.append(f"    {line}")
+    # 其他普通文本
+    else:
+        formatted_lines.append(f"  {line}")
+
 
 class EmailFormatter:
     """邮件内容格式化器"""
@@ -16,179 +214,22 @@ class EmailFormatter:
     def format_for_email(self, markdown_content: str) -> str:
         """将Markdown内容转换为美观的纯文本邮件格式"""
         
-        # 移除Markdown语法，转换为纯文本
-        content = self._convert_markdown_to_text(markdown_content)
-        
-        # 添加开头语
-        content = "张总：\n您好！\n\n" + content
-        
-        # 美化格式
-        formatted_content = self._beautify_text_format(content)
+        # 逐行转换Markdown语法并美化格式（开头语在前）
+        formatted_lines = []
+        for line in GREETING_LINES:
+            beautify_line(line, formatted_lines)
+        for line in iter_text_lines(markdown_content):
+            beautify_line(line, formatted_lines)
         
-        return formatted_content
+        return '\n'.join(formatted_lines)
     
     def _convert_markdown_to_text(self, markdown_content: str) -> str:
         """转换Markdown语法为纯文本"""
-        content = markdown_content
-        
-        # 处理标题
-        content = re.sub(r'^# (.+)$', r'【\1】', content, flags=re.MULTILINE)
-        content = re.sub(r'^## (.+)$', r'▉ \1', content, flags=re.MULTILINE)
-        content = re.sub(r'^### (.+)$', r'◆ \1', content, flags=re.MULTILINE)
-        content = re.sub(r'^#### (.+)$', r'▸ \1', content, flags=re.MULTILINE)
-        
-        # 处理粗体
-        content = re.sub(r'\*\*(.+?)\*\*', r'【\1】', content)
-        content = re.sub(r'__(.+?)__', r'【\1】', content)
-        
-        # 处理斜体
-        content = re.sub(r'\*(.+?)\*', r'_\1_', content)
-        
-        # 处理列表 - 确保每个列表项都在单独一行
-        # 先处理已经缩进的列表项（两个空格 + •）
-        content = re.sub(r'^  \* (.+)$', r'  • \1', content, flags=re.MULTILINE)
-        # 处理标准 Markdown 列表
-        content = re.sub(r'^- (.+)$', r'  • \1', content, flags=re.MULTILINE)
-        content = re.sub(r'^\* (.+)$', r'  • \1', content, flags=re.MULTILINE)
-        content = re.sub(r'^\+ (.+)$', r'  • \1', content, flags=re.MULTILINE)
-        
-        # 处理数字列表
-        content = re.sub(r'^(\d+)\. (.+)$', r'  \1. \2', content, flags=re.MULTILINE)
-        
-        # 处理代码块
-        content = re.sub(r'```[\s\S]*?```', '', content)
-        content = re.sub(r'`(.+?)`', r'"\1"', content)
-        
-        # 处理链接
-        content = re.sub(r'\[(.+?)\]\(.+?\)', r'\1', content)
-        
-        return content
-    
+        return '\n'.join(iter_text_lines(markdown_content))
     
     def _beautify_text_format(self, content: str) -> str:
         """美化文本格式，优化缩进层次"""
-        lines = content.split('\n')
         formatted_lines = []
-        current_section = None
-        
-        for line in lines:
-            original_line = line
-            line = line.strip()
-            
-            # 跳过空行
-            if not line:
-                formatted_lines.append('')
-                continue
-            
-            # 处理同一行中包含多个圆点的情况（如：• 推进：xxx• 卡点：yyy）
-            # 将多个圆点拆分成多行
-            if '•' in line and line.count('•') > 1:
-                # 使用正则表达式按圆点分割
-                # 匹配：• 后面跟内容（直到下一个 • 或行尾）
-                pattern = r'•\s*([^•]+)'
-                matches = re.findall(pattern, line)
-                
-                # 处理每个匹配的项目
-                for match in matches:
-                    item = match.strip()
-                    if item:
-                        formatted_lines.append(f"  • {item}")
-                continue
-            
-            # 处理主标题（如：【2025-06-23 的日报】）
-            if line.startswith('【') and line.endswith('】'):
-                formatted_lines.append('')
-                formatted_lines.append('=' * 80)
-                formatted_lines.append(f"{line:^80}")
-                formatted_lines.append('=' * 80)
-                formatted_lines.append('')
-                current_section = 'main_title'
-                continue
-            
-            # 处理一级标题（如：【1. 产能情况】）
-            if line.startswith('【') and '.' in line and line.endswith('】'):
-                formatted_lines.append('')
-                formatted_lines.append('─' * 60)
-                formatted_lines.append(f"{line}")
-                formatted_lines.append('─' * 60)
-                formatted_lines.append('')
-                current_section = 'section'
-                continue
-            
-            # 处理二级标题（如：▉ 团队工作总结）
-            if line.startswith('▉ '):
-                formatted_lines.append('')
-                formatted_lines.append('─' * 60)
-                formatted_lines.append(f"{line}")
-                formatted_lines.append('─' * 60)
-                formatted_lines.append('')
-                current_section = 'team_summary'
-                continue
-            
-            # 处理三级标题（如：◆ 1. 项目进展）
-            if line.startswith('◆ ') or (line.startswith('【') and ('项目进展' in line or '项目风险' in line)):
-                formatted_lines.append('')
-                formatted_lines.append(f"{line}")
-                formatted_lines.append('·' * 50)
-                formatted_lines.append('')
-                current_section = 'subsection'
-                continue
-            
-            # 处理四级标题
-            if line.startswith('▸ '):
-                formatted_lines.append('')
-                formatted_lines.append(f"  {line}")
-                continue
-            
-            # 处理项目列表项（• 开头）
-            if line.startswith('• ') or line.startswith('•'):
-                # 确保圆点前有换行（如果前面不是空行）
-                if formatted_lines and formatted_lines[-1].strip() and not formatted_lines[-1].startswith('  •'):
-                    # 前面有内容且不是列表项，添加空行
-                    formatted_lines.append('')
-                # 为项目列表项提供更清晰的缩进
-                if line.startswith('• '):
-                    formatted_lines.append(f"  {line}")
-                else:
-                    # 处理 • 后面没有空格的情况
-                    formatted_lines.append(f"  {line.replace('•', '• ', 1)}")
-                continue
-            
-            # 处理原本就有缩进的列表项
-            if original_line.startswith('  •'):
-                formatted_lines.append(f"    {original_line.strip()}")
-                continue
-            
-            # 处理数字列表
-            if re.match(r'^\s*\d+\.', line):
-                formatted_lines.append(f"  {line}")
-                continue
-            
-            # 处理包含冒号的项目描述行
-            if ':' in line and not line.startswith('  '):
-                # 检查是否是项目名称（通常包含项目、功能等关键词）
-                if any(keyword in line for keyword in ['项目', '功能', '系统', '平台', '服务', '模块', '接口']):
-                    formatted_lines.append(f"    ▪ {line}")
-                else:
-                    formatted_lines.append(f"  {line}")
-                continue
-            
-            # 处理普通文本
-            if line:
-                # 产能相关的数据行
-                if ('元' in line and ('产能' in line or '季度' in line)) or line.startswith('本季度') or line.startswith('季度'):
-                    formatted_lines.append(f"  {line}")
-                # 工作内容描述
-                elif line.startswith('今日主要完成') or line.startswith('今日'):
-                    formatted_lines.append(f"  {line}")
-                # 数字开头的行，可能是金额或统计数据
-                elif re.match(r'^\d+', line) or '元' in line or '%' in line:
-                    formatted_lines.append(f"    {line}")
-                # 其他普通文本
-                else:
-                    formatted_lines.append(f"  {line}")
-        
+        for line in content.split('\n'):
+            beautify_line(line, formatted_lines)
         return '\n'.join(formatted_lines)
-    
-    
- 
\ No newline at end of file
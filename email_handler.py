@@ -1,21 +1,40 @@
 import imaplib
+import hashlib
+import re
 import smtplib
 import email
+from email.parser import BytesHeaderParser
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from email.header import decode_header
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime, timedelta
 import ssl
+import time
 from loguru import logger
-from bs4 import BeautifulSoup
 from config import EmailConfig
+from mail_store import MailStore
+from html_text import html_to_text
+from mail_cleaner import strip_quotes_and_signature
+from mail_decode import decode_bytes, decode_part, decode_transfer, decode_mime_header
+from imap_parser import group_fetch_response, fetch_uid, parse_bodystructure, find_text_section
+
+# 头部预取字段，用于在下载正文前完成发件人和主题过滤
+HEADER_FIELDS = "FROM SUBJECT DATE MESSAGE-ID"
+# 服务器拒绝服务端搜索后，间隔多久再重新尝试
+SERVER_SEARCH_RETRY_SECONDS = 7 * 24 * 3600
 
 class EmailHandler:
     """邮件处理器"""
     
+    # 每条 FETCH 命令包含的UID数量（头部很小，可以大批量；正文按小批量下载）
+    header_batch_size = 500
+    body_batch_size = 20
+    
     def __init__(self, email_config: EmailConfig):
         self.config = email_config
+        self.store = MailStore(email_config.mail_store_path)
+        # 最近一次收集的下载统计
+        self.stats = {'bytes_downloaded': 0, 'fetch_commands': 0}
         
     def connect_imap(self) -> imaplib.IMAP4_SSL:
         """连接IMAP服务器"""
@@ -50,78 +69,377 @@ class EmailHandler:
     
     def decode_mime_words(self, s: str) -> str:
         """解码MIME编码的字符串"""
-        decoded_parts = decode_header(s)
-        decoded_string = ""
-        for part, encoding in decoded_parts:
-            if isinstance(part, bytes):
-                decoded_string += part.decode(encoding or 'utf-8')
-            else:
-                decoded_string += part
-        return decoded_string
+        return decode_mime_header(s)
     
     def extract_text_from_html(self, html_content: str) -> str:
-        """从HTML中提取纯文本"""
-        soup = BeautifulSoup(html_content, 'html.parser')
-        return soup.get_text()
+        """从HTML中提取纯文本（保留段落结构）"""
+        return html_to_text(html_content, self.config.html_extractor)
     
     def get_email_body(self, msg) -> str:
-        """获取邮件正文"""
-        body = ""
-        if msg.is_multipart():
-            for part in msg.walk():
-                content_type = part.get_content_type()
-                content_disposition = str(part.get("Content-Disposition"))
-                
-                if "attachment" not in content_disposition:
-                    if content_type == "text/plain":
-                        try:
-                            body = part.get_payload(decode=True).decode('utf-8')
-                        except:
-                            try:
-                                body = part.get_payload(decode=True).decode('gbk')
-                            except:
-                                body = str(part.get_payload(decode=True))
-                        break
-                    elif content_type == "text/html":
-                        try:
-                            html_content = part.get_payload(decode=True).decode('utf-8')
-                        except:
-                            try:
-                                html_content = part.get_payload(decode=True).decode('gbk')
-                            except:
-                                html_content = str(part.get_payload(decode=True))
-                        body = self.extract_text_from_html(html_content)
-                        break
-        else:
-            content_type = msg.get_content_type()
-            if content_type == "text/plain":
+        """获取邮件正文（第一个非附件的 text/plain 段，没有则取 text/html 段）"""
+        for part in msg.walk():
+            if part.is_multipart():
+                continue
+            content_type = part.get_content_type()
+            if content_type not in ("text/plain", "text/html"):
+                continue
+            if "attachment" in str(part.get("Content-Disposition")):
+                continue
+            
+            text = decode_part(part)
+            if content_type == "text/html":
+                text = self.extract_text_from_html(text)
+            return text.strip()
+        return ""
+    
+    def _uid_fetch(self, mail, uids: List[int], items: str) -> Optional[list]:
+        """执行 UID FETCH 并累计本次收集下载的字节数，失败时返回None"""
+        status, data = mail.uid('FETCH', ','.join(map(str, uids)), items)
+        if status != 'OK':
+            logger.error(f"FETCH {items} 失败: {status}")
+            return None
+        for piece in data:
+            if isinstance(piece, tuple):
+                self.stats['bytes_downloaded'] += len(piece[0]) + len(piece[1])
+            elif isinstance(piece, bytes):
+                self.stats['bytes_downloaded'] += len(piece)
+        self.stats['fetch_commands'] += 1
+        return data
+    
+    def _iter_fetch_response(self, data: list):
+        """遍历FETCH响应，产出 (uid, meta_bytes, literal_bytes)"""
+        for group in group_fetch_response(data or []):
+            uid = fetch_uid(group)
+            if uid is None:
+                continue
+            meta = b''.join(piece[0] if isinstance(piece, tuple) else piece for piece in group)
+            literal = next((piece[1] for piece in group if isinstance(piece, tuple)), b'')
+            yield uid, meta, literal
+    
+    def _fetch_headers(self, mail, uids: List[int]) -> Tuple[Dict[int, Dict], List[int]]:
+        """分批预取邮件头部和 INTERNALDATE（BODY.PEEK 不会把邮件标记为已读）
+
+        返回 (头部, 需要下次重新拉取的UID)：FETCH 失败的批次和响应中缺失的UID都计入后者；
+        头部无法解析的邮件记录为空发件人和主题的占位行（重试也无法解析，不应阻塞水位线）
+        """
+        headers = {}
+        failed = []
+        parser = BytesHeaderParser()
+        for i in range(0, len(uids), self.header_batch_size):
+            batch = uids[i:i + self.header_batch_size]
+            data = self._uid_fetch(mail, batch, f'(UID INTERNALDATE BODY.PEEK[HEADER.FIELDS ({HEADER_FIELDS})])')
+            if data is None:
+                failed.extend(batch)
+                continue
+            for uid, meta, header_bytes in self._iter_fetch_response(data):
                 try:
-                    body = msg.get_payload(decode=True).decode('utf-8')
-                except:
-                    try:
-                        body = msg.get_payload(decode=True).decode('gbk')
-                    except:
-                        body = str(msg.get_payload(decode=True))
-            elif content_type == "text/html":
+                    header = parser.parsebytes(header_bytes)
+                    internal_date = imaplib.Internaldate2tuple(meta)
+                    received = datetime(*internal_date[:6]) if internal_date else datetime.now()
+                    headers[uid] = {
+                        'uid': uid,
+                        'from': self.decode_mime_words(header.get('From', '')),
+                        'subject': self.decode_mime_words(header.get('Subject', '')),
+                        'date': header.get('Date', ''),
+                        'message_id': header.get('Message-ID', '').strip(),
+                        'received_date': received.strftime('%Y-%m-%d')
+                    }
+                except Exception as e:
+                    logger.error(f"解析邮件头 {uid} 时出错，记录为跳过: {e}")
+                    headers[uid] = {
+                        'uid': uid, 'from': '', 'subject': '', 'date': '', 'message_id': '',
+                        'received_date': datetime.now().strftime('%Y-%m-%d')
+                    }
+            missing = [uid for uid in batch if uid not in headers]
+            if missing:
+                logger.warning(f"FETCH 响应中缺少 {len(missing)} 封邮件的头部 (UID {missing[0]} 等)，下次重新拉取")
+                failed.extend(missing)
+        logger.info(f"已预取 {len(headers)} 封邮件头部 ({(len(uids) + self.header_batch_size - 1) // self.header_batch_size} 次FETCH)")
+        return headers, failed
+    
+    def _fetch_messages(self, mail, uids: List[int]) -> Dict[int, email.message.Message]:
+        """分批下载完整邮件"""
+        messages = {}
+        for i in range(0, len(uids), self.body_batch_size):
+            batch = uids[i:i + self.body_batch_size]
+            data = self._uid_fetch(mail, batch, '(UID BODY.PEEK[])')
+            for uid, _, raw in self._iter_fetch_response(data):
+                messages[uid] = email.message_from_bytes(raw)
+        return messages
+    
+    def _decode_section(self, raw: bytes, part: Dict) -> str:
+        """解码单独下载的MIME段（处理传输编码、字符集和HTML）"""
+        text = decode_bytes(decode_transfer(raw, part['encoding']), part['charset'])
+        if part['subtype'] == 'html':
+            text = self.extract_text_from_html(text)
+        return text.strip()
+    
+    def _fetch_bodies(self, mail, uids: List[int]) -> Dict[int, str]:
+        """先取 BODYSTRUCTURE，只下载正文所在的文本段；无法定位时退回下载整封邮件"""
+        sections = {}
+        for i in range(0, len(uids), self.header_batch_size):
+            data = self._uid_fetch(mail, uids[i:i + self.header_batch_size], '(UID BODYSTRUCTURE)')
+            for group in group_fetch_response(data or []):
+                uid = fetch_uid(group)
                 try:
-                    html_content = msg.get_payload(decode=True).decode('utf-8')
-                except:
-                    try:
-                        html_content = msg.get_payload(decode=True).decode('gbk')
-                    except:
-                        html_content = str(msg.get_payload(decode=True))
-                body = self.extract_text_from_html(html_content)
+                    structure = parse_bodystructure(group)
+                    part = find_text_section(structure) if structure else None
+                except Exception as e:
+                    logger.warning(f"解析邮件 {uid} 的 BODYSTRUCTURE 失败: {e}")
+                    part = None
+                if uid is not None and part:
+                    sections[uid] = part
+        
+        bodies = {}
+        
+        # 按段号分组批量下载，同一段号的邮件可以放进同一条 FETCH
+        by_section = {}
+        for uid, part in sections.items():
+            by_section.setdefault(part['section'], []).append(uid)
+        for section, section_uids in by_section.items():
+            for i in range(0, len(section_uids), self.body_batch_size):
+                data = self._uid_fetch(mail, section_uids[i:i + self.body_batch_size], f'(UID BODY.PEEK[{section}])')
+                for uid, _, raw in self._iter_fetch_response(data):
+                    if uid in sections:
+                        try:
+                            bodies[uid] = self._decode_section(raw, sections[uid])
+                        except Exception as e:
+                            logger.error(f"解码邮件 {uid} 正文时出错: {e}")
+        
+        # 无法定位文本段的邮件退回完整下载
+        fallback = [uid for uid in uids if uid not in bodies]
+        if fallback:
+            logger.info(f"{len(fallback)} 封邮件无法按段下载，改为下载完整邮件")
+            for uid, msg in self._fetch_messages(mail, fallback).items():
+                try:
+                    bodies[uid] = self.get_email_body(msg)
+                except Exception as e:
+                    logger.error(f"处理邮件 {uid} 时出错: {e}")
+        
+        return bodies
+    
+    @staticmethod
+    def _quote_search_value(value: str) -> bytes:
+        """把 ASCII 搜索值编码为带引号字符串（8位数据按 RFC 3501 只能用字面量发送）"""
+        escaped = value.replace('\\', '\\\\').replace('"', '\\"')
+        return b'"' + escaped.encode('ascii') + b'"'
+    
+    def _or_terms(self, key: bytes, values: List[str]) -> bytes:
+        """构造 OR 嵌套的搜索条件：OR k v1 OR k v2 k v3"""
+        terms = [key + b' ' + self._quote_search_value(v) for v in values]
+        criteria = terms[-1]
+        for term in reversed(terms[:-1]):
+            criteria = b'OR ' + term + b' ' + criteria
+        return criteria
+    
+    @staticmethod
+    def _filter_hash(from_emails: List[str], subject_keywords: List[str]) -> str:
+        payload = '\0'.join(sorted(from_emails)) + '\1' + '\0'.join(sorted(subject_keywords))
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+    
+    @staticmethod
+    def _server_filters(from_emails: List[str], subject_keywords: List[str]) -> Tuple[List[str], List[str]]:
+        """可以交给服务端的过滤条件：含非 ASCII 值的一组条件（如中文主题关键词）整组留给本地过滤
+
+        imaplib 一条命令只能带一个字面量，非 ASCII 值无法按 RFC 3501 发送；本地过滤总会再执行一次
+        """
+        def ascii_only(values: List[str]) -> List[str]:
+            return values if all(value.isascii() for value in values) else []
+        return ascii_only(from_emails), ascii_only(subject_keywords)
+    
+    def _server_search_allowed(self) -> bool:
+        """服务器拒绝过服务端搜索时，在重试间隔内直接使用本地过滤（按账号和服务器持久记录）"""
+        rejected_at = self.store.get_search_rejected_at(self.config.username, self.config.imap_host)
+        return rejected_at is None or time.time() - rejected_at > SERVER_SEARCH_RETRY_SECONDS
+    
+    def _server_search(self, mail, last_uid: int, since: datetime,
+                       from_emails: List[str], subject_keywords: List[str]) -> Optional[List[int]]:
+        """服务端按发件人和主题过滤（条件均为 ASCII），服务器不支持时返回None"""
+        criteria = [f'UID {last_uid + 1}:*'.encode(), f'SINCE "{since.strftime("%d-%b-%Y")}"'.encode()]
+        if from_emails:
+            criteria.append(b'(' + self._or_terms(b'FROM', from_emails) + b')')
+        if subject_keywords:
+            criteria.append(b'(' + self._or_terms(b'SUBJECT', subject_keywords) + b')')
+        
+        logger.info(f"服务端搜索条件: {b' '.join(criteria).decode('utf-8')}")
+        try:
+            status, messages = mail.uid('SEARCH', None, *criteria)
+        except mail.error as e:
+            logger.warning(f"服务器拒绝服务端搜索，改为本地过滤: {e}")
+            return None
+        if status != 'OK':
+            logger.warning(f"服务器拒绝服务端搜索，改为本地过滤: {messages}")
+            return None
+        return list(map(int, messages[0].split()))
+    
+    def _folder_watermark(self, account: str, folder: str, uidvalidity: int, filter_hash: str) -> int:
+        """返回水位线；UIDVALIDITY 变化或本地数据不满足当前过滤条件时重建文件夹"""
+        state = self.store.get_folder_state(account, folder)
+        if state is not None and state['uidvalidity'] == uidvalidity:
+            # 全量同步的数据满足任何过滤条件；服务端过滤的数据只对同一条件有效
+            if state['filter_hash'] in ('', filter_hash):
+                return state['last_uid']
+            logger.warning(f"文件夹 {folder} 的服务端过滤条件已变化，重建本地邮件存储")
+        elif state is not None:
+            logger.warning(f"文件夹 {folder} 的 UIDVALIDITY 已变化，重建本地邮件存储")
+        self.store.reset_folder(account, folder, uidvalidity, filter_hash)
+        return 0
+    
+    def _sync_folder(self, mail, folder: str, since: datetime,
+                     from_emails: List[str], subject_keywords: List[str]) -> int:
+        """增量同步文件夹：只拉取水位线之上的新UID的头部，返回当前 UIDVALIDITY"""
+        account = self.config.username
+        status, _ = mail.select(folder)
+        if status != 'OK':
+            raise RuntimeError(f"无法选择邮件文件夹: {folder}")
+        uidvalidity = int(mail.response('UIDVALIDITY')[1][0])
+        
+        new_uids = None
+        server_from, server_subjects = self._server_filters(from_emails, subject_keywords)
+        if self.config.server_side_search and (server_from or server_subjects) and self._server_search_allowed():
+            filter_hash = self._filter_hash(server_from, server_subjects)
+            last_uid = self._folder_watermark(account, folder, uidvalidity, filter_hash)
+            # SELECT 时的 UIDNEXT 之前的邮件都已被本次搜索覆盖，水位线可以直接推进到这里
+            uidnext = mail.response('UIDNEXT')[1][0]
+            if uidnext is None:
+                _, status_data = mail.status(folder, '(UIDNEXT)')
+                match = re.search(rb'UIDNEXT (\d+)', status_data[0] or b'')
+                uidnext = match.group(1) if match else None
+            new_uids = self._server_search(mail, last_uid, since, server_from, server_subjects)
+            rejected_at = self.store.get_search_rejected_at(account, self.config.imap_host)
+            if new_uids is None or rejected_at is not None:
+                self.store.set_search_rejected(account, self.config.imap_host, new_uids is None)
+        
+        if new_uids is None:
+            filter_hash = ''
+            last_uid = self._folder_watermark(account, folder, uidvalidity, filter_hash)
+            uidnext = None
+            # 搜索邮件 - 只用日期和UID条件，发件人和主题在本地过滤
+            search_criteria = f'(UID {last_uid + 1}:* SINCE "{since.strftime("%d-%b-%Y")}")'
+            logger.info(f"搜索条件: {search_criteria}")
+            status, messages = mail.uid('SEARCH', None, search_criteria)
+            if status != 'OK':
+                raise RuntimeError("邮件搜索失败")
+            new_uids = list(map(int, messages[0].split()))
+        
+        # "n:*" 在没有新邮件时会返回当前最大UID，需要再按水位线过滤一次
+        new_uids = [uid for uid in new_uids if uid > last_uid]
+        logger.info(f"文件夹 {folder}: 水位线 UID {last_uid}，新邮件 {len(new_uids)} 封")
         
-        return body.strip()
+        headers, failed_uids = self._fetch_headers(mail, new_uids) if new_uids else ({}, [])
+        new_last_uid = max([last_uid, *headers, int(uidnext) - 1 if uidnext else 0])
+        if failed_uids:
+            # 头部预取失败的邮件下次重新拉取：水位线停在其中最小的UID之前
+            new_last_uid = min(new_last_uid, min(failed_uids) - 1)
+            logger.warning(f"文件夹 {folder}: {len(failed_uids)} 封邮件头部预取失败，水位线停在 UID {new_last_uid}")
+        if headers or new_last_uid > last_uid:
+            self.store.save_headers(account, folder, uidvalidity, list(headers.values()), new_last_uid, filter_hash)
+        
+        return uidvalidity
+    
+    def _match_reports(self, rows: List[Dict], from_emails: List[str], subject_keywords: List[str]) -> List[Dict]:
+        """按发件人和主题关键词过滤本地存储中的邮件"""
+        matched = []
+        for row in rows:
+            from_addr = row['sender'] or ''
+            subject = row['subject'] or ''
+            
+            # 手动过滤发件人
+            sender_match = any(target_email in from_addr for target_email in from_emails) if from_emails else True
+            if not sender_match:
+                logger.debug(f"跳过邮件 (发件人不匹配): {from_addr}")
+                continue
+            
+            # 检查主题是否包含关键词
+            keyword_match = any(keyword in subject for keyword in subject_keywords)
+            if not keyword_match:
+                logger.debug(f"跳过邮件 (主题不包含关键词): {subject}")
+                continue
+            
+            matched.append(row)
+        return matched
+    
+    def sync_reports(self, mail, folder: str, from_emails: List[str], subject_keywords: List[str],
+                     since: datetime) -> List[Dict]:
+        """同步文件夹新邮件到本地存储，并为匹配的日报下载正文，返回匹配的存储行"""
+        account = self.config.username
+        uidvalidity = self._sync_folder(mail, folder, since, from_emails, subject_keywords)
+        
+        # 从本地存储读取邮件，按发件人和主题过滤
+        rows = self.store.load_messages(account, folder, uidvalidity, since.strftime('%Y-%m-%d'))
+        matched = self._match_reports(rows, from_emails, subject_keywords)
+        
+        # 只下载本地尚无正文的邮件
+        missing = [row['uid'] for row in matched if row['body'] is None]
+        logger.info(f"匹配 {len(matched)} 封日报，其中 {len(missing)} 封需要下载正文")
+        
+        if missing:
+            new_bodies = self._fetch_bodies(mail, missing)
+            self.store.save_bodies(account, folder, uidvalidity, new_bodies)
+            for row in matched:
+                if row['body'] is None:
+                    row['body'] = new_bodies.get(row['uid'])
+        
+        return matched
+    
+    def _load_local_reports(self, folder: str, from_emails: List[str], subject_keywords: List[str],
+                            since: datetime) -> List[Dict]:
+        """只从本地存储读取匹配的日报（由后台监听器负责同步）"""
+        state = self.store.get_folder_state(self.config.username, folder)
+        if state is None:
+            logger.warning(f"文件夹 {folder} 尚未同步到本地存储")
+            return []
+        rows = self.store.load_messages(self.config.username, folder, state['uidvalidity'], since.strftime('%Y-%m-%d'))
+        return self._match_reports(rows, from_emails, subject_keywords)
+    
+    def _rows_to_reports(self, matched: List[Dict]) -> List[Dict]:
+        """把匹配的存储行转换为日报字典，跳过没有正文的邮件（本地存储保留原始正文）"""
+        reports = []
+        for row in matched:
+            if row['body']:
+                # 去掉引用的历史邮件和签名，只把本次新写的内容交给AI
+                body, removed_chars = row['body'], 0
+                if self.config.strip_quotes:
+                    body, removed_chars = strip_quotes_and_signature(body)
+                reports.append({
+                    'subject': row['subject'],
+                    'from': row['sender'],
+                    'date': row['date_header'],
+                    'body': body,
+                    'message_id': row['message_id'],
+                    'removed_chars': removed_chars
+                })
+                logger.info(f"✅ 收集到日报: {row['subject']} - {row['sender']}"
+                            + (f" (去除引用/签名 {removed_chars} 字符)" if removed_chars else ""))
+            elif row['body'] is None:
+                logger.warning(f"⚠️ 未能下载邮件正文: {row['subject']} - {row['sender']}")
+            else:
+                logger.warning(f"⚠️ 邮件正文为空: {row['subject']} - {row['sender']}")
+        return reports
+    
+    def collect_folder_reports(self, mail, folder: str, from_emails: List[str], subject_keywords: List[str],
+                               since: datetime) -> List[Dict]:
+        """收集单个文件夹的日报；mail 为 None 时只读本地存储"""
+        if mail is None:
+            matched = self._load_local_reports(folder, from_emails, subject_keywords, since)
+        else:
+            matched = self.sync_reports(mail, folder, from_emails, subject_keywords, since)
+        return self._rows_to_reports(matched)
     
     def collect_reports(self, 
                        from_emails: List[str], 
                        subject_keywords: List[str], 
-                       days: int = 1) -> List[Dict]:
-        """收集日报邮件"""
+                       days: int = 1,
+                       local_only: bool = False,
+                       folder: str = 'INBOX') -> List[Dict]:
+        """收集日报邮件（增量同步到本地邮件存储后从存储中读取）
+        
+        local_only: 后台监听器在线时只读本地存储，不连接IMAP服务器
+        多个账号或文件夹请使用 mail_sources.ReportCollector
+        """
         # 打印详细的收集配置
         logger.info("=" * 50)
-        logger.info("📧 开始收集日报邮件")
+        logger.info("📧 开始收集日报邮件" + (" (读取本地存储)" if local_only else ""))
         logger.info(f"📬 目标邮箱列表 (共{len(from_emails)}个):")
         for i, email_addr in enumerate(from_emails, 1):
             logger.info(f"   {i}. {email_addr}")
@@ -130,84 +448,33 @@ class EmailHandler:
         logger.info("=" * 50)
         
         reports = []
-        mail = self.connect_imap()
+        self.stats = {'bytes_downloaded': 0, 'fetch_commands': 0}
+        # 计算日期范围（与原逻辑一致，从今天开始）
+        since = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
         
-        try:
-            # 选择收件箱
-            mail.select('INBOX')
-            
-            # 计算日期范围
-            end_date = datetime.now()
-            
-            # 搜索邮件 - 只用日期条件，不在IMAP中过滤发件人
-            date_criteria = end_date.strftime("%d-%b-%Y")
-            search_criteria = f'(SINCE "{date_criteria}")'
-            
-            # 不在IMAP搜索中过滤发件人，改为后续手动过滤
-            
-            logger.info(f"搜索条件: {search_criteria}")
-            status, messages = mail.search(None, search_criteria)
-            
-            if status != 'OK':
-                logger.error("邮件搜索失败")
+        if local_only:
+            reports = self.collect_folder_reports(None, folder, from_emails, subject_keywords, since)
+        else:
+            mail = self.connect_imap()
+            try:
+                reports = self.collect_folder_reports(mail, folder, from_emails, subject_keywords, since)
+            except RuntimeError as e:
+                logger.error(str(e))
                 return reports
-            
-            email_ids = messages[0].split()
-            logger.info(f"找到 {len(email_ids)} 封邮件")
-            
-            for email_id in email_ids:
-                try:
-                    # 获取邮件
-                    status, msg_data = mail.fetch(email_id, '(RFC822)')
-                    if status != 'OK':
-                        continue
-                    
-                    # 解析邮件
-                    msg = email.message_from_bytes(msg_data[0][1])
-                    
-                    # 获取邮件信息
-                    subject = self.decode_mime_words(msg.get('Subject', ''))
-                    from_addr = self.decode_mime_words(msg.get('From', ''))
-                    date_str = msg.get('Date', '')
-                    
-                    # 手动过滤发件人
-                    sender_match = any(target_email in from_addr for target_email in from_emails) if from_emails else True
-                    if not sender_match:
-                        logger.debug(f"跳过邮件 (发件人不匹配): {from_addr}")
-                        continue
-                    
-                    # 检查主题是否包含关键词
-                    keyword_match = any(keyword in subject for keyword in subject_keywords)
-                    if not keyword_match:
-                        logger.debug(f"跳过邮件 (主题不包含关键词): {subject}")
-                        continue
-                    
-                    # 获取邮件正文
-                    body = self.get_email_body(msg)
-                    
-                    if body:
-                        reports.append({
-                            'subject': subject,
-                            'from': from_addr,
-                            'date': date_str,
-                            'body': body
-                        })
-                        logger.info(f"✅ 收集到日报: {subject} - {from_addr}")
-                    else:
-                        logger.warning(f"⚠️ 邮件正文为空: {subject} - {from_addr}")
-                
-                except Exception as e:
-                    logger.error(f"处理邮件 {email_id} 时出错: {e}")
-                    continue
-            
-        finally:
-            mail.close()
-            mail.logout()
+            finally:
+                mail.close()
+                mail.logout()
         
-        # 详细的收集结果汇总
+        self.log_collection_result(reports)
+        return reports
+    
+    def log_collection_result(self, reports: List[Dict]):
+        """打印详细的收集结果汇总"""
         logger.info("=" * 50)
         logger.info(f"📊 日报收集完成")
         logger.info(f"✅ 成功收集: {len(reports)} 份日报")
+        logger.info(f"✂️ 去除引用/签名: {sum(r.get('removed_chars', 0) for r in reports)} 字符")
+        logger.info(f"📦 下载数据量: {self.stats['bytes_downloaded']} 字节 ({self.stats['fetch_commands']} 次FETCH)")
         
         if reports:
             logger.info("📋 收集到的日报详情:")
@@ -221,28 +488,30 @@ class EmailHandler:
             logger.info("   3. 邮件时间不在搜索范围内")
         
         logger.info("=" * 50)
-        return reports
+    
+    def build_message(self, to_emails: List[str], subject: str, content: str,
+                      content_type: str = "plain") -> MIMEMultipart:
+        """创建邮件"""
+        msg = MIMEMultipart()
+        msg['From'] = self.config.username
+        msg['To'] = ', '.join(to_emails)
+        msg['Subject'] = subject
+        
+        # 添加邮件正文
+        msg.attach(MIMEText(content, content_type, 'utf-8'))
+        return msg
     
     def send_email(self, 
                    to_emails: List[str], 
                    subject: str, 
                    content: str, 
                    content_type: str = "plain") -> bool:
-        """发送邮件"""
+        """发送邮件（同步发送，每次新建SMTP连接；后台批量发送请使用 MailOutbox）"""
         try:
             server = self.connect_smtp()
             
-            # 创建邮件
-            msg = MIMEMultipart()
-            msg['From'] = self.config.username
-            msg['To'] = ', '.join(to_emails)
-            msg['Subject'] = subject
-            
-            # 添加邮件正文
-            msg.attach(MIMEText(content, content_type, 'utf-8'))
-            
             # 发送邮件
-            server.send_message(msg)
+            server.send_message(self.build_message(to_emails, subject, content, content_type))
             server.quit()
             
             logger.info(f"邮件发送成功: {subject} -> {', '.join(to_emails)}")
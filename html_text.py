@@ -0,0 +1,173 @@
+"""
+HTML转纯文本模块
+提供三种可选的提取后端，段落、换行和列表结构统一保留为换行，保证 【项目】： 等标记各占一行：
+    lxml    - 基于 lxml 解析树，速度最快
+    stream  - 基于标准库 HTMLParser 的流式提取，不构建树
+    bs4     - BeautifulSoup，兼容性最好，作为兜底
+"""
+
+import re
+from html.parser import HTMLParser
+from typing import Callable, Dict, List
+from loguru import logger
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html as lxml_html
+except ImportError:  # lxml 为可选依赖，缺失时 auto 模式使用 stream 后端
+    lxml_html = None
+
+# 前后需要换行的块级标签（相邻块级边界只产生一个换行，<br> 总是产生换行）
+BLOCK_TAGS = frozenset({
+    'address', 'article', 'aside', 'blockquote', 'dd', 'div', 'dl', 'dt', 'footer',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'li', 'ol', 'p', 'pre', 'section',
+    'table', 'tbody', 'td', 'tfoot', 'th', 'thead', 'tr', 'ul',
+})
+# 内容不属于正文的标签
+SKIP_TAGS = frozenset({'head', 'script', 'style', 'title', 'noscript', 'template', 'xml'})
+
+# 块级边界标记，最终合并为换行；<br> 在 bs4 后端中先用占位符表示，避免被空白折叠吞掉
+BLOCK_MARK = '\x00'
+LINE_BREAK_MARK = '\x01'
+
+WHITESPACE_PATTERN = re.compile(r'[ \t\r\n\f\v\xa0\u3000]+')
+BLOCK_RUN_PATTERN = re.compile(r'[\x00\s]*\x00[\x00\s]*')
+BLANK_LINES_PATTERN = re.compile(r'\n{3,}')
+
+
+def _collapse(text: str) -> str:
+    """按 HTML 规则把文本中的连续空白折叠为一个空格"""
+    return WHITESPACE_PATTERN.sub(' ', text)
+
+
+def _finish(chunks: List[str]) -> str:
+    """拼接文本片段：连续的块级边界合并为一个换行，去掉行首尾空白，最多保留一个空行"""
+    text = ''.join(chunks)
+    text = BLOCK_RUN_PATTERN.sub(lambda m: '\n' * (1 + m.group(0).count('\n')), text)
+    lines = [line.strip() for line in text.split('\n')]
+    return BLANK_LINES_PATTERN.sub('\n\n', '\n'.join(lines)).strip()
+
+
+class _StreamCollector(HTMLParser):
+    """流式收集文本，遇到块级标签输出换行"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.chunks: List[str] = []
+        self.skip_depth = 0
+        self.pre_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self.skip_depth += 1
+        elif tag == 'br':
+            self.chunks.append('\n')
+        elif tag in BLOCK_TAGS:
+            self.chunks.append(BLOCK_MARK)
+            if tag == 'pre':
+                self.pre_depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        if tag == 'br':
+            self.chunks.append('\n')
+        elif tag in BLOCK_TAGS:
+            self.chunks.append(BLOCK_MARK)
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self.skip_depth = max(0, self.skip_depth - 1)
+        elif tag in BLOCK_TAGS:
+            self.chunks.append(BLOCK_MARK)
+            if tag == 'pre':
+                self.pre_depth = max(0, self.pre_depth - 1)
+
+    def handle_data(self, data):
+        if not self.skip_depth:
+            self.chunks.append(data if self.pre_depth else _collapse(data))
+
+
+def extract_stream(html: str) -> str:
+    """基于 HTMLParser 的流式提取"""
+    collector = _StreamCollector()
+    collector.feed(html)
+    collector.close()
+    return _finish(collector.chunks)
+
+
+def extract_lxml(html: str) -> str:
+    """基于 lxml 解析树的提取"""
+    if not html.strip():
+        return ''
+    root = lxml_html.document_fromstring(html)
+    chunks = []
+
+    def walk(element, in_pre: bool):
+        # 注释和处理指令的 tag 不是字符串，只保留其后的文本
+        tag = element.tag.lower() if isinstance(element.tag, str) else None
+        if tag == 'br':
+            chunks.append('\n')
+        elif tag is not None and tag not in SKIP_TAGS:
+            block = tag in BLOCK_TAGS
+            inner_pre = in_pre or tag == 'pre'
+            if block:
+                chunks.append(BLOCK_MARK)
+            if element.text:
+                chunks.append(element.text if inner_pre else _collapse(element.text))
+            for child in element:
+                walk(child, inner_pre)
+            if block:
+                chunks.append(BLOCK_MARK)
+        if element.tail:
+            chunks.append(element.tail if in_pre else _collapse(element.tail))
+
+    walk(root, False)
+    return _finish(chunks)
+
+
+def extract_bs4(html: str) -> str:
+    """BeautifulSoup 提取（兜底后端，不保留 <pre> 内的空白）"""
+    soup = BeautifulSoup(html, 'html.parser')
+    for tag in soup.find_all(SKIP_TAGS):
+        tag.decompose()
+    for tag in soup.find_all('br'):
+        tag.replace_with(LINE_BREAK_MARK)
+    for tag in soup.find_all(BLOCK_TAGS):
+        tag.insert_before(BLOCK_MARK)
+        tag.insert_after(BLOCK_MARK)
+    text = _collapse(soup.get_text()).replace(LINE_BREAK_MARK, '\n')
+    return _finish([text])
+
+
+EXTRACTORS: Dict[str, Callable[[str], str]] = {
+    'lxml': extract_lxml,
+    'stream': extract_stream,
+    'bs4': extract_bs4,
+}
+
+
+def resolve_backend(name: str = 'auto') -> str:
+    """解析后端名称，auto 优先使用 lxml"""
+    name = (name or 'auto').lower()
+    if name == 'auto':
+        return 'lxml' if lxml_html is not None else 'stream'
+    if name == 'lxml' and lxml_html is None:
+        logger.warning("未安装 lxml，HTML提取改用 stream 后端")
+        return 'stream'
+    if name not in EXTRACTORS:
+        logger.warning(f"未知的HTML提取后端 {name}，改用 bs4")
+        return 'bs4'
+    return name
+
+
+def html_to_text(html: str, backend: str = 'auto') -> str:
+    """把HTML转换为保留段落结构的纯文本，所选后端失败时退回 BeautifulSoup"""
+    if not html:
+        return ''
+    name = resolve_backend(backend)
+    try:
+        return EXTRACTORS[name](html)
+    except Exception as e:
+        if name == 'bs4':
+            raise
+        logger.warning(f"HTML提取后端 {name} 失败，改用 bs4: {e}")
+        return extract_bs4(html)
@@ -0,0 +1,156 @@
+"""
+IMAP响应解析模块
+负责把 imaplib 返回的FETCH片段按邮件分组，并解析 BODYSTRUCTURE 以定位正文所在的MIME段
+"""
+
+import re
+from typing import Dict, List, Optional
+
+LITERAL_PATTERN = re.compile(rb'\{(\d+)\}$')
+UID_PATTERN = re.compile(rb'UID (\d+)')
+
+
+def group_fetch_response(data: list):
+    """把FETCH响应片段按邮件分组
+
+    imaplib 遇到字面量时产出 (行, 字面量) 元组，并继续读取同一响应的下一行；
+    普通 bytes 片段表示一条响应的结束
+    """
+    group = []
+    for item in data:
+        if isinstance(item, tuple):
+            group.append(item)
+        elif isinstance(item, bytes):
+            group.append(item)
+            yield group
+            group = []
+    if group:
+        yield group
+
+
+def fetch_uid(group: list) -> Optional[int]:
+    """从一条FETCH响应中取出UID"""
+    for piece in group:
+        line = piece[0] if isinstance(piece, tuple) else piece
+        match = UID_PATTERN.search(line)
+        if match:
+            return int(match.group(1))
+    return None
+
+
+def _inline_literals(group: list) -> bytes:
+    """把响应中的字面量内联为带引号的字符串，便于统一分词"""
+    parts = []
+    for piece in group:
+        if isinstance(piece, tuple):
+            line, literal = piece
+            parts.append(LITERAL_PATTERN.sub(b'', line))
+            parts.append(b'"' + literal.replace(b'\\', b'\\\\').replace(b'"', b'\\"') + b'"')
+        else:
+            parts.append(piece)
+    return b''.join(parts)
+
+
+def _parse_list(data: bytes, pos: int):
+    """解析括号列表，返回 (列表, 结束位置)"""
+    items = []
+    length = len(data)
+    while pos < length:
+        char = data[pos:pos + 1]
+        if char in (b' ', b'\r', b'\n'):
+            pos += 1
+        elif char == b'(':
+            sub, pos = _parse_list(data, pos + 1)
+            items.append(sub)
+        elif char == b')':
+            return items, pos + 1
+        elif char == b'"':
+            pos += 1
+            buf = bytearray()
+            while pos < length and data[pos:pos + 1] != b'"':
+                if data[pos:pos + 1] == b'\\':
+                    pos += 1
+                buf += data[pos:pos + 1]
+                pos += 1
+            items.append(bytes(buf).decode('utf-8', errors='replace'))
+            pos += 1
+        else:
+            end = pos
+            while end < length and data[end:end + 1] not in (b' ', b'(', b')', b'\r', b'\n'):
+                end += 1
+            atom = data[pos:end].decode('ascii', errors='replace')
+            items.append(None if atom.upper() == 'NIL' else atom)
+            pos = end
+    return items, pos
+
+
+def parse_bodystructure(group: list) -> Optional[list]:
+    """从一条FETCH响应中解析出 BODYSTRUCTURE 嵌套列表"""
+    data = _inline_literals(group)
+    start = data.find(b'(')
+    if start == -1:
+        return None
+    items, _ = _parse_list(data, start + 1)
+    for i, item in enumerate(items[:-1]):
+        if isinstance(item, str) and item.upper() in ('BODYSTRUCTURE', 'BODY'):
+            structure = items[i + 1]
+            return structure if isinstance(structure, list) else None
+    return None
+
+
+def _params(value) -> Dict[str, str]:
+    if not isinstance(value, list):
+        return {}
+    return {
+        str(value[i]).lower(): value[i + 1]
+        for i in range(0, len(value) - 1, 2)
+        if value[i] is not None
+    }
+
+
+def _is_attachment(part: list, is_text: bool) -> bool:
+    # 文本类型的扩展字段比其他基本类型多一个 lines 字段
+    index = 9 if is_text else 8
+    if len(part) > index and isinstance(part[index], list) and part[index]:
+        return str(part[index][0]).lower() == 'attachment'
+    return False
+
+
+def _iter_leaf_parts(structure: list, prefix: str = ''):
+    """深度优先遍历叶子段，产出 (段号, 段结构)"""
+    if structure and isinstance(structure[0], list):
+        index = 0
+        for sub in structure:
+            if not isinstance(sub, list):
+                break
+            index += 1
+            section = f"{prefix}.{index}" if prefix else str(index)
+            yield from _iter_leaf_parts(sub, section)
+    else:
+        yield (prefix or '1'), structure
+
+
+def find_text_section(structure: list) -> Optional[Dict]:
+    """找到第一个 text/plain 段（没有则退回第一个 text/html 段）
+
+    返回 {'section', 'subtype', 'charset', 'encoding', 'size'}，找不到返回None
+    """
+    html_part = None
+    for section, part in _iter_leaf_parts(structure):
+        if len(part) < 7 or not isinstance(part[0], str) or not isinstance(part[1], str):
+            continue
+        if part[0].lower() != 'text' or _is_attachment(part, True):
+            continue
+
+        info = {
+            'section': section,
+            'subtype': part[1].lower(),
+            'charset': _params(part[2]).get('charset'),
+            'encoding': (part[5] or '7bit').lower(),
+            'size': int(part[6]) if str(part[6]).isdigit() else 0
+        }
+        if info['subtype'] == 'plain':
+            return info
+        if info['subtype'] == 'html' and html_part is None:
+            html_part = info
+    return html_part
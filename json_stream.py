@@ -0,0 +1,168 @@
+"""
+流式JSON解析模块
+模型输出的JSON常带有前后说明文字、```json 代码块，或因输出长度限制被截断。
+IncrementalJSONParser 按块增量扫描一次：定位第一个顶层对象、判断是否完整，
+并记录最近一个可安全截断的位置，截断时补齐括号还原最长的有效前缀
+"""
+
+import json
+import re
+from typing import Dict, List, Optional, Tuple
+
+# 一次匹配一个完整字符串（末尾引号缺失表示字符串被截断）或一个结构字符
+TOKEN_PATTERN = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*(")?|[{}\[\],]', re.S)
+# 从字符串中间继续扫描
+STRING_REST_PATTERN = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*(")?', re.S)
+
+CLOSERS = {'{': '}', '[': ']'}
+
+_DECODER = json.JSONDecoder()
+
+
+class IncrementalJSONParser:
+    """增量JSON解析器
+
+    用法:
+        parser = IncrementalJSONParser()
+        for chunk in stream:
+            parser.feed(chunk)
+        data = parser.result()      # 完整对象，或截断对象的最长有效前缀
+        parser.complete             # 顶层对象是否已闭合
+    """
+
+    def __init__(self):
+        self._text = ''
+        self._reset(0)
+
+    def _reset(self, pos: int):
+        self._pos = pos
+        self._start = -1  # 顶层对象 '{' 的位置
+        self._end = None  # 顶层对象闭合后的位置
+        self._stack: List[str] = []  # 未闭合容器对应的闭合符
+        self._in_string = False
+        # 最近一个可截断的位置及当时的容器深度；每次入栈/出栈都会更新，
+        # 因此 stack[:depth] 始终等于当时的栈，需要时再生成闭合符
+        self._safe: Tuple[int, int] = (0, 0)
+        self._result = None
+        self._parsed = False
+
+    def feed(self, chunk: str) -> bool:
+        """追加一段文本并继续扫描，返回顶层对象是否已完整"""
+        if chunk:
+            self._text += chunk
+            self._parsed = False
+            self._scan()
+        return self.complete
+
+    def _scan(self):
+        text = self._text
+        pos = self._pos
+        if self._start < 0:
+            index = text.find('{', pos)
+            if index < 0:
+                self._pos = len(text)
+                return
+            self._start = index
+            self._stack.append('}')
+            pos = index + 1
+            self._safe = (pos, 1)
+
+        if self._in_string:
+            # 上一块在字符串中间结束（可能停在转义符前），从断点继续
+            match = STRING_REST_PATTERN.match(text, pos)
+            self._pos = match.end()
+            if match.group(1) is None:
+                return
+            self._in_string = False
+            pos = match.end()
+
+        stack = self._stack
+        safe = self._safe
+        search = TOKEN_PATTERN.search
+        while True:
+            match = search(text, pos)
+            if match is None:
+                pos = len(text)
+                break
+            token = match.group()
+            pos = match.end()
+            if token[0] == '"':
+                if match.group(1) is None:
+                    self._in_string = True
+                    break
+            elif token == ',':
+                # 逗号之前的内容是完整的元素
+                safe = (match.start(), len(stack))
+            elif token in CLOSERS:
+                stack.append(CLOSERS[token])
+                safe = (pos, len(stack))
+            else:
+                stack.pop()
+                if not stack:
+                    self._end = pos
+                    break
+                safe = (pos, len(stack))
+        self._pos = pos
+        self._safe = safe
+
+    @property
+    def text(self) -> str:
+        """已接收的全部文本"""
+        return self._text
+
+    @property
+    def started(self) -> bool:
+        return self._start >= 0
+
+    @property
+    def complete(self) -> bool:
+        return self._end is not None
+
+    @property
+    def truncated(self) -> bool:
+        """已出现对象但尚未闭合（流结束时即为被截断）"""
+        return self.started and not self.complete
+
+    def _candidate(self) -> str:
+        if self._end is not None:
+            return self._text[self._start:self._end]
+        pos, depth = self._safe
+        return self._text[self._start:pos] + ''.join(reversed(self._stack[:depth]))
+
+    def result(self) -> Optional[Dict]:
+        """返回解析出的对象：完整时为整个对象，截断时为补齐括号后的最长有效前缀；无法解析返回None"""
+        if self._parsed:
+            return self._result
+        while self.started:
+            try:
+                data = json.loads(self._candidate())
+            except json.JSONDecodeError:
+                data = None
+            if isinstance(data, dict) or not self.complete:
+                self._result = data if isinstance(data, dict) else None
+                break
+            # 闭合的花括号不是合法JSON（如说明文字中的 {项目}），从下一个 '{' 重新扫描
+            self._reset(self._start + 1)
+            self._scan()
+        self._parsed = True
+        return self._result
+
+
+def parse_json_text(text: str) -> Tuple[Optional[Dict], bool]:
+    """一次性解析完整文本，返回 (对象, 是否完整)
+
+    文本已全部到达时，先从第一个 '{' 用 C 实现的解码器直接解析完整对象；
+    失败（被截断或前面有非JSON的花括号）时再逐块扫描
+    """
+    start = text.find('{')
+    if start < 0:
+        return None, False
+    try:
+        data, _ = _DECODER.raw_decode(text, start)
+        if isinstance(data, dict):
+            return data, True
+    except json.JSONDecodeError:
+        pass
+    parser = IncrementalJSONParser()
+    parser.feed(text)
+    return parser.result(), parser.complete
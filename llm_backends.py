@@ -0,0 +1,248 @@
+"""
+LLM调用后端
+所有后端提供与 Application.call 相同的 call(**kwargs) 接口（stream=True 时返回增量输出的迭代器），
+由 LLM_BACKEND 选择：
+    dashscope - 直接调用百炼应用（默认）
+    record    - 调用百炼的同时把 提示词 -> 输出 记录到 LLM_RECORDINGS_DIR
+    replay    - 从记录目录回放输出，按 LLM_REPLAY_LATENCY 模拟耗时，无需网络和密钥
+    fake      - 按规则从提示词生成符合项目分析结构的JSON，用于离线基准和回归检查
+"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from http import HTTPStatus
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, Iterator, List, Optional
+from dashscope import Application
+from loguru import logger
+from config import AIConfig
+
+# 流式回放时每段的字符数
+STREAM_CHUNK_CHARS = 24
+
+
+def make_response(text: str = '', status_code: int = HTTPStatus.OK, message: str = '') -> SimpleNamespace:
+    """构造与 Application.call 返回值结构相同的响应"""
+    return SimpleNamespace(status_code=status_code, message=message, output=SimpleNamespace(text=text))
+
+
+def _stream_text(text: str, latency: float) -> Iterator[SimpleNamespace]:
+    """按块输出文本，总耗时约为 latency"""
+    chunks = [text[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(text), STREAM_CHUNK_CHARS)] or ['']
+    delay = latency / len(chunks)
+    for chunk in chunks:
+        if delay:
+            time.sleep(delay)
+        yield make_response(chunk)
+
+
+class LLMBackend:
+    """后端接口"""
+
+    name = 'base'
+
+    def call(self, **kwargs):
+        raise NotImplementedError
+
+
+class DashScopeBackend(LLMBackend):
+    """百炼应用"""
+
+    name = 'dashscope'
+
+    def call(self, **kwargs):
+        return Application.call(**kwargs)
+
+
+def recording_key(prompt: str) -> str:
+    """记录文件名只取决于提示词：回放环境没有真实的应用ID（记录中保留 app_id 仅供查看）"""
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+
+def _legacy_recording_key(app_id: str, prompt: str) -> str:
+    # 早期的记录按 应用ID + 提示词 命名，应用ID一致时仍可回放
+    return hashlib.sha256(f"{app_id}\n{prompt}".encode('utf-8')).hexdigest()
+
+
+class RecordingBackend(LLMBackend):
+    """调用内层后端并记录成功的输出（每个提示词一个 JSON 文件，重复调用覆盖为最新结果）"""
+
+    name = 'record'
+
+    def __init__(self, inner: LLMBackend, directory: str):
+        self.inner = inner
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _save(self, kwargs: Dict, text: str, latency: float):
+        app_id = kwargs.get('app_id', '')
+        prompt = kwargs.get('prompt', '')
+        record = {
+            'app_id': app_id,
+            'prompt': prompt,
+            'output': text,
+            'latency': round(latency, 3),
+            'recorded_at': time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+        path = self.directory / f"{recording_key(prompt)}.json"
+        # 先写临时文件再替换，并发记录时不会读到半个文件
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(record, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, path)
+
+    def _record_stream(self, responses, kwargs: Dict, start: float):
+        pieces = []
+        for response in responses:
+            if response.status_code == HTTPStatus.OK:
+                pieces.append(response.output.text or '')
+            yield response
+            if response.status_code != HTTPStatus.OK:
+                return
+        self._save(kwargs, ''.join(pieces), time.monotonic() - start)
+
+    def call(self, **kwargs):
+        start = time.monotonic()
+        response = self.inner.call(**kwargs)
+        if kwargs.get('stream'):
+            return self._record_stream(response, kwargs, start)
+        if response.status_code == HTTPStatus.OK:
+            self._save(kwargs, response.output.text, time.monotonic() - start)
+        return response
+
+
+class ReplayBackend(LLMBackend):
+    """回放记录的输出；latency 为 'recorded' 时按记录时的实际耗时，否则为固定秒数"""
+
+    name = 'replay'
+
+    def __init__(self, directory: str, latency: str = 'recorded'):
+        self.directory = Path(directory)
+        self.latency = latency
+        self._records: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def _load(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            if key not in self._records:
+                path = self.directory / f"{key}.json"
+                self._records[key] = json.loads(path.read_text(encoding='utf-8')) if path.exists() else None
+            return self._records[key]
+
+    def _latency(self, record: Dict) -> float:
+        if self.latency == 'recorded':
+            return record.get('latency', 0)
+        return float(self.latency)
+
+    def call(self, **kwargs):
+        prompt = kwargs.get('prompt', '')
+        record = self._load(recording_key(prompt)) or self._load(_legacy_recording_key(kwargs.get('app_id', ''), prompt))
+        if record is None:
+            logger.warning("回放记录中没有该提示词的输出")
+            response = make_response(status_code=HTTPStatus.NOT_FOUND, message='recording not found')
+            return iter([response]) if kwargs.get('stream') else response
+        latency = self._latency(record)
+        if kwargs.get('stream'):
+            return _stream_text(record['output'], latency)
+        time.sleep(latency)
+        return make_response(record['output'])
+
+
+class FakeBackend(LLMBackend):
+    """规则生成的项目分析JSON：同一提示词总是得到同样的输出"""
+
+    name = 'fake'
+
+    SECTION_PATTERN = re.compile(r'【项目】：(.+?)\n\n日报内容：\n(.*?)(?=\n\n【项目】：|\n\n请你|\Z)', re.S)
+    STAGES = ['验收', '测试', '联调', '开发', '设计', '需求']
+    ROLES = {'研发': ('开发', '编码', '接口', '联调', '修复'), '测试': ('测试', '用例', '回归'),
+             '产品': ('需求', '产品', '原型'), 'PM': ('客户', '计划', '协调', '验收')}
+    BLOCK_WORDS = ('阻塞', '延期', '卡住', '等待')
+    RISK_WORDS = ('风险', '问题', '延迟', '不稳定')
+    PROGRESS_WORDS = ('完成', '推进', '上线', '修复', '优化', '新增')
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    def _analyze(self, content: str) -> Dict:
+        lines = [line.strip(' -*\t') for line in content.split('\n') if line.strip()]
+        stage = next((stage for stage in self.STAGES if stage in content), '不确定')
+        events: List[str] = []
+        for line in lines:
+            if any(word in line for word in self.BLOCK_WORDS + self.RISK_WORDS):
+                events.append(f"卡点：{line[:40]}")
+            elif any(word in line for word in self.PROGRESS_WORDS):
+                events.append(f"推进：{line[:40]}")
+        personnel = {
+            role: {'work_type': next(word for word in words if word in content),
+                   'load_status': '高负载' if content.count(words[0]) > 2 else '中等负载'}
+            for role, words in self.ROLES.items() if any(word in content for word in words)
+        }
+        blocked = any(word in content for word in self.BLOCK_WORDS)
+        risky = blocked or any(word in content for word in self.RISK_WORDS)
+        risk_line = next((line for line in lines if any(word in line for word in self.BLOCK_WORDS + self.RISK_WORDS)), '')
+        return {
+            'project_stage': stage,
+            'key_events': events[:6],
+            'personnel': personnel,
+            'role_gaps': [] if '测试' in personnel or stage not in ('测试', '验收') else ['缺少测试角色参与'],
+            'single_point_risk': len(personnel) == 1,
+            'health_status': 'red' if blocked else 'yellow' if risky else 'green' if events else 'unknown',
+            'risk_signals': {
+                'fake_progress': False,
+                'delay_risk': blocked,
+                'requirement_unstable': '需求变更' in content,
+                'external_block': blocked and any(word in content for word in ('客户', '第三方', '供应商'))
+            },
+            'main_risk': risk_line[:60] or '暂无明显风险',
+            'tomorrow_expectation_check': {
+                'reasonable': not blocked,
+                'optimistic_bias': blocked,
+                'missing_prerequisites': [risk_line[:30]] if blocked else []
+            }
+        }
+
+    def generate(self, prompt: str) -> str:
+        sections = self.SECTION_PATTERN.findall(prompt)
+        if len(sections) > 1:
+            # 打包提示词：每个字段以项目名称为键
+            analyses = {name.strip(): self._analyze(content) for name, content in sections}
+            keys = next(iter(analyses.values())).keys()
+            data = {key: {name: analysis[key] for name, analysis in analyses.items()} for key in keys}
+        else:
+            data = self._analyze(sections[0][1] if sections else prompt)
+        return json.dumps(data, ensure_ascii=False, indent=2)
+
+    def call(self, **kwargs):
+        text = self.generate(kwargs.get('prompt', ''))
+        if kwargs.get('stream'):
+            return _stream_text(text, self.latency)
+        if self.latency:
+            time.sleep(self.latency)
+        return make_response(text)
+
+
+BACKENDS = ('dashscope', 'record', 'replay', 'fake')
+
+
+def create_backend(ai_config: AIConfig) -> LLMBackend:
+    """按配置创建后端"""
+    name = (ai_config.backend or 'dashscope').lower()
+    if name == 'record':
+        logger.info(f"📼 LLM后端: 记录模式，输出保存到 {ai_config.recordings_dir}")
+        return RecordingBackend(DashScopeBackend(), ai_config.recordings_dir)
+    if name == 'replay':
+        logger.info(f"📼 LLM后端: 回放 {ai_config.recordings_dir} (耗时: {ai_config.replay_latency})")
+        return ReplayBackend(ai_config.recordings_dir, ai_config.replay_latency)
+    if name == 'fake':
+        logger.info(f"🧪 LLM后端: 规则模拟 (耗时: {ai_config.fake_latency}秒)")
+        return FakeBackend(ai_config.fake_latency)
+    if name != 'dashscope':
+        logger.warning(f"未知的LLM后端 {name}，使用 dashscope")
+    return DashScopeBackend()
@@ -0,0 +1,175 @@
+"""
+LLM响应缓存模块
+按 提示词 + app_id + 提示词版本 的哈希缓存AI输出，避免重复调用
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+from loguru import logger
+
+
+class LLMResponseCache:
+    """基于SQLite的内容寻址LLM响应缓存（带TTL和条目数上限）"""
+
+    def __init__(self, db_path: str = "llm_cache.db", ttl_seconds: int = 86400, max_entries: int = 2000):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        """初始化缓存表"""
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                cache_key TEXT PRIMARY KEY,
+                app_id TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                raw_output TEXT NOT NULL,
+                json_data TEXT,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                hit_count INTEGER DEFAULT 0
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS llm_cache_stats (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access
+            ON llm_cache(last_access)
+        ''')
+        conn.commit()
+        conn.close()
+
+    @staticmethod
+    def make_key(prompt: str, app_id: str, prompt_version: str) -> str:
+        """根据提示词、应用ID和提示词版本生成缓存键"""
+        digest = hashlib.sha256()
+        for part in (prompt_version, app_id, prompt):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def _bump(self, conn: sqlite3.Connection, name: str):
+        conn.execute(
+            'INSERT INTO llm_cache_stats (name, value) VALUES (?, 1) '
+            'ON CONFLICT(name) DO UPDATE SET value = value + 1',
+            (name,)
+        )
+
+    def get(self, cache_key: str) -> Optional[Dict]:
+        """读取缓存，命中返回 {'raw_output', 'json_data'}，未命中或过期返回None"""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    'SELECT raw_output, json_data, created_at FROM llm_cache WHERE cache_key = ?',
+                    (cache_key,)
+                ).fetchone()
+
+                if row and now - row['created_at'] <= self.ttl_seconds:
+                    conn.execute(
+                        'UPDATE llm_cache SET last_access = ?, hit_count = hit_count + 1 WHERE cache_key = ?',
+                        (now, cache_key)
+                    )
+                    self._bump(conn, 'hits')
+                    conn.commit()
+                    return {
+                        'raw_output': row['raw_output'],
+                        'json_data': json.loads(row['json_data']) if row['json_data'] else None
+                    }
+
+                if row:
+                    # 已过期，顺手删除
+                    conn.execute('DELETE FROM llm_cache WHERE cache_key = ?', (cache_key,))
+                self._bump(conn, 'misses')
+                conn.commit()
+                return None
+            finally:
+                conn.close()
+
+    def put(self, cache_key: str, app_id: str, prompt_version: str, raw_output: str, json_data: Optional[Dict]):
+        """写入缓存，并执行TTL过期清理和条目数上限淘汰"""
+        now = time.time()
+        json_str = json.dumps(json_data, ensure_ascii=False) if json_data is not None else None
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    '''INSERT OR REPLACE INTO llm_cache
+                       (cache_key, app_id, prompt_version, raw_output, json_data, created_at, last_access, hit_count)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, 0)''',
+                    (cache_key, app_id, prompt_version, raw_output, json_str, now, now)
+                )
+                self._evict(conn, now)
+                conn.commit()
+            finally:
+                conn.close()
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """删除过期条目，超出上限时按最近访问时间淘汰"""
+        expired = conn.execute(
+            'DELETE FROM llm_cache WHERE created_at < ?',
+            (now - self.ttl_seconds,)
+        ).rowcount
+
+        overflow = conn.execute('SELECT COUNT(*) FROM llm_cache').fetchone()[0] - self.max_entries
+        evicted = 0
+        if overflow > 0:
+            evicted = conn.execute(
+                '''DELETE FROM llm_cache WHERE cache_key IN (
+                       SELECT cache_key FROM llm_cache ORDER BY last_access ASC LIMIT ?
+                   )''',
+                (overflow,)
+            ).rowcount
+
+        if expired or evicted:
+            logger.info(f"LLM缓存清理: 过期 {expired} 条, 淘汰 {evicted} 条")
+
+    def stats(self) -> Dict:
+        """返回缓存统计信息（累计命中/未命中次数、条目数）"""
+        with self._lock:
+            conn = self._connect()
+            try:
+                counters = {
+                    row['name']: row['value']
+                    for row in conn.execute('SELECT name, value FROM llm_cache_stats').fetchall()
+                }
+                entries = conn.execute('SELECT COUNT(*) FROM llm_cache').fetchone()[0]
+            finally:
+                conn.close()
+
+        hits = counters.get('hits', 0)
+        misses = counters.get('misses', 0)
+        total = hits + misses
+        return {
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl_seconds,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / total, 4) if total else 0.0
+        }
+
+    def clear(self):
+        """清空缓存条目（保留统计计数）"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute('DELETE FROM llm_cache')
+            conn.commit()
+            conn.close()
@@ -0,0 +1,427 @@
+"""
+百炼调用客户端
+在百炼调用后端（见 llm_backends）外包一层流量控制，并发分析项目时不会因为 QPS 超限而整批失败：
+    - 令牌桶限制每秒请求数
+    - AIMD 自适应并发：调用顺利时并发上限缓慢增加，遇到 429 或延迟超标时减半
+    - 可重试的状态码（429 / 5xx）和网络异常按带抖动的指数退避重试
+    - 每次调用有独立的截止时间，超时按失败处理，不再依赖全局 socket 超时
+    - 熔断器：连续失败达到阈值后一段时间内直接拒绝调用，由上层改用简单汇总
+    - 对冲请求（可选）：调用耗时超过历史 p95 时再发一个相同请求，取先返回的结果
+同一进程内相同 app_id 的调用共享一个客户端，计数器可通过 stats() 查看
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from http import HTTPStatus
+from types import SimpleNamespace
+from typing import Callable, Dict, Optional
+from loguru import logger
+from config import AIConfig
+from llm_backends import create_backend
+
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+THROTTLED_STATUS = 429
+# 计算 p95 前至少需要的成功调用样本数
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+
+class CircuitOpenError(RuntimeError):
+    """熔断器打开期间拒绝调用"""
+
+
+class ConcurrencyTimeoutError(TimeoutError):
+    """本地等待并发名额超时（调用没有发出，不计入熔断，也不重试）"""
+
+
+class CircuitBreaker:
+    """连续失败 failure_threshold 次后打开，reset_seconds 后放行一个探测请求（半开），成功则关闭"""
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = 'closed'
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """调用前检查，熔断中抛出 CircuitOpenError"""
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            if self.state == 'open':
+                remaining = self.reset_seconds - (time.monotonic() - self._opened_at)
+                if remaining > 0:
+                    raise CircuitOpenError(f"AI服务熔断中，{remaining:.0f}秒后重试")
+                self.state = 'half_open'
+                self._probing = False
+            if self.state == 'half_open':
+                if self._probing:
+                    raise CircuitOpenError("AI服务熔断探测中")
+                self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != 'closed':
+                logger.info("✅ AI服务恢复，熔断器关闭")
+            self.state = 'closed'
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == 'half_open' or (self.state == 'closed' and self.failures >= self.failure_threshold):
+                self.state = 'open'
+                self._opened_at = time.monotonic()
+                logger.error(f"❌ AI调用连续失败 {self.failures} 次，熔断 {self.reset_seconds:.0f}秒")
+
+
+class TokenBucket:
+    """令牌桶：平均速率 rate 个/秒，允许 burst 个的突发"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """取一个令牌，不足时等待"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class AdaptiveLimiter:
+    """AIMD 并发控制：成功时每轮（约 limit 次调用）上限 +1，拥塞信号出现时上限减半"""
+
+    def __init__(self, initial: int, minimum: int, maximum: int, latency_target: float, cooldown: float = 5.0):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.latency_target = latency_target
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout: Optional[float] = None):
+        """占用一个并发名额；timeout 秒内没有空闲名额时抛出 TimeoutError"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("等待AI并发名额超时")
+                self._cond.wait(remaining)
+            self.in_flight += 1
+
+    def try_acquire(self) -> bool:
+        """不等待地占用一个并发名额（对冲请求使用，没有空闲名额时不发）"""
+        with self._cond:
+            if self.in_flight >= int(self.limit):
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+
+    def on_success(self, latency: float):
+        with self._cond:
+            if self.latency_target and latency > self.latency_target:
+                self._decrease(f"延迟 {latency:.1f}秒 超过目标 {self.latency_target}秒")
+            elif self.limit < self.maximum:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+                self._cond.notify_all()
+
+    def on_throttled(self):
+        with self._cond:
+            self._decrease("触发限流 (429)")
+
+    def _decrease(self, reason: str):
+        # 同一波拥塞只减一次，避免并发中的多个失败把上限连续砍到底
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        old = self.limit
+        self.limit = max(self.minimum, self.limit / 2)
+        logger.warning(f"⚠️ {reason}，AI并发上限 {old:.1f} -> {self.limit:.1f}")
+
+
+class LLMClient:
+    """带限速、自适应并发和重试的百炼应用调用客户端"""
+
+    def __init__(self, ai_config: AIConfig, call: Callable = None):
+        self.config = ai_config
+        # call 与 Application.call 接口相同，默认按 LLM_BACKEND 创建
+        self._call = call or create_backend(ai_config).call
+        self.bucket = TokenBucket(ai_config.rate_limit_qps, ai_config.rate_limit_burst)
+        self.limiter = AdaptiveLimiter(
+            initial=ai_config.max_workers,
+            minimum=1,
+            maximum=ai_config.max_workers,
+            latency_target=ai_config.latency_target_seconds
+        )
+        self.breaker = CircuitBreaker(ai_config.breaker_failures, ai_config.breaker_reset_seconds)
+        # 超时的调用无法中断，只能放弃等待；线程池留出余量，避免被挂起的调用占满
+        executor_size = max(4, ai_config.max_workers * 4)
+        self._executor = ThreadPoolExecutor(max_workers=executor_size, thread_name_prefix='llm-call')
+        # 被放弃但仍在运行的调用不再占用并发名额，数量以线程池余量为限，超出后名额在调用结束时才归还
+        self._abandon_limit = executor_size - self.limiter.maximum
+        self._abandoned = 0
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+        self.counters = {
+            'calls': 0, 'succeeded': 0, 'failed': 0, 'throttled': 0, 'retried': 0,
+            'timeouts': 0, 'queue_timeouts': 0, 'rejected': 0, 'hedged': 0, 'hedge_wins': 0, 'abandoned': 0
+        }
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _backoff(self, attempt: int) -> float:
+        """带完全抖动的指数退避"""
+        ceiling = min(self.config.retry_max_delay, self.config.retry_base_delay * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    def _attempt(self, kwargs: Dict, on_delta: Optional[Callable[[str], None]], state: Dict):
+        """在工作线程中执行一次调用；state['cancelled'] 置位后（已超时或对冲请求已胜出）不再转发输出"""
+        start = time.monotonic()
+        if on_delta is None:
+            response = self._call(**kwargs)
+        else:
+            pieces = []
+            response = None
+            for chunk in self._call(stream=True, incremental_output=True, **kwargs):
+                if chunk.status_code != HTTPStatus.OK:
+                    response = chunk
+                    break
+                if state['cancelled']:
+                    break
+                delta = chunk.output.text or ''
+                if delta:
+                    pieces.append(delta)
+                    state['streamed'] = True
+                    on_delta(delta)
+            if response is None:
+                response = SimpleNamespace(status_code=HTTPStatus.OK, output=SimpleNamespace(text=''.join(pieces)))
+        if response.status_code == HTTPStatus.OK:
+            with self._lock:
+                self._latencies.append(time.monotonic() - start)
+        return response
+
+    def _submit(self, kwargs: Dict, on_delta, state: Dict):
+        """提交一次调用（已占用并发名额）；名额在调用结束或被放弃时归还，只归还一次"""
+        slot = {'released': False, 'abandoned': False}
+        future = self._executor.submit(self._attempt, kwargs, on_delta, state)
+        future.add_done_callback(lambda _: self._finish(slot))
+        return future, slot
+
+    def _finish(self, slot: Dict):
+        with self._lock:
+            if slot['abandoned']:
+                self._abandoned -= 1
+            release = not slot['released']
+            slot['released'] = True
+        if release:
+            self.limiter.release()
+
+    def _abandon(self, slot: Dict):
+        """放弃等待仍在运行的调用（已超时或对冲请求已有结果），在余量内提前归还并发名额"""
+        with self._lock:
+            if slot['released']:
+                return
+            slot['abandoned'] = True
+            self._abandoned += 1
+            self.counters['abandoned'] += 1
+            release = self._abandoned <= self._abandon_limit
+            if release:
+                slot['released'] = True
+        if release:
+            self.limiter.release()
+
+    def _hedge_delay(self) -> Optional[float]:
+        """历史成功调用耗时的 p95，样本不足时不对冲"""
+        with self._lock:
+            if len(self._latencies) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+    def _acquire_slot(self):
+        """等待并发名额；排队时间不计入调用的截止时间，超过 queue_timeout_seconds 时抛出 ConcurrencyTimeoutError"""
+        queue_timeout = self.config.queue_timeout_seconds
+        try:
+            self.limiter.acquire(queue_timeout if queue_timeout > 0 else None)
+        except TimeoutError:
+            self._count('queue_timeouts')
+            raise ConcurrencyTimeoutError(f"等待AI并发名额超过 {queue_timeout:g}秒")
+
+    def _run_with_deadline(self, kwargs: Dict, on_delta, state: Dict):
+        """在截止时间内等待调用结果（调用前已占用并发名额）；开启对冲时超过 p95 未返回则再发一个相同请求"""
+        timeout = self.config.call_timeout_seconds
+        deadline = time.monotonic() + timeout if timeout > 0 else None
+        primary, primary_slot = self._submit(kwargs, on_delta, state)
+        slots = {primary: primary_slot}
+        pending = {primary}
+
+        # 流式调用已向调用方推送内容，对冲会产生重复输出，只对非流式调用对冲
+        hedge_delay = self._hedge_delay() if self.config.hedge_enabled and on_delta is None else None
+        if hedge_delay is not None:
+            if deadline is not None:
+                hedge_delay = min(hedge_delay, max(0.0, deadline - time.monotonic()))
+            done, _ = wait(pending, timeout=hedge_delay)
+            if not done and self.limiter.try_acquire():
+                self._count('hedged')
+                logger.info(f"AI调用超过 p95 ({hedge_delay:.1f}秒) 未返回，发出对冲请求")
+                hedge, slots[hedge] = self._submit(kwargs, None, state)
+                pending.add(hedge)
+
+        last_response, last_error = None, None
+        while pending:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                state['cancelled'] = True
+                for future in pending:
+                    self._abandon(slots[future])
+                self._count('timeouts')
+                raise TimeoutError(f"AI调用超过 {timeout:g}秒 未返回")
+            for future in done:
+                try:
+                    response = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                if response.status_code == HTTPStatus.OK:
+                    state['cancelled'] = True
+                    for loser in pending:
+                        self._abandon(slots[loser])
+                    if future is not primary:
+                        self._count('hedge_wins')
+                    return response
+                last_response = response
+        if last_response is not None:
+            return last_response
+        raise last_error
+
+    def call(self, on_delta: Optional[Callable[[str], None]] = None, **kwargs):
+        """调用百炼应用，参数与 Application.call 相同
+
+        传入 on_delta 时使用增量流式输出，最终返回与非流式调用相同结构的响应。
+        流式输出已开始后出错不再重试（已推送的内容无法撤回），直接返回错误响应。
+        熔断器打开时抛出 CircuitOpenError
+        """
+        self._count('calls')
+        kwargs.setdefault('api_key', self.config.api_key)
+        kwargs.setdefault('app_id', self.config.app_id)
+        attempts = max(1, self.config.max_retries + 1)
+        for attempt in range(attempts):
+            try:
+                self.breaker.allow()
+            except CircuitOpenError:
+                self._count('rejected')
+                raise
+            self.bucket.acquire()
+            try:
+                self._acquire_slot()
+            except ConcurrencyTimeoutError:
+                self._count('failed')
+                raise
+            state = {'cancelled': False, 'streamed': False}
+            # 截止时间和延迟都从拿到并发名额后开始计算，排队时间不影响 AIMD 和熔断
+            start = time.monotonic()
+            error, response = None, None
+            try:
+                response = self._run_with_deadline(kwargs, on_delta, state)
+            except Exception as e:
+                error = e
+            latency = time.monotonic() - start
+
+            status = response.status_code if response is not None else None
+            if status == HTTPStatus.OK:
+                self.breaker.record_success()
+                self.limiter.on_success(latency)
+                self._count('succeeded')
+                return response
+            if status == THROTTLED_STATUS:
+                # 限流说明服务可用，不计入熔断
+                self.breaker.record_success()
+                self.limiter.on_throttled()
+                self._count('throttled')
+            else:
+                self.breaker.record_failure()
+
+            retryable = error is not None or status in RETRYABLE_STATUS
+            if not retryable or state['streamed'] or attempt == attempts - 1:
+                self._count('failed')
+                if error is not None:
+                    raise error
+                return response
+
+            delay = self._backoff(attempt)
+            self._count('retried')
+            logger.warning(f"AI调用失败 ({error or status})，{delay:.1f}秒后第 {attempt + 1} 次重试")
+            time.sleep(delay)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self.counters)
+            abandoned = self._abandoned
+        hedge_delay = self._hedge_delay()
+        return {
+            **counters,
+            'circuit': self.breaker.state,
+            'p95_latency': round(hedge_delay, 2) if hedge_delay is not None else None,
+            'in_flight': self.limiter.in_flight,
+            'abandoned_running': abandoned,
+            'concurrency_limit': round(self.limiter.limit, 2),
+            'max_concurrency': self.limiter.maximum,
+            'rate_limit_qps': self.bucket.rate
+        }
+
+
+_shared_clients: Dict[str, LLMClient] = {}
+_shared_lock = threading.Lock()
+
+
+def get_shared_client(ai_config: AIConfig) -> LLMClient:
+    """获取进程内共享的客户端（同一后端、同一 app_id 的所有调用共用限速和并发状态）"""
+    key = f"{ai_config.backend}:{ai_config.app_id}"
+    with _shared_lock:
+        client = _shared_clients.get(key)
+        if client is None:
+            client = LLMClient(ai_config)
+            _shared_clients[key] = client
+        return client
+
+
+def shared_client_stats() -> Dict[str, Dict]:
+    """所有共享客户端的计数器 {后端:app_id: stats}"""
+    with _shared_lock:
+        clients = dict(_shared_clients)
+    return {key: client.stats() for key, client in clients.items()}
@@ -0,0 +1,86 @@
+"""
+邮件正文清理模块
+日报常以回复昨天邮件的方式发送，正文里会带上整段引用历史和签名/免责声明。
+这里在发送给AI之前把引用块和签名块切掉，只保留本次新写的内容
+"""
+
+import re
+from typing import List, Tuple
+
+# 出现后其后全部是引用历史的分隔行
+QUOTE_HEADER_PATTERNS = [
+    re.compile(r'^-{2,}\s*(原始邮件|原邮件|回复的原邮件|转发的邮件|Original Message|Forwarded message)\s*-{2,}$', re.I),
+    re.compile(r'^_{20,}$'),  # Outlook 网页版的引用分隔线
+    re.compile(r'^(On|At)\s.+\s(wrote|writes)\s*:$', re.I),
+    re.compile(r'^(在|于)\s?.+写道\s*[:：]$'),
+    re.compile(r'^.+于\s?\d{4}[年/-].+写道\s*[:：]$'),
+]
+# Outlook 风格的引用头：发件人行之后几行内出现发送时间和主题
+QUOTE_FROM_PATTERN = re.compile(r'^(发件人|From)\s*[:：]', re.I)
+QUOTE_FIELD_PATTERN = re.compile(r'^(发送时间|发送日期|日期|时间|Sent|Date|主题|Subject|收件人|To)\s*[:：]', re.I)
+QUOTE_HEADER_LOOKAHEAD = 4
+
+# 出现后其后全部是签名或免责声明
+SIGNATURE_PATTERNS = [
+    re.compile(r'^--\s?$'),  # RFC 3676 签名分隔符
+    re.compile(r'^(免责声明|保密声明|本邮件(及其附件)?(含有|包含|可能包含)|Disclaimer\s*[:：]|CONFIDENTIALITY|'
+               r'This (e-?mail|message) and any attachments)', re.I),
+]
+
+# 移动端自动签名（如 "发自我的iPhone"）：整行很短，且只在正文末尾几行内出现时才算签名，
+# 避免把 "来自客户邮箱的反馈..." 这类正文截掉
+MOBILE_SIGNATURE_PATTERN = re.compile(
+    r'^(发自我的|Sent from my)\s?\S{0,12}(iPhone|iPad|Android|手机|邮箱|Mail|客户端)\s*$', re.I)
+SIGNATURE_TAIL_LINES = 3
+
+QUOTED_LINE_PATTERN = re.compile(r'^\s*>')
+
+
+def _is_quote_header(lines: List[str], index: int) -> bool:
+    line = lines[index].strip()
+    if any(pattern.match(line) for pattern in QUOTE_HEADER_PATTERNS):
+        return True
+    if QUOTE_FROM_PATTERN.match(line):
+        following = lines[index + 1:index + 1 + QUOTE_HEADER_LOOKAHEAD]
+        return sum(1 for item in following if QUOTE_FIELD_PATTERN.match(item.strip())) >= 2
+    return False
+
+
+def _is_mobile_signature(lines: List[str], index: int) -> bool:
+    """签名之后（到引用历史为止）最多还有 SIGNATURE_TAIL_LINES 行非空内容"""
+    if not MOBILE_SIGNATURE_PATTERN.match(lines[index].strip()):
+        return False
+    remaining = 0
+    for following in range(index + 1, len(lines)):
+        if _is_quote_header(lines, following):
+            break
+        if lines[following].strip() and not QUOTED_LINE_PATTERN.match(lines[following]):
+            remaining += 1
+            if remaining > SIGNATURE_TAIL_LINES:
+                return False
+    return True
+
+
+def strip_quotes_and_signature(text: str) -> Tuple[str, int]:
+    """去掉引用的历史邮件、'>' 引用行和签名块，返回 (清理后的正文, 删除的字符数)
+
+    清理后没有剩余内容时原样返回（说明整封邮件都被误判为引用）
+    """
+    if not text:
+        return text, 0
+
+    lines = text.split('\n')
+    kept = []
+    for index, line in enumerate(lines):
+        stripped = line.strip()
+        if (_is_quote_header(lines, index) or any(pattern.match(stripped) for pattern in SIGNATURE_PATTERNS)
+                or _is_mobile_signature(lines, index)):
+            break
+        if QUOTED_LINE_PATTERN.match(line):
+            continue
+        kept.append(line)
+
+    cleaned = '\n'.join(kept).strip()
+    if not cleaned:
+        return text, 0
+    return cleaned, len(text) - len(cleaned)
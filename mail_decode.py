@@ -0,0 +1,114 @@
+"""
+邮件解码模块
+统一处理传输编码（base64 / quoted-printable）和字符集解码：
+优先使用 Content-Type 声明的字符集，声明缺失或不可信时依次尝试 utf-8、gb18030、big5
+"""
+
+import binascii
+import codecs
+from email.header import decode_header
+from functools import lru_cache
+from typing import Optional
+
+# 常见的错误或过时的字符集声明 -> Python 编解码器名称
+# GB2312/GBK 是 GB18030 的子集，统一按 GB18030 解码可以兼容扩展字符；BIG5 同理使用 BIG5-HKSCS
+CHARSET_ALIASES = {
+    'gb2312': 'gb18030',
+    'gb_2312-80': 'gb18030',
+    'gbk': 'gb18030',
+    'x-gbk': 'gb18030',
+    'cp936': 'gb18030',
+    'euc-cn': 'gb18030',
+    'big5': 'big5hkscs',
+    'x-big5': 'big5hkscs',
+    'cp950': 'big5hkscs',
+    'utf8': 'utf-8',
+    'unicode-1-1-utf-8': 'utf-8',
+    'ks_c_5601-1987': 'cp949',
+    'iso-8859-1': 'cp1252',
+    'us-ascii': 'utf-8',
+    'ascii': 'utf-8',
+}
+
+# 没有声明或声明无效时的探测顺序（gb18030 几乎能解码任意字节，必须排在 utf-8 之后）
+FALLBACK_CHARSETS = ('utf-8', 'gb18030', 'big5hkscs')
+
+REPLACEMENT_CHAR = '\ufffd'
+
+
+@lru_cache(maxsize=128)
+def normalize_charset(charset: Optional[str]) -> Optional[str]:
+    """把声明的字符集规范化为可用的编解码器名称，无法识别时返回None"""
+    if not charset:
+        return None
+    name = charset.strip().strip('"\'').lower()
+    name = CHARSET_ALIASES.get(name, name)
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return None
+
+
+def decode_transfer(raw: bytes, encoding: Optional[str]) -> bytes:
+    """解除传输编码；base64 容忍换行、非法字符和缺失的填充"""
+    encoding = (encoding or '7bit').lower()
+    if encoding == 'base64':
+        data = b''.join(raw.split())
+        data += b'=' * (-len(data) % 4)
+        try:
+            return binascii.a2b_base64(data)
+        except binascii.Error:
+            # 填充位置异常等极少数情况，截断到最后一个完整分组
+            return binascii.a2b_base64(data[:len(data.rstrip(b'=')) // 4 * 4])
+    if encoding == 'quoted-printable':
+        return binascii.a2b_qp(raw)
+    return raw
+
+
+def decode_bytes(payload: Optional[bytes], charset: Optional[str] = None) -> str:
+    """把正文字节解码为文本
+
+    依次用声明的字符集和探测字符集严格解码，第一个成功的结果直接返回（遇到非法字节即停止，代价很小）；
+    都失败时用 errors='replace' 解码，返回替换字符最少的结果
+    """
+    if not payload:
+        return ''
+    if payload.isascii():
+        return payload.decode('ascii')
+
+    candidates = []
+    declared = normalize_charset(charset)
+    if declared:
+        candidates.append(declared)
+    candidates.extend(name for name in FALLBACK_CHARSETS if name != declared)
+
+    for name in candidates:
+        try:
+            return payload.decode(name)
+        except UnicodeDecodeError:
+            continue
+
+    best_text, best_bad = None, None
+    for name in candidates:
+        text = payload.decode(name, errors='replace')
+        bad = text.count(REPLACEMENT_CHAR)
+        if bad == 0:
+            return text
+        if best_bad is None or bad < best_bad:
+            best_text, best_bad = text, bad
+    return best_text
+
+
+def decode_part(part) -> str:
+    """解码 email.message.Message 的单个非 multipart 段"""
+    return decode_bytes(part.get_payload(decode=True), part.get_content_charset())
+
+
+def decode_mime_header(value: Optional[str]) -> str:
+    """解码 RFC 2047 编码的邮件头（如 =?gb2312?B?...?=）"""
+    if not value:
+        return ''
+    decoded = []
+    for part, charset in decode_header(value):
+        decoded.append(decode_bytes(part, charset) if isinstance(part, bytes) else part)
+    return ''.join(decoded)
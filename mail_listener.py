@@ -0,0 +1,168 @@
+"""
+邮件监听模块
+后台保持一个IMAP连接，新日报到达时立即解析、过滤并写入本地邮件存储，
+生成日报时只需读取本地存储
+"""
+
+import select
+import ssl
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+from loguru import logger
+from email_handler import EmailHandler
+from config import EmailConfig
+
+# RFC 2177 建议每29分钟内重新发起 IDLE，这里取25分钟
+IDLE_RENEW_SECONDS = 25 * 60
+
+
+class MailListener:
+    """基于 IMAP IDLE（不支持时退化为 NOOP 轮询）的后台日报监听器"""
+
+    def __init__(self, email_config: EmailConfig, from_emails: List[str], subject_keywords: List[str],
+                 folder: str = 'INBOX', poll_seconds: int = 60):
+        self.handler = EmailHandler(email_config)
+        self.from_emails = from_emails
+        self.subject_keywords = subject_keywords
+        self.folder = folder
+        self.poll_seconds = poll_seconds
+        self.running = False
+        self.thread = None
+        self.mail = None
+        self.last_sync_at: Optional[float] = None
+        self.reports_seen = 0
+
+    @property
+    def source(self):
+        """监听的 (账号, 文件夹)"""
+        return (self.handler.config.username, self.folder)
+
+    @property
+    def name(self) -> str:
+        return '/'.join(self.source)
+
+    def is_live(self) -> bool:
+        """监听器在线且最近同步过（可以直接读取本地存储）"""
+        if not self.running or self.last_sync_at is None:
+            return False
+        return time.time() - self.last_sync_at < self.poll_seconds * 3
+
+    def _sync(self):
+        """同步新邮件并记录同步时间"""
+        since = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        matched = self.handler.sync_reports(self.mail, self.folder, self.from_emails, self.subject_keywords, since)
+        if len(matched) != self.reports_seen:
+            logger.info(f"📥 监听器 {self.name}: 今日已收到 {len(matched)} 份日报")
+        self.reports_seen = len(matched)
+        self.last_sync_at = time.time()
+
+    def _idle(self, timeout: int) -> bool:
+        """发起一次 IDLE 等待，返回是否收到服务器的新邮件通知
+
+        imaplib 不直接支持 IDLE，这里按 RFC 2177 手动收发命令；
+        用 select 等待数据而不是给 socket 设置超时，避免打断 imaplib 的缓冲读取；
+        imaplib 可能已把通知读进自己的缓冲区，select 之前要先检查缓冲区
+        """
+        mail = self.mail
+        tag = mail._new_tag()
+        mail.send(tag + b' IDLE\r\n')
+        line = mail.readline()
+        if not line.startswith(b'+'):
+            raise RuntimeError(f"服务器拒绝 IDLE: {line!r}")
+
+        has_update = False
+        deadline = time.time() + timeout
+        while self.running and time.time() < deadline:
+            pending = getattr(mail.sock, 'pending', lambda: 0)()
+            if not pending and not self._has_buffered_data():
+                readable, _, _ = select.select([mail.sock], [], [], 1.0)
+                if not readable:
+                    continue
+            line = mail.readline()
+            if not line:
+                raise ConnectionError("IMAP连接已断开")
+            if b'EXISTS' in line or b'RECENT' in line:
+                has_update = True
+                break
+
+        # 结束 IDLE，读到本次命令的标签响应为止
+        mail.send(b'DONE\r\n')
+        while True:
+            line = mail.readline()
+            if not line:
+                raise ConnectionError("IMAP连接已断开")
+            if line.startswith(tag):
+                break
+        return has_update
+
+    def _has_buffered_data(self) -> bool:
+        """imaplib 的读缓冲区里是否还有未处理的数据（非阻塞探测，不消耗数据）"""
+        mail = self.mail
+        timeout = mail.sock.gettimeout()
+        mail.sock.settimeout(0)
+        try:
+            return bool(mail.file.peek(1))
+        except (BlockingIOError, ssl.SSLWantReadError):
+            return False
+        finally:
+            mail.sock.settimeout(timeout)
+
+    def _connect(self):
+        self.mail = self.handler.connect_imap()
+        self._sync()
+        logger.info(f"邮件监听器 {self.name} 已连接，模式: {'IDLE' if self._supports_idle() else 'NOOP轮询'}")
+
+    def _disconnect(self):
+        if self.mail is not None:
+            try:
+                self.mail.logout()
+            except Exception:
+                pass
+        self.mail = None
+
+    def _supports_idle(self) -> bool:
+        return self.mail is not None and 'IDLE' in self.mail.capabilities
+
+    def run_listener(self):
+        """监听循环：断线后按指数退避重连"""
+        logger.info(f"邮件监听器 {self.name} 启动...")
+        backoff = 5
+        while self.running:
+            try:
+                if self.mail is None:
+                    self._connect()
+                    backoff = 5
+
+                if self._supports_idle():
+                    self._idle(min(IDLE_RENEW_SECONDS, self.poll_seconds))
+                else:
+                    time.sleep(self.poll_seconds)
+                    self.mail.noop()
+                if self.running:
+                    self._sync()
+            except Exception as e:
+                logger.error(f"邮件监听 {self.name} 异常: {e}，{backoff}秒后重连")
+                self._disconnect()
+                self.last_sync_at = None
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 300)
+
+        self._disconnect()
+        logger.info(f"邮件监听 {self.name} 循环已退出")
+
+    def start(self):
+        """启动后台监听"""
+        if not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self.run_listener, daemon=True)
+            self.thread.start()
+            logger.info(f"邮件监听器 {self.name} 已启动")
+
+    def stop(self):
+        """停止后台监听"""
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=5)
+        logger.info(f"邮件监听器 {self.name} 已停止")
@@ -0,0 +1,248 @@
+"""
+邮件发件箱模块
+待发送邮件先写入SQLite发件箱，后台工作线程复用同一个SMTP会话依次发送，
+失败时按指数退避重试，调用方入队后立即返回
+"""
+
+import json
+import random
+import smtplib
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+from loguru import logger
+from email_handler import EmailHandler
+from config import EmailConfig
+
+# 处于 sending 状态超过该时间的邮件视为发送进程已退出，重新放回队列
+STALE_SENDING_SECONDS = 600
+
+
+class MailOutbox:
+    """持久化发件箱 + 复用SMTP会话的后台发送器"""
+
+    def __init__(self, email_config: EmailConfig, db_path: Optional[str] = None,
+                 workers: int = 1, max_attempts: int = 5, idle_close_seconds: int = 60):
+        self.handler = EmailHandler(email_config)
+        self.db_path = db_path or email_config.mail_store_path
+        self.workers = max(1, workers)
+        self.max_attempts = max_attempts
+        self.idle_close_seconds = idle_close_seconds
+        self.running = False
+        self.threads: List[threading.Thread] = []
+        self._wakeup = threading.Event()
+        self._start_lock = threading.Lock()
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        """初始化发件箱表"""
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS mail_outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                to_emails TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                content TEXT NOT NULL,
+                content_type TEXT NOT NULL DEFAULT 'plain',
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                next_attempt_at REAL NOT NULL,
+                claimed_at REAL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                sent_at TIMESTAMP
+            )
+        ''')
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_mail_outbox_pending
+            ON mail_outbox(status, next_attempt_at)
+        ''')
+        conn.commit()
+        conn.close()
+
+    def enqueue(self, to_emails: List[str], subject: str, content: str, content_type: str = "plain") -> int:
+        """邮件入队并唤醒发送线程，返回发件箱ID"""
+        conn = self._connect()
+        cursor = conn.execute(
+            'INSERT INTO mail_outbox (to_emails, subject, content, content_type, next_attempt_at) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (json.dumps(to_emails, ensure_ascii=False), subject, content, content_type, time.time())
+        )
+        outbox_id = cursor.lastrowid
+        conn.commit()
+        conn.close()
+
+        logger.info(f"📮 邮件已入队 #{outbox_id}: {subject} -> {', '.join(to_emails)}")
+        self.start()
+        self._wakeup.set()
+        return outbox_id
+
+    def get(self, outbox_id: int) -> Optional[Dict]:
+        """查询单封邮件的发送状态"""
+        conn = self._connect()
+        row = conn.execute(
+            'SELECT id, to_emails, subject, status, attempts, last_error, created_at, sent_at '
+            'FROM mail_outbox WHERE id = ?',
+            (outbox_id,)
+        ).fetchone()
+        conn.close()
+        if not row:
+            return None
+        result = dict(row)
+        result['to_emails'] = json.loads(result['to_emails'])
+        return result
+
+    def stats(self) -> Dict:
+        """各状态的邮件数量"""
+        conn = self._connect()
+        rows = conn.execute('SELECT status, COUNT(*) AS count FROM mail_outbox GROUP BY status').fetchall()
+        conn.close()
+        counts = {'pending': 0, 'sending': 0, 'sent': 0, 'failed': 0}
+        counts.update({row['status']: row['count'] for row in rows})
+        return {'running': self.running, 'workers': self.workers, **counts}
+
+    def _claim_next(self) -> Optional[Dict]:
+        """领取一封到期的待发邮件（条件更新保证多线程/多进程下只被领取一次）"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE mail_outbox SET status = 'pending' WHERE status = 'sending' AND claimed_at < ?",
+                (now - STALE_SENDING_SECONDS,)
+            )
+            candidates = conn.execute(
+                "SELECT * FROM mail_outbox WHERE status = 'pending' AND next_attempt_at <= ? "
+                "ORDER BY id LIMIT 5",
+                (now,)
+            ).fetchall()
+            for row in candidates:
+                claimed = conn.execute(
+                    "UPDATE mail_outbox SET status = 'sending', claimed_at = ? WHERE id = ? AND status = 'pending'",
+                    (now, row['id'])
+                ).rowcount
+                if claimed:
+                    conn.commit()
+                    return dict(row)
+            conn.commit()
+            return None
+        finally:
+            conn.close()
+
+    def _mark_sent(self, outbox_id: int):
+        conn = self._connect()
+        conn.execute(
+            "UPDATE mail_outbox SET status = 'sent', attempts = attempts + 1, last_error = NULL, "
+            "sent_at = CURRENT_TIMESTAMP WHERE id = ?",
+            (outbox_id,)
+        )
+        conn.commit()
+        conn.close()
+
+    @staticmethod
+    def _is_permanent(error: Exception) -> bool:
+        """服务器返回 5xx 的永久性错误（如收件人全部被拒），重试也不会成功"""
+        if isinstance(error, smtplib.SMTPRecipientsRefused):
+            return bool(error.recipients) and all(
+                500 <= code < 600 for code, _ in error.recipients.values()
+            )
+        if isinstance(error, smtplib.SMTPResponseException):
+            return 500 <= error.smtp_code < 600
+        return False
+
+    def _mark_failed(self, item: Dict, error: Exception):
+        """记录失败；永久性错误直接放弃，其余未超过重试次数时按指数退避（带抖动）重新排队"""
+        attempts = item['attempts'] + 1
+        if self._is_permanent(error):
+            status, next_attempt_at = 'failed', time.time()
+            logger.error(f"❌ 邮件 #{item['id']} 被服务器永久拒绝，不再重试: {error}")
+        elif attempts >= self.max_attempts:
+            status, next_attempt_at = 'failed', time.time()
+            logger.error(f"❌ 邮件 #{item['id']} 发送失败 {attempts} 次，放弃: {error}")
+        else:
+            delay = min(30 * 2 ** (attempts - 1), 1800) * random.uniform(0.8, 1.2)
+            status, next_attempt_at = 'pending', time.time() + delay
+            logger.warning(f"⚠️ 邮件 #{item['id']} 发送失败（第{attempts}次），{delay:.0f}秒后重试: {error}")
+
+        conn = self._connect()
+        conn.execute(
+            'UPDATE mail_outbox SET status = ?, attempts = ?, last_error = ?, next_attempt_at = ? WHERE id = ?',
+            (status, attempts, str(error), next_attempt_at, item['id'])
+        )
+        conn.commit()
+        conn.close()
+
+    def _close_session(self, server):
+        if server is not None:
+            try:
+                server.quit()
+            except Exception:
+                pass
+
+    def _send(self, server, item: Dict):
+        msg = self.handler.build_message(
+            json.loads(item['to_emails']), item['subject'], item['content'], item['content_type']
+        )
+        server.send_message(msg)
+
+    def run_worker(self):
+        """发送循环：有邮件时复用已打开的SMTP会话，空闲超时后关闭连接"""
+        server = None
+        last_used = 0.0
+        while self.running:
+            # 先清除唤醒标记再领取：领取之后入队的邮件会重新置位，不会被错过
+            self._wakeup.clear()
+            item = self._claim_next()
+            if item is None:
+                if server is not None and time.time() - last_used > self.idle_close_seconds:
+                    self._close_session(server)
+                    server = None
+                    logger.info("SMTP会话空闲，已关闭")
+                self._wakeup.wait(timeout=5)
+                continue
+
+            try:
+                if server is None:
+                    server = self.handler.connect_smtp()
+                try:
+                    self._send(server, item)
+                except smtplib.SMTPServerDisconnected:
+                    # 服务器关闭了空闲会话，重连后立即重试一次
+                    server = self.handler.connect_smtp()
+                    self._send(server, item)
+                last_used = time.time()
+                self._mark_sent(item['id'])
+                logger.info(f"✅ 邮件 #{item['id']} 发送成功: {item['subject']}")
+            except Exception as e:
+                self._close_session(server)
+                server = None
+                self._mark_failed(item, e)
+
+        self._close_session(server)
+
+    def start(self):
+        """启动后台发送线程（重复调用无副作用）"""
+        with self._start_lock:
+            if self.running:
+                return
+            self.running = True
+            self.threads = [
+                threading.Thread(target=self.run_worker, daemon=True, name=f"mail-outbox-{i}")
+                for i in range(self.workers)
+            ]
+            for thread in self.threads:
+                thread.start()
+            logger.info(f"邮件发件箱已启动，发送线程数: {self.workers}")
+
+    def stop(self):
+        """停止后台发送线程，未发送的邮件保留在发件箱中"""
+        self.running = False
+        self._wakeup.set()
+        for thread in self.threads:
+            thread.join(timeout=5)
+        logger.info("邮件发件箱已停止")
@@ -0,0 +1,190 @@
+"""
+多来源日报收集模块
+按 (账号, 文件夹) 并发收集日报：每个账号维护一个小连接池，
+各来源在独立连接上同步，结果按 Message-ID 去重合并
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, List, Set, Tuple
+from loguru import logger
+from email_handler import EmailHandler
+from config import EmailConfig
+
+
+class IMAPConnectionPool:
+    """单个账号的IMAP连接池（连接数有上限，空闲连接复用前用 NOOP 探活，空闲超时后台登出）"""
+
+    def __init__(self, handler: EmailHandler, size: int = 2, idle_seconds: int = 300):
+        self.handler = handler
+        self.idle_seconds = idle_seconds
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle = []  # [(连接, 归还时间)]
+        self._reaper = None
+
+    def _take_idle(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                mail, released_at = self._idle.pop()
+            if time.time() - released_at < self.idle_seconds:
+                try:
+                    if mail.noop()[0] == 'OK':
+                        return mail
+                except Exception:
+                    pass
+            self._logout(mail)
+
+    @staticmethod
+    def _logout(mail):
+        try:
+            mail.logout()
+        except Exception:
+            pass
+
+    def _reap_idle(self):
+        """登出空闲超时的连接，仍有空闲连接时继续定时清理"""
+        now = time.time()
+        with self._lock:
+            expired = [mail for mail, released_at in self._idle if now - released_at >= self.idle_seconds]
+            self._idle = [(mail, released_at) for mail, released_at in self._idle
+                          if now - released_at < self.idle_seconds]
+            self._reaper = None
+            if self._idle:
+                self._schedule_reaper(min(released_at for _, released_at in self._idle) + self.idle_seconds - now)
+        for mail in expired:
+            self._logout(mail)
+        if expired:
+            logger.debug(f"登出 {len(expired)} 个空闲超时的IMAP连接")
+
+    def _schedule_reaper(self, delay: float):
+        """调用方需持有 self._lock"""
+        if self._reaper is None:
+            self._reaper = threading.Timer(max(delay, 0), self._reap_idle)
+            self._reaper.daemon = True
+            self._reaper.start()
+
+    @contextmanager
+    def connection(self):
+        """借出一个连接，正常归还后可被复用；出错的连接直接丢弃"""
+        self._slots.acquire()
+        try:
+            mail = self._take_idle() or self.handler.connect_imap()
+            try:
+                yield mail
+            except Exception:
+                self._logout(mail)
+                raise
+            with self._lock:
+                self._idle.append((mail, time.time()))
+                self._schedule_reaper(self.idle_seconds)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+            if self._reaper is not None:
+                self._reaper.cancel()
+                self._reaper = None
+        for mail, _ in idle:
+            self._logout(mail)
+
+
+class ReportCollector:
+    """从多个 (账号, 文件夹) 并发收集日报"""
+
+    def __init__(self, sources: List[Tuple[EmailConfig, str]], max_workers: int = 4, pool_size: int = 2,
+                 pool_idle_seconds: int = 300):
+        self.sources = [(account.username, folder) for account, folder in sources]
+        self.max_workers = max(1, max_workers)
+        # 每个来源一个处理器（各自统计下载量），同一账号的来源共享连接池
+        self.handlers: Dict[Tuple[str, str], EmailHandler] = {}
+        self.pools: Dict[str, IMAPConnectionPool] = {}
+        for account, folder in sources:
+            self.handlers[(account.username, folder)] = EmailHandler(account)
+            if account.username not in self.pools:
+                self.pools[account.username] = IMAPConnectionPool(
+                    EmailHandler(account), size=pool_size, idle_seconds=pool_idle_seconds
+                )
+
+    def _collect_source(self, source: Tuple[str, str], from_emails: List[str], subject_keywords: List[str],
+                        since: datetime, local_only: bool) -> Dict:
+        account, folder = source
+        handler = self.handlers[source]
+        handler.stats = {'bytes_downloaded': 0, 'fetch_commands': 0}
+        start = time.time()
+        try:
+            if local_only:
+                reports = handler.collect_folder_reports(None, folder, from_emails, subject_keywords, since)
+            else:
+                with self.pools[account].connection() as mail:
+                    reports = handler.collect_folder_reports(mail, folder, from_emails, subject_keywords, since)
+            error = None
+        except Exception as e:
+            logger.error(f"❌ 收集 {account}/{folder} 失败: {e}")
+            reports, error = [], str(e)
+        return {
+            'source': f"{account}/{folder}",
+            'reports': reports,
+            'duration': time.time() - start,
+            'local_only': local_only,
+            'error': error,
+            **handler.stats
+        }
+
+    @staticmethod
+    def _merge(results: List[Dict]) -> List[Dict]:
+        """按来源顺序合并，Message-ID 相同的邮件只保留第一封"""
+        merged = []
+        seen = set()
+        for result in results:
+            for report in result['reports']:
+                key = report.get('message_id') or (report['from'], report['subject'], report['date'])
+                if key in seen:
+                    logger.debug(f"跳过重复日报: {report['subject']} ({result['source']})")
+                    continue
+                seen.add(key)
+                merged.append({**report, 'source': result['source']})
+        return merged
+
+    def collect(self, from_emails: List[str], subject_keywords: List[str],
+                live_sources: Iterable[Tuple[str, str]] = ()) -> List[Dict]:
+        """并发收集所有来源的今日日报
+
+        live_sources: 由后台监听器实时同步的来源，直接读取本地存储
+        """
+        since = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        live: Set[Tuple[str, str]] = set(live_sources)
+        logger.info(f"📧 开始收集日报邮件，来源 {len(self.sources)} 个: "
+                    f"{', '.join(f'{a}/{f}' for a, f in self.sources)}")
+
+        start = time.time()
+        workers = min(self.max_workers, len(self.sources))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(
+                lambda source: self._collect_source(source, from_emails, subject_keywords, since, source in live),
+                self.sources
+            ))
+        wall_time = time.time() - start
+
+        reports = self._merge(results)
+        for result in results:
+            status = f"失败: {result['error']}" if result['error'] else f"{len(result['reports'])} 份"
+            logger.info(f"   📂 {result['source']}{' (本地存储)' if result['local_only'] else ''}: "
+                        f"{status}, {result['duration']:.2f}秒, {result['bytes_downloaded']} 字节")
+        total = sum(len(result['reports']) for result in results)
+        removed = sum(report.get('removed_chars', 0) for report in reports)
+        logger.info(f"📊 日报收集完成: {len(reports)} 份（去重前 {total} 份），总耗时 {wall_time:.2f}秒，"
+                    f"去除引用/签名 {removed} 字符")
+        return reports
+
+    def close(self):
+        """关闭所有空闲连接"""
+        for pool in self.pools.values():
+            pool.close()
@@ -0,0 +1,178 @@
+"""
+本地邮件存储模块
+记录每个邮箱文件夹的 UIDVALIDITY 和已同步的最大UID，并缓存解析后的邮件，
+使同一天的重复收集只需一次 UID SEARCH
+
+filter_hash 记录同步时使用的服务端过滤条件：空字符串表示全量同步（本地是完整镜像），
+否则本地只保存了符合该条件的邮件，过滤条件变化时需要重建
+
+mail_server_state 按账号和服务器记录服务端搜索被拒绝的时间，新的处理器实例不再重复尝试
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class MailStore:
+    """基于SQLite的本地邮件存储"""
+
+    def __init__(self, db_path: str = "daily_reports.db"):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        """初始化邮件存储表"""
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS mail_folder_state (
+                account TEXT NOT NULL,
+                folder TEXT NOT NULL,
+                uidvalidity INTEGER NOT NULL,
+                last_uid INTEGER NOT NULL DEFAULT 0,
+                filter_hash TEXT NOT NULL DEFAULT '',
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (account, folder)
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS mail_messages (
+                account TEXT NOT NULL,
+                folder TEXT NOT NULL,
+                uidvalidity INTEGER NOT NULL,
+                uid INTEGER NOT NULL,
+                message_id TEXT,
+                sender TEXT,
+                subject TEXT,
+                date_header TEXT,
+                received_date TEXT NOT NULL,
+                body TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (account, folder, uidvalidity, uid)
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS mail_server_state (
+                account TEXT NOT NULL,
+                imap_host TEXT NOT NULL,
+                search_rejected_at REAL,
+                PRIMARY KEY (account, imap_host)
+            )
+        ''')
+        # 兼容旧版本数据库：补充 filter_hash 列
+        columns = [row['name'] for row in conn.execute('PRAGMA table_info(mail_folder_state)').fetchall()]
+        if 'filter_hash' not in columns:
+            conn.execute("ALTER TABLE mail_folder_state ADD COLUMN filter_hash TEXT NOT NULL DEFAULT ''")
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_mail_messages_received_date
+            ON mail_messages(account, folder, received_date)
+        ''')
+        conn.commit()
+        conn.close()
+
+    def get_folder_state(self, account: str, folder: str) -> Optional[Dict]:
+        """获取文件夹同步状态 {'uidvalidity', 'last_uid', 'filter_hash'}，未同步过返回None"""
+        conn = self._connect()
+        row = conn.execute(
+            'SELECT uidvalidity, last_uid, filter_hash FROM mail_folder_state WHERE account = ? AND folder = ?',
+            (account, folder)
+        ).fetchone()
+        conn.close()
+        return dict(row) if row else None
+
+    def get_search_rejected_at(self, account: str, imap_host: str) -> Optional[float]:
+        """服务端搜索最近一次被拒绝的时间戳，未被拒绝过返回None"""
+        conn = self._connect()
+        row = conn.execute(
+            'SELECT search_rejected_at FROM mail_server_state WHERE account = ? AND imap_host = ?',
+            (account, imap_host)
+        ).fetchone()
+        conn.close()
+        return row['search_rejected_at'] if row else None
+
+    def set_search_rejected(self, account: str, imap_host: str, rejected: bool):
+        """记录服务端搜索被拒绝（或重新尝试后已恢复）"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                'INSERT OR REPLACE INTO mail_server_state (account, imap_host, search_rejected_at) VALUES (?, ?, ?)',
+                (account, imap_host, time.time() if rejected else None)
+            )
+            conn.commit()
+            conn.close()
+
+    def reset_folder(self, account: str, folder: str, uidvalidity: int, filter_hash: str = ''):
+        """UIDVALIDITY 或过滤条件变化时清空该文件夹的本地数据并重建同步状态"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute('DELETE FROM mail_messages WHERE account = ? AND folder = ?', (account, folder))
+            conn.execute(
+                'INSERT OR REPLACE INTO mail_folder_state (account, folder, uidvalidity, last_uid, filter_hash, updated_at) '
+                'VALUES (?, ?, ?, 0, ?, CURRENT_TIMESTAMP)',
+                (account, folder, uidvalidity, filter_hash)
+            )
+            conn.commit()
+            conn.close()
+
+    def save_headers(self, account: str, folder: str, uidvalidity: int, headers: List[Dict], last_uid: int,
+                     filter_hash: str = ''):
+        """保存新同步的邮件头并推进水位线（在同一事务中完成）"""
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.executemany(
+                    '''INSERT OR IGNORE INTO mail_messages
+                       (account, folder, uidvalidity, uid, message_id, sender, subject, date_header, received_date)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                    [
+                        (account, folder, uidvalidity, h['uid'], h['message_id'], h['from'],
+                         h['subject'], h['date'], h['received_date'])
+                        for h in headers
+                    ]
+                )
+                conn.execute(
+                    '''INSERT INTO mail_folder_state (account, folder, uidvalidity, last_uid, filter_hash, updated_at)
+                       VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                       ON CONFLICT(account, folder) DO UPDATE SET
+                           last_uid = MAX(last_uid, excluded.last_uid),
+                           uidvalidity = excluded.uidvalidity,
+                           filter_hash = excluded.filter_hash,
+                           updated_at = CURRENT_TIMESTAMP''',
+                    (account, folder, uidvalidity, last_uid, filter_hash)
+                )
+                conn.commit()
+            finally:
+                conn.close()
+
+    def save_bodies(self, account: str, folder: str, uidvalidity: int, bodies: Dict[int, str]):
+        """保存已解析的邮件正文"""
+        if not bodies:
+            return
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                'UPDATE mail_messages SET body = ? WHERE account = ? AND folder = ? AND uidvalidity = ? AND uid = ?',
+                [(body, account, folder, uidvalidity, uid) for uid, body in bodies.items()]
+            )
+            conn.commit()
+            conn.close()
+
+    def load_messages(self, account: str, folder: str, uidvalidity: int, since_date: str) -> List[Dict]:
+        """读取指定日期（YYYY-MM-DD）之后收到的邮件，按UID排序"""
+        conn = self._connect()
+        rows = conn.execute(
+            '''SELECT uid, message_id, sender, subject, date_header, received_date, body
+               FROM mail_messages
+               WHERE account = ? AND folder = ? AND uidvalidity = ? AND received_date >= ?
+               ORDER BY uid''',
+            (account, folder, uidvalidity, since_date)
+        ).fetchall()
+        conn.close()
+        return [dict(row) for row in rows]
@@ -0,0 +1,134 @@
+"""
+项目切分与项目名称归一模块
+    split_projects      - 按 【项目】： 标记单遍切分日报内容
+    normalize_project_name - 名称归一键：全半角、大小写、空白标点以及独立的“项目”前后缀不影响归属
+    ProjectNameIndex    - 归一键 -> 规范名称 的持久化索引，同一项目在不同日期、不同成员的写法都归到同一个名称
+"""
+
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Dict, List
+from loguru import logger
+
+# 项目边界标记，以及紧随其后的项目名称（名称可以在下一行）
+PROJECT_MARKER_PATTERN = re.compile(r'【项目】[：:]')
+PROJECT_NAME_PATTERN = re.compile(r'\s*([^\n]+)')
+
+# 归一时去掉的空白和标点（字母数字之间的 . 和 - 除外，如 v1.0、A-1）
+NAME_NOISE_CHARS = r'\s\-_·•.。,，、:：;；/\\|()（）\[\]【】<>《》"\'“”‘’'
+NAME_NOISE_PATTERN = re.compile(f'[{NAME_NOISE_CHARS}]+')
+NAME_JOINERS = ('.', '-')
+# 独立成词的“项目”前后缀：与名称之间有空白标点，或紧邻字母数字（“项目管理”中的“项目”不算）
+NAME_PREFIX_PATTERN = re.compile(f'^[{NAME_NOISE_CHARS}]*项目(?:[{NAME_NOISE_CHARS}]+|(?=[0-9a-z]))')
+NAME_SUFFIX_PATTERN = re.compile(f'(?:[{NAME_NOISE_CHARS}]+|(?<=[0-9a-z]))项目[{NAME_NOISE_CHARS}]*$')
+
+
+def split_projects(content: str) -> List[Dict[str, str]]:
+    """单遍切分日报内容，返回 [{'name', 'content'}]（没有内容的项目不返回）
+
+    每个标记只扫描一次：项目内容是本标记名称之后到下一个标记之前的文本。
+    名称行中再出现的标记属于名称本身，不作为边界
+    """
+    projects = []
+    current_name, content_start = None, 0
+    name_end = -1
+    for marker in PROJECT_MARKER_PATTERN.finditer(content):
+        if marker.start() < name_end:
+            continue
+        if current_name is not None:
+            project_content = content[content_start:marker.start()].strip()
+            if project_content:
+                projects.append({'name': current_name, 'content': project_content})
+            current_name = None
+        name = PROJECT_NAME_PATTERN.match(content, marker.end())
+        if name and name.group(1).strip():
+            current_name = name.group(1).strip()
+            content_start = name_end = name.end()
+    if current_name is not None:
+        project_content = content[content_start:].strip()
+        if project_content:
+            projects.append({'name': current_name, 'content': project_content})
+    return projects
+
+
+def _remove_name_noise(text: str) -> str:
+    """去掉空白标点，保留字母数字之间的 . 和 -"""
+    def replace(match: re.Match) -> str:
+        start, end = match.span()
+        if (match.group() in NAME_JOINERS and 0 < start and end < len(text)
+                and text[start - 1].isalnum() and text[end].isalnum()):
+            return match.group()
+        return ''
+    return NAME_NOISE_PATTERN.sub(replace, text)
+
+
+def normalize_project_name(name: str) -> str:
+    """项目名称的归一键
+
+    归为同一项目：'项目A'、'项目 A'、'A项目'、'Ａ 项目'、'【项目】A' 都归一为 'a'；
+    'V1.0 项目' 与 'v1.0' 都归一为 'v1.0'。
+    不能合并：'v1.0' 与 'v10'、'A-1' 与 'A1'（字母数字之间的 . 和 - 保留）；
+    '项目管理平台' 与 '管理平台'、'子项目' 与 '子'（“项目”不是独立的前后缀，保留）
+    """
+    text = unicodedata.normalize('NFKC', name).lower().strip()
+    key = _remove_name_noise(text)
+    stripped = NAME_SUFFIX_PATTERN.sub('', NAME_PREFIX_PATTERN.sub('', text))
+    # 名称只有“项目”二字时保留原样
+    return _remove_name_noise(stripped) or key
+
+
+class ProjectNameIndex:
+    """持久化的项目名称索引
+
+    首次出现的写法成为该项目的规范名称，之后同一归一键的写法都映射到它，跨天保持稳定。
+    需要合并归一键不同的名称（如简称）时，可在 project_aliases 表中把别名的 canonical_name 改为目标名称
+    """
+
+    def __init__(self, db_path: str = "daily_reports.db"):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._aliases: Dict[str, str] = {}
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _init_db(self):
+        conn = self._connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS project_aliases (
+                alias_key TEXT PRIMARY KEY,
+                canonical_name TEXT NOT NULL,
+                first_seen REAL NOT NULL
+            )
+        ''')
+        conn.commit()
+        self._aliases = dict(conn.execute('SELECT alias_key, canonical_name FROM project_aliases'))
+        conn.close()
+
+    def canonical(self, name: str) -> str:
+        """返回名称对应的规范名称，新名称登记为规范名称"""
+        key = normalize_project_name(name)
+        with self._lock:
+            canonical = self._aliases.get(key)
+        if canonical is not None:
+            return canonical
+        try:
+            conn = self._connect()
+            conn.execute(
+                'INSERT OR IGNORE INTO project_aliases (alias_key, canonical_name, first_seen) VALUES (?, ?, ?)',
+                (key, name, time.time())
+            )
+            conn.commit()
+            # 其他进程可能已先登记了同一归一键，以库中记录为准
+            row = conn.execute('SELECT canonical_name FROM project_aliases WHERE alias_key = ?', (key,)).fetchone()
+            conn.close()
+            canonical = row[0] if row else name
+        except Exception as e:
+            logger.warning(f"保存项目名称索引失败: {e}")
+            canonical = name
+        with self._lock:
+            return self._aliases.setdefault(key, canonical)
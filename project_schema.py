@@ -0,0 +1,223 @@
+"""
+项目分析结果模型
+模型输出的项目分析JSON在这里统一校验一次，之后的报告生成、合并和入库都使用 ProjectAnalysis 对象：
+    ProjectAnalysis   - 单个项目的分析结果（字段类型在校验时归一，缺失字段取默认值）
+    validate_analyses - 把单项目格式和多项目格式（各字段以项目名称为键）统一转换为 {项目名称: ProjectAnalysis}
+    pick_project      - 从校验结果中取出指定项目
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Union
+from loguru import logger
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator
+
+# 单项目格式的输出在 validate_analyses 结果中的键
+SINGLE_PROJECT = ''
+
+TRUE_VALUES = ('true', '是', 'yes', 'y')
+FALSE_VALUES = ('false', '否', 'no', 'n')
+
+# 三态取值：是 / 否 / 其他说明（如 "不确定"）
+Signal = Union[bool, str]
+
+
+def _to_text(value: Any) -> str:
+    if isinstance(value, str):
+        return value.strip()
+    if value is None:
+        return ''
+    return json.dumps(value, ensure_ascii=False) if isinstance(value, (dict, list)) else str(value)
+
+
+def _to_text_list(value: Any) -> List[str]:
+    """列表字段：单个字符串视为一项，空值去掉"""
+    if value is None:
+        return []
+    items = value if isinstance(value, list) else [value]
+    return [text for text in (_to_text(item) for item in items) if text]
+
+
+def _to_signal(value: Any) -> Signal:
+    if isinstance(value, bool):
+        return value
+    text = _to_text(value)
+    if text.lower() in TRUE_VALUES:
+        return True
+    if text.lower() in FALSE_VALUES:
+        return False
+    return text or '不确定'
+
+
+class PersonnelInfo(BaseModel):
+    """单个角色（或人员）的投入情况"""
+    model_config = ConfigDict(extra='allow')
+
+    role: str = '未知'
+    work_type: str = '未知'
+    load_status: str = '未知'
+
+    @field_validator('role', 'work_type', 'load_status', mode='before')
+    @classmethod
+    def _text(cls, value):
+        return _to_text(value) or '未知'
+
+
+class RiskSignals(BaseModel):
+    model_config = ConfigDict(extra='allow')
+
+    fake_progress: Signal = '不确定'
+    delay_risk: Signal = '不确定'
+    requirement_unstable: Signal = '不确定'
+    external_block: Signal = '不确定'
+
+    @field_validator('*', mode='before')
+    @classmethod
+    def _signal(cls, value):
+        return _to_signal(value)
+
+    def raised(self) -> List[str]:
+        """取值为“是”的信号名称（包括模板之外的信号）"""
+        return [name for name, value in self.model_dump().items() if _to_signal(value) is True]
+
+
+class ExpectationCheck(BaseModel):
+    model_config = ConfigDict(extra='allow')
+
+    reasonable: Signal = True
+    optimistic_bias: bool = False
+    missing_prerequisites: List[str] = Field(default_factory=list)
+
+    @field_validator('reasonable', mode='before')
+    @classmethod
+    def _reasonable(cls, value):
+        return _to_signal(value)
+
+    @field_validator('optimistic_bias', mode='before')
+    @classmethod
+    def _bias(cls, value):
+        return _to_signal(value) is True
+
+    @field_validator('missing_prerequisites', mode='before')
+    @classmethod
+    def _prerequisites(cls, value):
+        return _to_text_list(value)
+
+
+class ProjectAnalysis(BaseModel):
+    """单个项目的分析结果
+
+    风险信号和预期检查在模型未输出时为 None，报告中据此区分“未提及”和“全部为否”；
+    模板之外的字段原样保留
+    """
+    model_config = ConfigDict(extra='allow')
+
+    project_stage: str = 'unknown'
+    key_events: List[str] = Field(default_factory=list)
+    personnel: Dict[str, PersonnelInfo] = Field(default_factory=dict)
+    role_gaps: List[str] = Field(default_factory=list)
+    single_point_risk: bool = False
+    health_status: str = 'unknown'
+    risk_signals: Optional[RiskSignals] = None
+    main_risk: str = ''
+    tomorrow_expectation_check: Optional[ExpectationCheck] = None
+
+    @field_validator('project_stage', mode='before')
+    @classmethod
+    def _stage(cls, value):
+        return _to_text(value) or 'unknown'
+
+    @field_validator('health_status', mode='before')
+    @classmethod
+    def _health(cls, value):
+        return _to_text(value).lower() or 'unknown'
+
+    @field_validator('main_risk', mode='before')
+    @classmethod
+    def _main_risk(cls, value):
+        return _to_text(value)
+
+    @field_validator('key_events', 'role_gaps', mode='before')
+    @classmethod
+    def _lists(cls, value):
+        return _to_text_list(value)
+
+    @field_validator('single_point_risk', mode='before')
+    @classmethod
+    def _single_point(cls, value):
+        return _to_signal(value) is True
+
+    @field_validator('personnel', mode='before')
+    @classmethod
+    def _personnel(cls, value):
+        # 角色 -> 工作类型字符串，或 [{'name'/'role': ...}] 列表，都归一为 角色 -> 投入情况
+        if isinstance(value, list):
+            value = {
+                _to_text(item.get('name') or item.get('role')) or f"人员{i}": item
+                for i, item in enumerate(value, 1) if isinstance(item, dict)
+            }
+        if not isinstance(value, dict):
+            return {}
+        return {
+            _to_text(name): info if isinstance(info, (dict, PersonnelInfo)) else {'work_type': info}
+            for name, info in value.items() if _to_text(name)
+        }
+
+    @field_validator('risk_signals', 'tomorrow_expectation_check', mode='before')
+    @classmethod
+    def _optional_object(cls, value):
+        if isinstance(value, BaseModel):
+            return value
+        return value if isinstance(value, dict) and value else None
+
+    def to_json(self) -> Dict:
+        """转换为可序列化的字典（用于缓存和入库）"""
+        return self.model_dump(exclude_none=True)
+
+
+def is_multi_project(data: Dict) -> bool:
+    """多项目格式：各字段的值是以项目名称为键的对象"""
+    return isinstance(data.get('project_stage'), dict)
+
+
+def _validate(data: Dict) -> Optional[ProjectAnalysis]:
+    try:
+        return ProjectAnalysis.model_validate(data)
+    except ValidationError as e:
+        logger.warning(f"项目分析结果格式不正确: {e.error_count()} 处错误, {e.errors()[0]['msg']}")
+        return None
+
+
+def validate_analyses(data: Any) -> Dict[str, ProjectAnalysis]:
+    """校验模型输出，返回 {项目名称: ProjectAnalysis}；单项目格式的键为 SINGLE_PROJECT，无法识别时返回空字典"""
+    if not isinstance(data, dict) or not data:
+        return {}
+    if not is_multi_project(data):
+        analysis = _validate(data)
+        return {SINGLE_PROJECT: analysis} if analysis else {}
+
+    analyses = {}
+    for name in data['project_stage']:
+        fields = {
+            key: value[name] for key, value in data.items()
+            if isinstance(value, dict) and name in value
+        }
+        analysis = _validate(fields)
+        if analysis:
+            analyses[name] = analysis
+    return analyses
+
+
+def pick_project(analyses: Dict[str, ProjectAnalysis], project_name: str) -> Optional[ProjectAnalysis]:
+    """取出指定项目的分析结果：单项目格式直接返回；多项目格式按名称查找，只有一个项目时不要求名称一致"""
+    if SINGLE_PROJECT in analyses:
+        return analyses[SINGLE_PROJECT]
+    if project_name in analyses:
+        return analyses[project_name]
+    return next(iter(analyses.values())) if len(analyses) == 1 else None
+
+
+def validate_project(data: Any, project_name: str = SINGLE_PROJECT) -> Optional[ProjectAnalysis]:
+    """校验单个项目的分析结果（如从数据库读出的JSON）"""
+    if isinstance(data, ProjectAnalysis):
+        return data
+    return pick_project(validate_analyses(data), project_name)
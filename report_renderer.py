@@ -0,0 +1,444 @@
+"""
+项目报告渲染模块
+直接从结构化的项目分析结果（ProjectAnalysis）生成报告，一次遍历同时输出三种格式：
+    markdown - 网页展示和入库（与原先的拼接结果逐字节一致）
+    text     - 邮件纯文本（与 EmailFormatter.format_for_email(markdown) 的结果一致）
+    html     - 可直接嵌入页面或HTML邮件
+各格式的行模板在模块加载时预先编译，遍历时每个节点依次交给各格式的写入器
+"""
+
+import re
+from html import escape
+from typing import Dict, List, NamedTuple, Optional, Sequence
+from email_formatter import (BANNER_RULE, BULLET_ITEM_PATTERN, EMPHASIS_RULES, GREETING_LINES, INLINE_RULES,
+                             SUBSECTION_RULE, EmailFormatter, beautify_line, iter_text_lines)
+from project_schema import ProjectAnalysis
+
+FORMATS = ('markdown', 'text', 'html')
+
+EMPTY_REPORT = "今日暂无项目日报内容。"
+
+RISK_SIGNAL_NAMES = {
+    "fake_progress": "假推进",
+    "delay_risk": "隐性延期风险",
+    "requirement_unstable": "需求或决策不稳定",
+    "external_block": "外部依赖阻塞"
+}
+HEALTH_LABELS = {
+    "green": "🟢 健康",
+    "yellow": "🟡 需关注",
+    "red": "🔴 有风险",
+    "unknown": "❓ 不确定"
+}
+
+# markdown 行模板
+MD_HEADING = '### {}\n'.format
+MD_SECTION = '**{}**\n'.format
+MD_BULLET = '- {}\n'.format
+MD_SUBBULLET = '  • {}\n'.format
+MD_LINE = '{}\n'.format
+
+# 邮件纯文本：与 EmailFormatter 的行内转换顺序相同（粗体、斜体、行内代码、链接）
+TEXT_INLINE_RULES = EMPHASIS_RULES + INLINE_RULES
+TEXT_INLINE_MARK = re.compile(r'[*_`\[]')
+
+# HTML 模板
+HTML_HEADING = '<h3>{}</h3>'.format
+HTML_SECTION = '<p><strong>{}</strong></p>'.format
+HTML_PARAGRAPH = '<p>{}</p>'.format
+HTML_PRE = '<pre>{}</pre>'.format
+HTML_BOLD = re.compile(r'\*\*(.+?)\*\*')
+HTML_SPECIAL = re.compile(r'[&<>"\']')
+
+
+class RenderedReport(NamedTuple):
+    """渲染结果；未请求的格式为 None"""
+    markdown: Optional[str]
+    text: Optional[str]
+    html: Optional[str]
+
+
+def _text_inline(content: str) -> str:
+    # 多数字段不含任何标记，跳过逐条替换
+    if not TEXT_INLINE_MARK.search(content):
+        return content
+    for pattern, replacement, mark in TEXT_INLINE_RULES:
+        if mark in content:
+            content = pattern.sub(replacement, content)
+    return content
+
+
+def _html_escape(content: str) -> str:
+    return escape(content) if HTML_SPECIAL.search(content) else content
+
+
+def _html_inline(content: str) -> str:
+    content = _html_escape(content)
+    return HTML_BOLD.sub(r'<strong>\1</strong>', content) if '**' in content else content
+
+
+class MarkdownWriter:
+    def __init__(self):
+        self.parts: List[str] = []
+
+    def heading(self, title: str):
+        self.parts.append(MD_HEADING(title))
+
+    def section(self, title: str):
+        self.parts.append(MD_SECTION(title))
+
+    def bullet(self, content: str):
+        self.parts.append(MD_BULLET(content))
+
+    def subbullet(self, content: str):
+        self.parts.append(MD_SUBBULLET(content))
+
+    def paragraph(self, text: str):
+        self.parts.append(MD_LINE(text))
+
+    def raw(self, text: str):
+        self.parts.append(MD_LINE(text))
+
+    def blank(self):
+        self.parts.append('\n')
+
+    def value(self) -> str:
+        return ''.join(self.parts)
+
+
+class TextWriter:
+    """邮件纯文本
+
+    结构已知的行（标题、列表项、固定文字）直接按模板输出，只对字段内容做行内转换；
+    多行内容的后续行和模型原始输出仍按 email_formatter 的逐行规则处理
+    """
+
+    def __init__(self):
+        self.lines: List[str] = []
+        self._pending: List[str] = []
+        for line in GREETING_LINES:
+            beautify_line(line, self.lines)
+
+    def _generic(self, markdown_line: str):
+        for line in iter_text_lines(markdown_line):
+            beautify_line(line, self.lines)
+
+    def _continuation(self, content: str) -> str:
+        # 内容中的换行在 markdown 中形成新行，按普通行处理
+        if '\n' not in content:
+            return content
+        first, *rest = content.split('\n')
+        self._pending = rest
+        return first
+
+    def _flush_continuation(self):
+        if self._pending:
+            for line in self._pending:
+                self._generic(line)
+            self._pending = []
+
+    def _split_bullets(self, line: str) -> bool:
+        """同一行出现多个圆点时拆成多行（与 EmailFormatter 相同）"""
+        if line.count('•') <= 1:
+            return False
+        self.lines.extend(f"  • {item}" for item in (m.strip() for m in BULLET_ITEM_PATTERN.findall(line)) if item)
+        return True
+
+    def heading(self, title: str):
+        line = _text_inline(f"◆ {self._continuation(title)}").strip()
+        if not self._split_bullets(line):
+            self.lines.extend(('', line, SUBSECTION_RULE, ''))
+        self._flush_continuation()
+
+    def section(self, title: str):
+        line = f"【{title}】"
+        self.lines.extend(('', BANNER_RULE, f"{line:^80}", BANNER_RULE, ''))
+
+    def bullet(self, content: str):
+        line = ('• ' + _text_inline(self._continuation(content))).rstrip()
+        if line.count('•') > 1:
+            self._split_bullets(line)
+        else:
+            lines = self.lines
+            last = lines[-1]
+            if last and not last.startswith('  •') and last.strip():
+                lines.append('')
+            lines.append('  ' + line if line != '•' else '  • ')
+        self._flush_continuation()
+
+    subbullet = bullet
+
+    def paragraph(self, text: str):
+        # 固定的说明文字，均为普通文本行
+        self.lines.append(f"  {text}")
+
+    def raw(self, text: str):
+        for line in text.split('\n'):
+            self._generic(line)
+
+    def blank(self):
+        self.lines.append('')
+
+    def value(self) -> str:
+        # 每个 markdown 行都以换行结尾，末尾对应一个空行
+        return '\n'.join(self.lines) + '\n'
+
+
+class HtmlWriter:
+    def __init__(self):
+        self.parts: List[str] = []
+        self._list_open = False
+        self._item_open = False
+        self._sublist_open = False
+
+    def _close_lists(self):
+        if self._sublist_open:
+            self.parts.append('</ul>')
+        if self._item_open:
+            self.parts.append('</li>')
+        if self._list_open:
+            self.parts.append('</ul>')
+        self._list_open = self._item_open = self._sublist_open = False
+
+    def heading(self, title: str):
+        self._close_lists()
+        self.parts.append(HTML_HEADING(_html_inline(title)))
+
+    def section(self, title: str):
+        self._close_lists()
+        self.parts.append(HTML_SECTION(_html_escape(title)))
+
+    def bullet(self, content: str):
+        if self._sublist_open:
+            self.parts.append('</ul>')
+            self._sublist_open = False
+        if self._item_open:
+            self.parts.append('</li>')
+        if not self._list_open:
+            self.parts.append('<ul>')
+            self._list_open = True
+        self.parts.append(f"<li>{_html_inline(content)}")
+        self._item_open = True
+
+    def subbullet(self, content: str):
+        if not self._item_open:
+            self.bullet('')
+        if not self._sublist_open:
+            self.parts.append('<ul>')
+            self._sublist_open = True
+        self.parts.append(f"<li>{_html_inline(content)}</li>")
+
+    def paragraph(self, text: str):
+        self._close_lists()
+        self.parts.append(HTML_PARAGRAPH(_html_escape(text)))
+
+    def raw(self, text: str):
+        self._close_lists()
+        self.parts.append(HTML_PRE(escape(text)))
+
+    def blank(self):
+        self._close_lists()
+
+    def value(self) -> str:
+        self._close_lists()
+        return ''.join(self.parts)
+
+
+WRITERS = {'markdown': MarkdownWriter, 'text': TextWriter, 'html': HtmlWriter}
+
+
+class _Fanout:
+    """把每个节点依次交给各格式的写入器"""
+
+    def __init__(self, writers: Sequence):
+        self.writers = writers
+
+    def __getattr__(self, name):
+        methods = [getattr(writer, name) for writer in self.writers]
+
+        def emit(*args):
+            for method in methods:
+                method(*args)
+        setattr(self, name, emit)
+        return emit
+
+
+def _render(walk, formats: Sequence[str], *args) -> RenderedReport:
+    # 纯文本需要 markdown 判断是否含代码块（见 _with_fenced_text）
+    names = set(formats) | ({'markdown'} if 'text' in formats else set())
+    writers = {name: WRITERS[name]() for name in FORMATS if name in names}
+    walk(_Fanout(list(writers.values())) if len(writers) > 1 else next(iter(writers.values())), *args)
+    rendered = _with_fenced_text(RenderedReport(**{name: writers[name].value() if name in writers else None
+                                                    for name in FORMATS}))
+    return rendered if 'markdown' in formats else rendered._replace(markdown=None)
+
+
+def _write_analysis(out, analysis: ProjectAnalysis, with_roles: bool):
+    """分析结果的四个部分（事实抽取、人力占用、项目态势、短期预期）"""
+    out.section("一、事实抽取")
+    out.bullet(f"当前项目阶段：{analysis.project_stage}")
+    if analysis.key_events:
+        out.bullet("今日关键事件：")
+        for event in analysis.key_events:
+            out.subbullet(event)
+    else:
+        out.bullet("今日关键事件：无")
+    if analysis.personnel:
+        out.bullet("人员投入情况：")
+        for name, info in analysis.personnel.items():
+            who = f"{name}（{info.role}）" if with_roles else name
+            out.subbullet(f"{who}：{info.work_type}（{info.load_status}）")
+    else:
+        out.bullet("人员投入情况：无相关信息")
+
+    out.blank()
+    out.section("二、人力占用分析")
+    if analysis.role_gaps:
+        out.bullet("角色缺位：")
+        for gap in analysis.role_gaps:
+            out.subbullet(gap)
+    else:
+        out.bullet("角色缺位：无")
+    out.bullet(f"单点风险：{'是' if analysis.single_point_risk else '否'}")
+
+    out.blank()
+    out.section("三、项目态势判断")
+    out.bullet(f"项目健康度：{HEALTH_LABELS.get(analysis.health_status, analysis.health_status)}")
+    if analysis.risk_signals:
+        out.bullet("风险信号：")
+        for key, desc in RISK_SIGNAL_NAMES.items():
+            value = getattr(analysis.risk_signals, key)
+            if isinstance(value, bool):
+                value = "是" if value else "否"
+            out.subbullet(f"{desc}：{value}")
+    out.bullet(f"主要风险：{analysis.main_risk or '无'}")
+
+    out.blank()
+    out.section("四、短期预期检查")
+    expectation_check = analysis.tomorrow_expectation_check
+    if expectation_check:
+        out.bullet(f"预期合理性：{'合理' if expectation_check.reasonable else '存在偏差'}")
+        if expectation_check.optimistic_bias:
+            out.bullet("乐观偏差：是")
+        if expectation_check.missing_prerequisites:
+            out.bullet("缺失前置条件：")
+            for pre in expectation_check.missing_prerequisites:
+                out.subbullet(pre)
+    else:
+        out.bullet("预期合理性：无法判断")
+
+
+def _write_project(out, project_name: str, analysis: ProjectAnalysis):
+    out.heading(f"【{project_name}】")
+    out.blank()
+    _write_analysis(out, analysis, with_roles=True)
+
+
+def _write_summary(out, project_results: Dict[str, Dict]):
+    """项目汇总部分（按项目进展和风险分类）"""
+    progress_lines, risk_lines = [], []
+    for project_name, project_result in project_results.items():
+        analysis: Optional[ProjectAnalysis] = project_result.get('json_data')
+        if not analysis:
+            continue
+
+        progress_items = [
+            event.replace('推进：', '').replace('推进:', '') for event in analysis.key_events
+            if event.startswith('推进：') or event.startswith('推进:')
+        ]
+        if progress_items:
+            # 最多显示3个关键事件
+            progress_lines.append(f"**{project_name}**: 阶段：{analysis.project_stage}；" + "；".join(progress_items[:3]))
+
+        risk_items = []
+        if analysis.main_risk:
+            risk_items.append(analysis.main_risk)
+        if analysis.single_point_risk:
+            risk_items.append("存在单点风险")
+        if analysis.role_gaps:
+            risk_items.append(f"角色缺位：{', '.join(analysis.role_gaps)}")
+        if analysis.risk_signals:
+            risk_items.extend(RISK_SIGNAL_NAMES.get(signal, signal) for signal in analysis.risk_signals.raised())
+        if risk_items or analysis.health_status in ['yellow', 'red']:
+            level = {'red': "【高风险】", 'yellow': "【需关注】"}.get(analysis.health_status, "")
+            # 最多显示3个风险
+            risk_lines.append(f"**{project_name}**: {level}" + ("；".join(risk_items[:3]) or "无显著风险"))
+
+    out.heading("3. 项目进展")
+    out.paragraph("各项目进展情况如下：")
+    out.blank()
+    for line in progress_lines:
+        out.bullet(line)
+    if not progress_lines:
+        out.paragraph("无显著进展")
+
+    out.blank()
+    out.heading("4. 项目风险")
+    out.paragraph("需要关注的问题和风险：")
+    out.blank()
+    for line in risk_lines:
+        out.bullet(line)
+    if not risk_lines:
+        out.paragraph("无需要特别关注的风险。")
+
+
+def _write_unified_report(out, project_results: Dict[str, Dict]):
+    for project_name, project_result in project_results.items():
+        analysis = project_result.get('json_data')
+        if analysis:
+            _write_project(out, project_name, analysis)
+        else:
+            # 没有分析结果时显示原始输出
+            raw_output = project_result.get('raw_output', '')
+            out.heading(f"【{project_name}】")
+            out.blank()
+            out.raw(f"（AI分析失败，原始输出：{raw_output[:200]}...）")
+            out.blank()
+            continue
+        out.blank()
+        out.blank()
+    _write_summary(out, project_results)
+
+
+def _write_multi_project(out, analyses: Dict[str, ProjectAnalysis]):
+    out.section("项目分析报告（多项目）：")
+    out.blank()
+    # 按项目名称排序，确保输出顺序一致
+    for project_name in sorted(analyses):
+        _write_project(out, project_name, analyses[project_name])
+        out.blank()
+        out.blank()
+
+
+def _write_single_analysis(out, analysis: ProjectAnalysis):
+    out.section("项目分析报告：")
+    out.blank()
+    _write_analysis(out, analysis, with_roles=False)
+
+
+def render_report(project_results: Dict[str, Dict], formats: Sequence[str] = FORMATS) -> RenderedReport:
+    """渲染统一项目汇总报告：project_results 为 {项目名称: {'json_data': ProjectAnalysis | None, 'raw_output': ...}}"""
+    if not project_results:
+        return RenderedReport(
+            markdown=EMPTY_REPORT if 'markdown' in formats else None,
+            text=EmailFormatter().format_for_email(EMPTY_REPORT) if 'text' in formats else None,
+            html=HTML_PARAGRAPH(EMPTY_REPORT) if 'html' in formats else None
+        )
+    return _render(_write_unified_report, formats, project_results)
+
+
+def render_analyses(analyses: Dict[str, ProjectAnalysis], formats: Sequence[str] = FORMATS) -> RenderedReport:
+    """渲染多项目分析报告"""
+    return _render(_write_multi_project, formats, analyses)
+
+
+def render_analysis(analysis: ProjectAnalysis, formats: Sequence[str] = FORMATS) -> RenderedReport:
+    """渲染单项目格式的分析报告（不带项目名称）"""
+    return _render(_write_single_analysis, formats, analysis)
+
+
+def _with_fenced_text(rendered: RenderedReport) -> RenderedReport:
+    # 代码块可能跨越多个字段，这种少见情况下整篇交给 EmailFormatter，保证与其结果一致
+    if rendered.text is not None and '```' in rendered.markdown:
+        return rendered._replace(text=EmailFormatter().format_for_email(rendered.markdown))
+    return rendered
@@ -135,7 +135,7 @@ class DailyReportSystem:
     def test_ai_connection(self) -> bool:
         """测试AI连接"""
         try:
-            logger.info("测试AI连接...")
+            logger.info(f"测试AI连接 (后端: {self.ai_summarizer.config.backend})...")
             test_reports = [{
                 'subject': '测试日报',
                 'from': 'test@example.com',
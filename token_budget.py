@@ -0,0 +1,67 @@
+"""
+提示词token预算模块
+粗略估算中英文混合文本的token数，并把超出预算的项目内容切分为多个分片
+"""
+
+import re
+from typing import List
+
+# 中日韩字符及全角标点：通义系列分词器下约 1 字 1 token（偏保守）
+CJK_PATTERN = re.compile(r'[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]')
+# 其他字符（英文、数字、空白、ASCII标点）约 4 个字符 1 token
+ASCII_CHARS_PER_TOKEN = 4
+
+SOURCE_BLOCK_SEPARATOR = "\n\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """估算文本的token数"""
+    if not text:
+        return 0
+    cjk = len(CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + ASCII_CHARS_PER_TOKEN - 1) // ASCII_CHARS_PER_TOKEN
+
+
+def _split_oversized(block: str, budget: int) -> List[str]:
+    """把单个超出预算的块按行切分；单行仍超出时按字符硬切"""
+    pieces = []
+    current, current_tokens = [], 0
+    for line in block.split('\n'):
+        line_tokens = estimate_tokens(line) + 1
+        if line_tokens > budget:
+            # 超长单行：按预算比例硬切
+            step = max(1, len(line) * budget // line_tokens)
+            for i in range(0, len(line), step):
+                pieces.append(line[i:i + step])
+            continue
+        if current and current_tokens + line_tokens > budget:
+            pieces.append('\n'.join(current))
+            current, current_tokens = [], 0
+        current.append(line)
+        current_tokens += line_tokens
+    if current:
+        pieces.append('\n'.join(current))
+    return pieces
+
+
+def split_by_budget(blocks: List[str], budget: int) -> List[str]:
+    """按预算把内容块（如同一项目的各来源日报）依次装入分片
+
+    块的顺序保持不变；单个块超出预算时按行切开，结果只与输入和预算有关
+    """
+    chunks = []
+    current, current_tokens = [], 0
+    separator_tokens = estimate_tokens(SOURCE_BLOCK_SEPARATOR)
+    for block in blocks:
+        block_tokens = estimate_tokens(block)
+        pieces = [block] if block_tokens <= budget else _split_oversized(block, budget)
+        for piece in pieces:
+            piece_tokens = estimate_tokens(piece)
+            if current and current_tokens + separator_tokens + piece_tokens > budget:
+                chunks.append(SOURCE_BLOCK_SEPARATOR.join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens + (separator_tokens if len(current) > 1 else 0)
+    if current:
+        chunks.append(SOURCE_BLOCK_SEPARATOR.join(current))
+    return chunks
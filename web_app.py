@@ -8,16 +8,24 @@ from flask import Flask, render_template, request, jsonify, redirect, url_for, R
 import sqlite3
 import os
 from datetime import datetime, date, timedelta
-from typing import Dict, List
+from typing import Dict, List, Optional
 import json
 import logging
+import queue
 import threading
 import time
 import schedule
 import random
-from email_handler import EmailHandler
+from mail_listener import MailListener
+from mail_outbox import MailOutbox
+from mail_sources import ReportCollector
+from html_text import html_to_text
 from ai_summarizer import AISummarizer
 from email_formatter import EmailFormatter
+from report_renderer import FORMATS, RenderedReport
+from llm_cache import LLMResponseCache
+from llm_client import shared_client_stats
+from project_schema import ProjectAnalysis, validate_project
 from config import Config
 
 # 配置日志
@@ -41,6 +49,44 @@ DATABASE = 'daily_reports.db'
 # 全局配置
 config = Config()
 
+# 后台邮件监听器（MAIL_LISTENER_ENABLED 开启时在主进程中启动），每个 (账号, 文件夹) 一个
+mail_listeners = [
+    MailListener(
+        account,
+        config.report.report_from_emails,
+        config.report.report_subject_keywords,
+        folder=folder,
+        poll_seconds=config.email.listener_poll_seconds
+    )
+    for account, folder in config.mail_sources()
+]
+
+# 邮件发件箱（首次入队时自动启动后台发送线程）
+mail_outbox = MailOutbox(
+    config.email,
+    workers=config.email.outbox_workers,
+    max_attempts=config.email.outbox_max_attempts
+)
+
+# 多来源日报收集器（各账号维护小连接池，来源之间并发同步）
+report_collector = ReportCollector(
+    config.mail_sources(),
+    max_workers=config.email.collect_workers,
+    pool_idle_seconds=config.email.pool_idle_seconds
+)
+
+
+def collect_team_email_reports() -> List[Dict]:
+    """并发收集所有来源的团队日报邮件，监听器在线的来源直接读取本地存储"""
+    live_sources = [listener.source for listener in mail_listeners if listener.is_live()]
+    if live_sources:
+        logger.info(f"📥 邮件监听器在线，{', '.join(f'{a}/{f}' for a, f in live_sources)} 直接读取本地邮件存储")
+    return report_collector.collect(
+        from_emails=config.report.report_from_emails,
+        subject_keywords=config.report.report_subject_keywords,
+        live_sources=live_sources
+    )
+
 def init_database():
     """初始化数据库"""
     conn = sqlite3.connect(DATABASE)
@@ -125,6 +171,18 @@ def init_database():
         )
     ''')
     
+    # 创建渲染结果缓存表（每份日报的网页、邮件纯文本和HTML版本）
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS rendered_reports (
+            report_id INTEGER PRIMARY KEY,
+            markdown TEXT NOT NULL,
+            text TEXT NOT NULL,
+            html TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (report_id) REFERENCES generated_reports(id) ON DELETE CASCADE
+        )
+    ''')
+    
     # 创建索引以提高查询性能
     cursor.execute('''
         CREATE INDEX IF NOT EXISTS idx_project_raw_content_report_id 
@@ -148,27 +206,28 @@ def get_db_connection():
     conn.row_factory = sqlite3.Row
     return conn
 
-def json_to_structured_data(json_data: Dict) -> Dict:
-    """将JSON数据转换为结构化数据（拆成column）"""
-    if not json_data or not isinstance(json_data, dict):
+def json_to_structured_data(analysis: ProjectAnalysis) -> Dict:
+    """将项目分析结果转换为结构化数据（拆成column）"""
+    if not analysis:
         return {}
     
-    structured = {}
+    def dump(value):
+        return json.dumps(value, ensure_ascii=False)
     
-    # 提取基本字段
-    structured['project_stage'] = json_data.get('project_stage', '')
-    structured['health_status'] = json_data.get('health_status', '')
-    structured['single_point_risk'] = 1 if json_data.get('single_point_risk', False) else 0
-    structured['main_risk'] = json_data.get('main_risk', '')
-    
-    # 将列表和字典转换为JSON字符串
-    structured['key_events'] = json.dumps(json_data.get('key_events', []), ensure_ascii=False)
-    structured['personnel'] = json.dumps(json_data.get('personnel', {}), ensure_ascii=False)
-    structured['role_gaps'] = json.dumps(json_data.get('role_gaps', []), ensure_ascii=False)
-    structured['risk_signals'] = json.dumps(json_data.get('risk_signals', {}), ensure_ascii=False)
-    structured['tomorrow_expectation_check'] = json.dumps(json_data.get('tomorrow_expectation_check', {}), ensure_ascii=False)
-    
-    return structured
+    return {
+        'project_stage': analysis.project_stage,
+        'health_status': analysis.health_status,
+        'single_point_risk': 1 if analysis.single_point_risk else 0,
+        'main_risk': analysis.main_risk,
+        # 列表和对象字段保存为JSON字符串
+        'key_events': dump(analysis.key_events),
+        'personnel': dump({name: info.model_dump() for name, info in analysis.personnel.items()}),
+        'role_gaps': dump(analysis.role_gaps),
+        'risk_signals': dump(analysis.risk_signals.model_dump() if analysis.risk_signals else {}),
+        'tomorrow_expectation_check': dump(
+            analysis.tomorrow_expectation_check.model_dump() if analysis.tomorrow_expectation_check else {}
+        )
+    }
 
 def save_project_data(conn, report_id: int, project_data_list: List[Dict]):
     """保存项目数据到数据库"""
@@ -185,7 +244,7 @@ def save_project_data(conn, report_id: int, project_data_list: List[Dict]):
         )
         
         # 保存JSON数据
-        json_str = json.dumps(json_data, ensure_ascii=False) if json_data else json.dumps({}, ensure_ascii=False)
+        json_str = json.dumps(json_data.to_json() if json_data else {}, ensure_ascii=False)
         conn.execute(
             'INSERT INTO project_json_data (report_id, project_name, json_data) VALUES (?, ?, ?)',
             (report_id, project_name, json_str)
@@ -218,6 +277,99 @@ def save_project_data(conn, report_id: int, project_data_list: List[Dict]):
                 (report_id, project_name)
             )
 
+def save_rendered_report(conn, report_id: int, rendered: RenderedReport):
+    """缓存日报的各格式渲染结果（增量更新时覆盖）；rendered 为None（降级生成）时清除旧缓存"""
+    if rendered is None:
+        conn.execute('DELETE FROM rendered_reports WHERE report_id = ?', (report_id,))
+        return
+    conn.execute(
+        'INSERT OR REPLACE INTO rendered_reports (report_id, markdown, text, html) VALUES (?, ?, ?, ?)',
+        (report_id, rendered.markdown, rendered.text, rendered.html)
+    )
+
+def load_rendered_report(conn, report_id: int) -> RenderedReport:
+    """读取日报的渲染结果；没有缓存时（降级生成或早期的日报）由日报内容生成纯文本并缓存，HTML为None"""
+    row = conn.execute(
+        'SELECT markdown, text, html FROM rendered_reports WHERE report_id = ?', (report_id,)
+    ).fetchone()
+    if row:
+        return RenderedReport(row['markdown'], row['text'], row['html'])
+    
+    report_row = conn.execute('SELECT final_report FROM generated_reports WHERE id = ?', (report_id,)).fetchone()
+    if not report_row:
+        return None
+    final_report = report_row['final_report']
+    rendered = RenderedReport(final_report, EmailFormatter().format_for_email(final_report), None)
+    save_rendered_report(conn, report_id, rendered)
+    conn.commit()
+    return rendered
+
+def load_latest_project_data(conn, report_date: str) -> tuple:
+    """
+    获取指定日期最新一份日报的项目数据（用于增量生成）
+    返回 (report_id, {project_name: {'raw_content': ..., 'json_data': ...}})，没有则返回 (None, {})
+    """
+    report_row = conn.execute(
+        'SELECT id FROM generated_reports WHERE date = ? ORDER BY created_at DESC, id DESC LIMIT 1',
+        (report_date,)
+    ).fetchone()
+    
+    if not report_row:
+        return None, {}
+    
+    report_id = report_row['id']
+    projects = {}
+    
+    for row in conn.execute(
+        'SELECT project_name, raw_content FROM project_raw_content WHERE report_id = ? ORDER BY id',
+        (report_id,)
+    ).fetchall():
+        projects[row['project_name']] = {'raw_content': row['raw_content'], 'json_data': None}
+    
+    for row in conn.execute(
+        'SELECT project_name, json_data FROM project_json_data WHERE report_id = ? ORDER BY id',
+        (report_id,)
+    ).fetchall():
+        if row['project_name'] in projects and row['json_data']:
+            projects[row['project_name']]['json_data'] = validate_project(json.loads(row['json_data']), row['project_name'])
+    
+    return report_id, projects
+
+def update_report_incremental(conn, report_id: int, user_content: str, email_content: str,
+                              final_report: str, project_data_list: List[Dict],
+                              failed_projects: Optional[List[str]] = None) -> int:
+    """增量更新已有日报：只重写内容发生变化的项目数据，返回重写的项目数量
+
+    failed_projects 是本次分析失败的项目，保留其上次的数据（下次生成时会因内容不同而重新分析）；
+    为 None 时说明整体退回了简单汇总，保留全部已有项目数据
+    """
+    conn.execute(
+        'UPDATE generated_reports SET user_content = ?, email_content = ?, final_report = ? WHERE id = ?',
+        (user_content, email_content, final_report, report_id)
+    )
+    
+    existing_names = {
+        row['project_name'] for row in conn.execute(
+            'SELECT DISTINCT project_name FROM project_raw_content WHERE report_id = ?',
+            (report_id,)
+        ).fetchall()
+    }
+    current_names = {pd['project_name'] for pd in project_data_list}
+    changed = [pd for pd in project_data_list if not pd.get('reused')]
+    kept_names = existing_names if failed_projects is None else set(failed_projects)
+    
+    # 删除已不存在的项目以及需要重写的项目
+    stale_names = (existing_names - current_names - kept_names) | {pd['project_name'] for pd in changed}
+    for project_name in stale_names:
+        for table in ('project_raw_content', 'project_json_data', 'project_structured_data'):
+            conn.execute(
+                f'DELETE FROM {table} WHERE report_id = ? AND project_name = ?',
+                (report_id, project_name)
+            )
+    
+    save_project_data(conn, report_id, changed)
+    return len(changed)
+
 def get_user_content_for_date(target_date: str) -> tuple:
     """
     获取指定日期的用户内容，如果没有则获取最近的一份
@@ -271,12 +423,7 @@ class BackgroundScheduler:
                 logger.info(f"   {i}. {email}")
             logger.info(f"🔍 定时任务 - 搜索关键词: {config.report.report_subject_keywords}")
             
-            email_handler = EmailHandler(config.email)
-            email_reports = email_handler.collect_reports(
-                from_emails=config.report.report_from_emails,
-                subject_keywords=config.report.report_subject_keywords,
-                days=1
-            )
+            email_reports = collect_team_email_reports()
             
             if email_reports:
                 # 获取用户输入的内容（如果当天没有则使用最近的一份）
@@ -309,6 +456,7 @@ class BackgroundScheduler:
                     team_reports=email_reports if email_reports else []
                 )
                 final_report = result['report']
+                rendered = result.get('rendered')
                 project_data_list = result.get('project_data', [])
                 
                 logger.info(f"提取到 {len(project_data_list)} 个项目数据")
@@ -324,6 +472,7 @@ class BackgroundScheduler:
                 if project_data_list:
                     save_project_data(conn, report_id, project_data_list)
                     logger.info(f"已保存 {len(project_data_list)} 个项目的关联数据")
+                save_rendered_report(conn, report_id, rendered)
                 
                 # 记录任务日志
                 conn.execute(
@@ -339,19 +488,21 @@ class BackgroundScheduler:
                 # 如果配置了收件人，可以自动发送邮件
                 if config.report.report_recipients:
                     try:
-                        # 使用邮件格式化器美化内容
-                        email_formatter = EmailFormatter()
-                        formatted_content = email_formatter.format_for_email(final_report)
+                        # 优先使用渲染好的邮件纯文本，降级生成的日报再用邮件格式化器美化
+                        if rendered:
+                            formatted_content = rendered.text
+                        else:
+                            formatted_content = EmailFormatter().format_for_email(final_report)
                         
-                        email_handler.send_email(
+                        mail_outbox.enqueue(
                             to_emails=config.report.report_recipients,
                             subject=f"团队日报汇总 - {task_date}",
                             content=formatted_content,
                             content_type="plain"
                         )
-                        logger.info("定时日报邮件发送成功")
+                        logger.info("定时日报邮件已加入发送队列")
                     except Exception as e:
-                        logger.error(f"定时日报邮件发送失败: {e}")
+                        logger.error(f"定时日报邮件入队失败: {e}")
             else:
                 # 记录无邮件的情况
                 conn = get_db_connection()
@@ -530,6 +681,7 @@ def generate_report():
         
         data = request.get_json()
         report_date = data.get('date', date.today().strftime('%Y-%m-%d'))
+        incremental = bool(data.get('incremental', False))
         
         # 获取用户输入的内容（如果当天没有则使用最近的一份）
         user_content, actual_date, is_fallback = get_user_content_for_date(report_date)
@@ -550,12 +702,7 @@ def generate_report():
         logger.info(f"🔍 搜索关键词: {config.report.report_subject_keywords}")
         logger.info(f"📅 收集范围: 最近{config.report.collect_days}天内的邮件")
         
-        email_handler = EmailHandler(config.email)
-        email_reports = email_handler.collect_reports(
-            from_emails=config.report.report_from_emails,
-            subject_keywords=config.report.report_subject_keywords,
-            days=1
-        )
+        email_reports = collect_team_email_reports()
         
         email_content = ""
         if email_reports:
@@ -577,30 +724,49 @@ def generate_report():
         logger.info("开始AI分离汇总... (可能需要1-3分钟，请耐心等待)")
         ai_start_time = time.time()
         
+        # 增量模式：与当天最新一份日报的项目内容对比，未变化的项目复用已有分析结果
+        previous_report_id, previous_projects = (
+            load_latest_project_data(conn, report_date) if incremental else (None, {})
+        )
+        
         ai_summarizer = AISummarizer(config.ai)
         result = ai_summarizer.summarize_reports_separated_with_data(
             personal_content=user_content,
-            team_reports=email_reports if email_reports else []
+            team_reports=email_reports if email_reports else [],
+            previous_projects=previous_projects
         )
         final_report = result['report']
+        rendered = result.get('rendered')
         project_data_list = result.get('project_data', [])
+        ai_timing = result.get('timing')
         
         ai_end_time = time.time()
         ai_duration = round(ai_end_time - ai_start_time, 2)
         logger.info(f"AI汇总完成，耗时: {ai_duration}秒")
         logger.info(f"提取到 {len(project_data_list)} 个项目数据")
         
-        # 保存生成的日报
-        cursor = conn.execute(
-            'INSERT INTO generated_reports (date, user_content, email_content, final_report) VALUES (?, ?, ?, ?)',
-            (report_date, user_content, email_content, final_report)
-        )
-        report_id = cursor.lastrowid
+        if previous_report_id:
+            # 增量更新已有日报，只重写变化的项目
+            changed_count = update_report_incremental(
+                conn, previous_report_id, user_content, email_content, final_report, project_data_list,
+                result.get('failed_projects')
+            )
+            logger.info(f"增量更新日报 #{previous_report_id}，重写 {changed_count}/{len(project_data_list)} 个项目")
+        else:
+            # 保存生成的日报
+            cursor = conn.execute(
+                'INSERT INTO generated_reports (date, user_content, email_content, final_report) VALUES (?, ?, ?, ?)',
+                (report_date, user_content, email_content, final_report)
+            )
+            report_id = cursor.lastrowid
+            
+            # 保存项目数据
+            if project_data_list:
+                save_project_data(conn, report_id, project_data_list)
+                logger.info(f"已保存 {len(project_data_list)} 个项目的关联数据")
         
-        # 保存项目数据
-        if project_data_list:
-            save_project_data(conn, report_id, project_data_list)
-            logger.info(f"已保存 {len(project_data_list)} 个项目的关联数据")
+        # 缓存各格式的渲染结果
+        save_rendered_report(conn, previous_report_id or report_id, rendered)
         
         conn.commit()
         conn.close()
@@ -619,7 +785,8 @@ def generate_report():
             },
             'processing_time': {
                 'ai_duration': ai_duration,
-                'total_duration': total_duration
+                'total_duration': total_duration,
+                'ai_timing': ai_timing
             }
         })
         
@@ -629,9 +796,12 @@ def generate_report():
 
 @app.route('/generate_report_async', methods=['POST'])
 def generate_report_async():
-    """异步生成日报 - 支持长时间处理，定期发送心跳"""
+    """异步生成日报 - 以 text/event-stream 实时推送各项目的AI输出，空闲时发送心跳"""
     import json
     
+    # 生成器在请求上下文之外执行，请求参数需要提前读取
+    data = request.get_json() or {}
+    
     def generate():
         try:
             # 发送开始信号
@@ -641,8 +811,8 @@ def generate_report_async():
             import time
             start_time = time.time()
             
-            data = request.get_json()
             report_date = data.get('date', date.today().strftime('%Y-%m-%d'))
+            incremental = bool(data.get('incremental', False))
             
             # 获取用户输入的内容（如果当天没有则使用最近的一份）
             yield f"data: {json.dumps({'type': 'progress', 'message': '获取用户内容...'})}\n\n"
@@ -668,12 +838,7 @@ def generate_report_async():
             
             yield f"data: {json.dumps({'type': 'progress', 'message': f'搜索{len(config.report.report_from_emails)}个邮箱的日报...'})}\n\n"
             
-            email_handler = EmailHandler(config.email)
-            email_reports = email_handler.collect_reports(
-                from_emails=config.report.report_from_emails,
-                subject_keywords=config.report.report_subject_keywords,
-                days=1
-            )
+            email_reports = collect_team_email_reports()
             
             email_content = ""
             if email_reports:
@@ -691,48 +856,57 @@ def generate_report_async():
             logger.info(f"个人内容长度: {len(user_content)} 字符")
             logger.info(f"团队邮件数量: {len(email_reports) if email_reports else 0}")
             
-            # AI分离汇总 - 这是最耗时的操作
-            yield f"data: {json.dumps({'type': 'progress', 'message': '启动AI智能汇总，预计需要1-3分钟...'})}\n\n"
-            logger.info("开始AI分离汇总... (可能需要1-3分钟，请耐心等待)")
+            # AI分离汇总 - 这是最耗时的操作，在后台线程中执行，各项目的流式输出经队列转发给浏览器
+            yield f"data: {json.dumps({'type': 'progress', 'message': '启动AI智能汇总，各项目结果将逐个返回...'})}\n\n"
+            logger.info("开始AI分离汇总（流式输出）...")
             ai_start_time = time.time()
             
-            # 定期发送心跳，防止超时
-            def send_heartbeat():
-                heartbeat_count = 0
-                while True:
-                    time.sleep(15)  # 每15秒发送一次心跳
-                    heartbeat_count += 1
-                    elapsed = int(time.time() - ai_start_time)
-                    yield f"data: {json.dumps({'type': 'heartbeat', 'message': f'AI处理中...已用时{elapsed}秒', 'count': heartbeat_count})}\n\n"
-                    if elapsed > 300:  # 超过5分钟停止心跳
-                        break
+            previous_report_id, previous_projects = (
+                load_latest_project_data(conn, report_date) if incremental else (None, {})
+            )
             
-            # 启动心跳线程
-            import threading
-            heartbeat_active = True
+            events = queue.Queue()
+            outcome = {}
             
-            def heartbeat_worker():
-                count = 0
-                while heartbeat_active:
-                    time.sleep(15)
-                    count += 1
-                    elapsed = int(time.time() - ai_start_time)
-                    # 注意：这里不能直接yield，需要其他方式处理
-                    logger.info(f"心跳 #{count}: AI处理中，已用时{elapsed}秒")
+            def summarize_worker():
+                try:
+                    ai_summarizer = AISummarizer(config.ai)
+                    outcome['result'] = ai_summarizer.summarize_reports_separated_with_data(
+                        personal_content=user_content,
+                        team_reports=email_reports if email_reports else [],
+                        previous_projects=previous_projects,
+                        on_event=events.put
+                    )
+                except Exception as e:
+                    outcome['error'] = e
+                finally:
+                    events.put(None)
             
-            heartbeat_thread = threading.Thread(target=heartbeat_worker)
-            heartbeat_thread.daemon = True
-            heartbeat_thread.start()
+            worker = threading.Thread(target=summarize_worker, name='ai-stream', daemon=True)
+            worker.start()
             
-            ai_summarizer = AISummarizer(config.ai)
-            result = ai_summarizer.summarize_reports_separated_with_data(
-                personal_content=user_content,
-                team_reports=email_reports if email_reports else []
-            )
+            heartbeat_count = 0
+            while True:
+                try:
+                    event = events.get(timeout=15)
+                except queue.Empty:
+                    # 15秒内没有任何输出时发送心跳，防止连接被代理断开
+                    heartbeat_count += 1
+                    elapsed = int(time.time() - ai_start_time)
+                    yield f"data: {json.dumps({'type': 'heartbeat', 'message': f'AI处理中...已用时{elapsed}秒', 'count': heartbeat_count})}\n\n"
+                    continue
+                if event is None:
+                    break
+                yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+            worker.join()
+            
+            if 'error' in outcome:
+                raise outcome['error']
+            result = outcome['result']
             final_report = result['report']
+            rendered = result.get('rendered')
             project_data_list = result.get('project_data', [])
-            
-            heartbeat_active = False  # 停止心跳
+            ai_timing = result.get('timing')
             
             ai_end_time = time.time()
             ai_duration = round(ai_end_time - ai_start_time, 2)
@@ -741,17 +915,27 @@ def generate_report_async():
             
             yield f"data: {json.dumps({'type': 'progress', 'message': f'AI汇总完成，耗时{ai_duration}秒'})}\n\n"
             
-            # 保存生成的日报
-            cursor = conn.execute(
-                'INSERT INTO generated_reports (date, user_content, email_content, final_report) VALUES (?, ?, ?, ?)',
-                (report_date, user_content, email_content, final_report)
-            )
-            report_id = cursor.lastrowid
+            if previous_report_id:
+                changed_count = update_report_incremental(
+                    conn, previous_report_id, user_content, email_content, final_report, project_data_list,
+                    result.get('failed_projects')
+                )
+                logger.info(f"增量更新日报 #{previous_report_id}，重写 {changed_count}/{len(project_data_list)} 个项目")
+            else:
+                # 保存生成的日报
+                cursor = conn.execute(
+                    'INSERT INTO generated_reports (date, user_content, email_content, final_report) VALUES (?, ?, ?, ?)',
+                    (report_date, user_content, email_content, final_report)
+                )
+                report_id = cursor.lastrowid
+                
+                # 保存项目数据
+                if project_data_list:
+                    save_project_data(conn, report_id, project_data_list)
+                    logger.info(f"已保存 {len(project_data_list)} 个项目的关联数据")
             
-            # 保存项目数据
-            if project_data_list:
-                save_project_data(conn, report_id, project_data_list)
-                logger.info(f"已保存 {len(project_data_list)} 个项目的关联数据")
+            # 缓存各格式的渲染结果
+            save_rendered_report(conn, previous_report_id or report_id, rendered)
             
             conn.commit()
             conn.close()
@@ -771,7 +955,8 @@ def generate_report_async():
                 },
                 'processing_time': {
                     'ai_duration': ai_duration,
-                    'total_duration': total_duration
+                    'total_duration': total_duration,
+                    'ai_timing': ai_timing
                 }
             }
             yield f"data: {json.dumps(result)}\n\n"
@@ -780,7 +965,10 @@ def generate_report_async():
             logger.error(f"生成日报失败: {e}")
             yield f"data: {json.dumps({'type': 'error', 'message': f'生成失败: {str(e)}'})}\n\n"
     
-    return Response(generate(), mimetype='text/plain')
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # 关闭 nginx 缓冲，保证事件实时送达
+    })
 
 @app.route('/scheduler_status')
 def scheduler_status():
@@ -853,6 +1041,51 @@ def toggle_scheduler():
         logger.error(f"切换定时任务状态失败: {e}")
         return jsonify({'success': False, 'message': f'操作失败: {str(e)}'})
 
+@app.route('/api/llm_cache/stats')
+def llm_cache_stats():
+    """获取LLM响应缓存命中统计"""
+    try:
+        if not config.ai.cache_enabled:
+            return jsonify({'success': True, 'enabled': False})
+        
+        cache = LLMResponseCache(
+            db_path=config.ai.cache_path,
+            ttl_seconds=config.ai.cache_ttl_hours * 3600,
+            max_entries=config.ai.cache_max_entries
+        )
+        return jsonify({'success': True, 'enabled': True, 'stats': cache.stats()})
+        
+    except Exception as e:
+        logger.error(f"获取LLM缓存统计失败: {e}")
+        return jsonify({'success': False, 'message': f'获取缓存统计失败: {str(e)}'})
+
+@app.route('/api/llm_client/stats')
+def llm_client_stats():
+    """获取AI调用客户端的限速、并发和重试计数"""
+    return jsonify({'success': True, 'clients': shared_client_stats()})
+
+@app.route('/api/reports/<int:report_id>/rendered')
+def rendered_report(report_id):
+    """获取日报的渲染结果：format 为 markdown（默认）、text（邮件纯文本）或 html"""
+    fmt = request.args.get('format', 'markdown')
+    if fmt not in FORMATS:
+        return jsonify({'success': False, 'message': f'不支持的格式: {fmt}'}), 400
+    try:
+        conn = get_db_connection()
+        rendered = load_rendered_report(conn, report_id)
+        conn.close()
+
+        if rendered is None:
+            return jsonify({'success': False, 'message': '日报不存在'}), 404
+        content = getattr(rendered, fmt)
+        if content is None:
+            return jsonify({'success': False, 'message': '该日报没有结构化的项目数据，无法生成HTML版本'}), 404
+        return jsonify({'success': True, 'format': fmt, 'content': content})
+
+    except Exception as e:
+        logger.error(f"获取日报渲染结果失败: {e}")
+        return jsonify({'success': False, 'message': f'获取失败: {str(e)}'})
+
 @app.route('/history')
 def history():
     """历史记录页面"""
@@ -1270,34 +1503,41 @@ def send_history_email():
         if not config.report.report_recipients:
             return jsonify({'success': False, 'message': '未配置邮件收件人'})
         
-        # 将HTML内容转换为纯文本
-        from bs4 import BeautifulSoup
-        soup = BeautifulSoup(report_content, 'html.parser')
-        text_content = soup.get_text()
+        # 将HTML内容转换为纯文本（保留段落结构）
+        text_content = html_to_text(report_content, config.email.html_extractor)
         
         # 使用邮件格式化器美化内容
         email_formatter = EmailFormatter()
         formatted_content = email_formatter.format_for_email(text_content)
         
-        # 发送邮件
-        email_handler = EmailHandler(config.email)
-        success = email_handler.send_email(
+        # 加入发件箱，由后台线程发送
+        outbox_id = mail_outbox.enqueue(
             to_emails=config.report.report_recipients,
             subject=f"Apple 日报汇总 - {report_date} ",
             content=formatted_content,
             content_type="plain"
         )
         
-        if success:
-            logger.info(f"历史日报邮件发送成功: {report_date}")
-            return jsonify({'success': True, 'message': '邮件发送成功'})
-        else:
-            return jsonify({'success': False, 'message': '邮件发送失败'})
+        logger.info(f"历史日报邮件已加入发送队列: {report_date} (#{outbox_id})")
+        return jsonify({'success': True, 'message': '邮件已加入发送队列', 'outbox_id': outbox_id})
             
     except Exception as e:
         logger.error(f"发送历史日报邮件失败: {e}")
         return jsonify({'success': False, 'message': f'发送失败: {str(e)}'})
 
+@app.route('/api/outbox/<int:outbox_id>')
+def outbox_status(outbox_id):
+    """查询发件箱中某封邮件的发送状态"""
+    item = mail_outbox.get(outbox_id)
+    if item is None:
+        return jsonify({'success': False, 'message': '邮件不存在'}), 404
+    return jsonify({'success': True, 'data': item})
+
+@app.route('/api/outbox/stats')
+def outbox_stats():
+    """发件箱统计"""
+    return jsonify({'success': True, 'data': mail_outbox.stats()})
+
 def show_startup_info():
     """显示启动信息"""
     print("=" * 60)
@@ -1396,6 +1636,11 @@ if __name__ == '__main__':
             # 这是主进程，启动定时任务
             scheduler.start()
             logger.info("Web应用启动，定时任务已自动启动")
+            if config.email.listener_enabled:
+                for listener in mail_listeners:
+                    listener.start()
+            # 发送上次退出时未发完的邮件
+            mail_outbox.start()
         
         # 启动应用（启用热更新）
         print("🔥 热更新已启用，代码修改后会自动重载")
@@ -1421,10 +1666,18 @@ if __name__ == '__main__':
         print("\n\n🛑 收到停止信号")
         print("📊 正在安全关闭智能定时任务...")
         scheduler.stop()
+        for listener in mail_listeners:
+            listener.stop()
+        mail_outbox.stop()
+        report_collector.close()
         print("✅ 智能日报系统已安全关闭")
         
     except Exception as e:
         print(f"\n❌ 启动失败: {e}")
         logger.error(f"应用运行异常: {e}")
         scheduler.stop()
+        for listener in mail_listeners:
+            listener.stop()
+        mail_outbox.stop()
+        report_collector.close()
         sys.exit(1) 
\ No newline at end of file